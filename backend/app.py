@@ -1,111 +1,426 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context, g
 from flask_cors import CORS
 import google.generativeai as genai
 import os
+import io
+import csv
+import logging
 import json
 from datetime import datetime
-from scraper import scrape_all_platforms, mock_scrape_all_platforms
-from database import init_db, save_price_history, get_price_trends
+from scraper import scrape_all_platforms, mock_scrape_all_platforms, driver_pool, calculate_fees, scrape_items
+from platforms import platform_selection_error
+from cache import price_cache, price_cache_key, llm_cache, llm_flights, memoize, normalize_item
+import hashlib
+import hmac
+import item_parser
+from database import init_db, save_price_history_bulk, get_history_writer, get_price_trends_bulk
+from database import iter_export, iter_import_rows, import_price_history, get_price_series_bulk, ImportAborted
+from optimizer import optimize_basket, describe_plan
+from catalog import TrigramIndex, normalize, quantities
+from downsample import downsample, METHODS as DOWNSAMPLE_METHODS
+from jobs import JobManager, JobQueueFull, DONE
+from prewarm import Prewarmer, popularity
+from chat import chat_sessions, compact
+import retention
+import metrics
 import traceback
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
+
+logging.basicConfig(level=os.getenv('LOG_LEVEL', 'INFO'),
+                    format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+logger = logging.getLogger(__name__)
 app = Flask(__name__)
 CORS(app)
 # Configure Gemini API
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
 genai.configure(api_key=GEMINI_API_KEY)
+GEMINI_MODEL = os.getenv('GEMINI_MODEL', 'gemini-2.5-flash')
+# Insights depend on live prices, so they expire sooner than other cached calls
+INSIGHTS_CACHE_TTL = float(os.getenv('INSIGHTS_CACHE_TTL', '600'))
+# "live" runs the concurrent Selenium/HTTP scrapers, "mock" uses canned prices
+SCRAPER_MODE = os.getenv('SCRAPER_MODE', 'mock')
+if SCRAPER_MODE == 'live':
+    # Launch browsers in the background so the first comparison finds them warm
+    threading.Thread(target=driver_pool.warm, daemon=True).start()
+# Batch price_history inserts across requests on the write-behind writer;
+# otherwise each comparison's rows are saved by a background pipeline task
+HISTORY_WRITE_BEHIND = os.getenv('HISTORY_WRITE_BEHIND', 'false').lower() == 'true'
 # Initialize database
 init_db()
-def extract_items_with_ai(user_input):
-    """Use Gemini to extract shopping items from natural language"""
+# Browsers may reuse /api/history responses this long before revalidating
+HISTORY_CACHE_MAX_AGE = int(os.getenv('HISTORY_CACHE_MAX_AGE', '300'))
+# Background workers for the job-based comparison API
+job_manager = JobManager()
+# Comparisons wait this long (seconds) for Gemini insights before answering with
+# fallback insights; the real ones are then served by /api/insights/<id>
+INSIGHTS_BUDGET = float(os.getenv('INSIGHTS_BUDGET', '3'))
+insights_jobs = JobManager(workers=int(os.getenv('INSIGHTS_WORKERS', '8')),
+                           max_queued=int(os.getenv('INSIGHTS_QUEUE_SIZE', '64')))
+# Upper bound on one Gemini call; on timeout the caller's fallback is used
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '20'))
+# google-generativeai 0.3.2 takes no request timeout, so calls run here and are waited on
+llm_calls = ThreadPoolExecutor(max_workers=int(os.getenv('LLM_WORKERS', '16')), thread_name_prefix='llm')
+# Per-platform product matching, so one platform's Gemini call does not hold up the next
+matching = ThreadPoolExecutor(max_workers=int(os.getenv('MATCH_WORKERS', '8')), thread_name_prefix='match')
+# Side work of a comparison (history writes, trend queries) that overlaps the main path
+pipeline = ThreadPoolExecutor(max_workers=int(os.getenv('PIPELINE_WORKERS', '8')),
+                              thread_name_prefix='pipeline')
+# Re-scrape the most requested items in the background (live scraping only)
+PREWARM_ENABLED = SCRAPER_MODE == 'live' and os.getenv('PREWARM_ENABLED', 'true').lower() == 'true'
+prewarmer = Prewarmer(scrape_items, popularity)
+if PREWARM_ENABLED:
+    prewarmer.start()
+# Old price history is deleted in small batches every RETENTION_INTERVAL hours
+if retention.RETENTION_INTERVAL > 0:
+    retention.RetentionScheduler().start()
+# Maintenance POSTs need this value in the X-Admin-Token header; unset disables them
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+
+def _cache_stats():
+    return {(name, stat): value
+            for name, cache in (("prices", price_cache), ("llm", llm_cache))
+            for stat, value in cache.stats().items()}
+metrics.register(metrics.Gauge('cache_events', 'Cache entries and hit/miss counts',
+                               ('cache', 'stat'), _cache_stats))
+metrics.register(metrics.Gauge('llm_singleflight_shared', 'Gemini calls answered by an in-flight duplicate',
+                               (), lambda: {(): llm_flights.shared}))
+metrics.register(metrics.Gauge('item_parser_requests', 'Item extraction requests by path',
+                               ('path',), lambda: {(k,): v for k, v in item_parser.stats().items()
+                                                   if k != 'hit_rate'}))
+if SCRAPER_MODE == 'live':
+    metrics.register(metrics.Gauge('browser_pool', 'Pooled browser sessions and their memory',
+                                   ('stat',), lambda: {(k,): v for k, v in driver_pool.stats().items()}))
+metrics.register(metrics.Gauge('chat_sessions', 'Live server-side chat sessions',
+                               (), lambda: {(): chat_sessions.stats()['sessions']}))
+if PREWARM_ENABLED:
+    metrics.register(metrics.Gauge('prewarm', 'Background pre-warm queue and lookup counts',
+                                   ('stat',), lambda: {(k,): v for k, v in prewarmer.stats().items()}))
+
+@app.before_request
+def start_request_metrics():
+    g.metrics_start = time.perf_counter()
+    g.metrics_timings = metrics.start_timings()
+    g.metrics_profile = metrics.start_profile()
+
+@app.after_request
+def record_request_metrics(response):
+    start = g.get('metrics_start')
+    if start is None:
+        return response
+    elapsed = time.perf_counter() - start
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.REQUEST_SECONDS.observe(elapsed, method=request.method, endpoint=endpoint,
+                                    status=response.status_code)
+    if g.metrics_timings:
+        response.headers['Server-Timing'] = metrics.server_timing(g.metrics_timings)
+    metrics.finish_profile(g.pop('metrics_profile'), f'{request.method} {request.path}', elapsed)
+    return response
+
+@app.teardown_request
+def stop_request_metrics(exc):
+    metrics.stop_timings()
+    sampler = g.pop('metrics_profile', None)
+    if sampler is not None:
+        sampler.stop()
+
+def generate_content(kind, prompt, stream=False):
+    """Call Gemini, counting the call and timing it as stage llm_<kind>
+
+    With stream=True the response is iterated for chunks as they arrive, and
+    the stage and LLM_TIMEOUT cover only the wait for the stream to open.
+    Raises TimeoutError when Gemini has not answered within LLM_TIMEOUT.
+    """
+    model = genai.GenerativeModel(GEMINI_MODEL)
+    future = llm_calls.submit(model.generate_content, prompt, stream=stream)
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        # Print model name
-        prompt = f"""
-        Extract shopping items from this text: "{user_input}"
-        Return ONLY a JSON array of items in this exact format:
-        ["item1", "item2", "item3"]
-        Rules:
-        - Normalize quantities (e.g., "2 liters milk" → "milk 2L", "dozen eggs" → "eggs 12")
-        - Keep it simple and searchable
-        - Remove unnecessary words
-        - Common formats: "milk 1L", "bread brown", "eggs 12", "rice 5kg"
-        Examples:
-        Input: "I need 2 liters of milk, brown bread and a dozen eggs"
-        Output: ["milk 2L", "bread brown", "eggs 12"]
-        Input: "Get me Amul butter, 1kg rice and cold coffee"
-        Output: ["amul butter", "rice 1kg", "cold coffee"]
-        Return ONLY the JSON array, nothing else.
-        """
-        response = model.generate_content(prompt)
-        print("AI extraction response:", response.text)
-        items_json = response.text.strip()
-        # Clean response
-        items_json = items_json.replace('```json', '').replace('```', '').strip()
-        items = json.loads(items_json)
+        with metrics.stage(f'llm_{kind}'):
+            response = future.result(timeout=LLM_TIMEOUT)
+    except FuturesTimeout:
+        future.cancel()
+        metrics.LLM_CALLS.inc(kind=kind, outcome='timeout')
+        raise TimeoutError(f"Gemini did not answer within {LLM_TIMEOUT:g}s") from None
+    except Exception:
+        metrics.LLM_CALLS.inc(kind=kind, outcome='error')
+        raise
+    metrics.LLM_CALLS.inc(kind=kind, outcome='ok')
+    return response
+def fingerprint(*values):
+    """Stable short hash of JSON-serializable values, for cache keys"""
+    return hashlib.sha256(json.dumps(values, sort_keys=True).encode()).hexdigest()
+def parse_json_response(text):
+    """JSON payload of a Gemini reply, without Markdown code fences"""
+    return json.loads(text.strip().replace('```json', '').replace('```', '').strip())
+def extraction_prompt(user_input):
+    return f"""
+    Extract shopping items from this text: "{user_input}"
+    Return ONLY a JSON array of items in this exact format:
+    ["item1", "item2", "item3"]
+    Rules:
+    - Normalize quantities (e.g., "2 liters milk" → "milk 2L", "dozen eggs" → "eggs 12")
+    - Keep it simple and searchable
+    - Remove unnecessary words
+    - Common formats: "milk 1L", "bread brown", "eggs 12", "rice 5kg"
+    Examples:
+    Input: "I need 2 liters of milk, brown bread and a dozen eggs"
+    Output: ["milk 2L", "bread brown", "eggs 12"]
+    Input: "Get me Amul butter, 1kg rice and cold coffee"
+    Output: ["amul butter", "rice 1kg", "cold coffee"]
+    Return ONLY the JSON array, nothing else.
+    """
+def extraction_key(user_input):
+    return ('extract_items', GEMINI_MODEL, normalize_item(user_input))
+def extract_items_with_ai(user_input):
+    """Use Gemini to extract shopping items from natural language
+
+    Simple lists are handled by the local rule-based parser; Gemini is only
+    called when that parser is not confident about the input.
+    """
+    items, confidence = item_parser.parse_items(user_input)
+    item_parser.record(confidence >= item_parser.FAST_PATH_CONFIDENCE)
+    if confidence >= item_parser.FAST_PATH_CONFIDENCE:
         return items
+    try:
+        def call():
+            response = generate_content('extract', extraction_prompt(user_input))
+            logger.debug("AI extraction response: %s", response.text)
+            return parse_json_response(response.text)
+        key = extraction_key(user_input)
+        return memoize(llm_cache, llm_flights, key, call)
     except Exception as e:
-        print(f"AI extraction error: {e}")
+        logger.warning("AI extraction error: %s", e)
         # Fallback: basic splitting
         return [item.strip() for item in user_input.split(',')]
-def match_products_with_ai(user_item, scraped_products):
-    """Use AI to match user's generic search with specific product names"""
+def match_products_by_name(user_item, scraped_products):
+    """Product whose name best contains the user's item, without calling Gemini
+
+    Scores are trigram overlaps of normalized names; products that mention
+    the item's quantities ("1l", "500g") are preferred.
+    """
+    if not scraped_products:
+        return None
+    alias = normalize(user_item)
+    index = TrigramIndex()
+    for n, product in enumerate(scraped_products):
+        index.add(n, normalize(product['name']))
+    hits = index.search(alias, limit=len(scraped_products), overlap=True)
+    wanted = quantities(alias)
+    best = next((n for n, _ in hits if wanted <= quantities(normalize(scraped_products[n]['name']))),
+                hits[0][0] if hits else 0)
+    return scraped_products[best]
+def match_products_batch_with_ai(match_requests):
+    """Match many (user_item, scraped_products) pairs with a single Gemini call
+
+    Returns the chosen product for each request, in order. Entries the
+    response does not cover, or all of them if the call fails or its answer
+    cannot be parsed, fall back to match_products_by_name.
+    """
+    if not match_requests:
+        return []
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        product_list = "\n".join([f"{i+1}. {p['name']} - ₹{p['price']}"
-                                  for i, p in enumerate(scraped_products)])
+        sections = []
+        for n, (user_item, scraped_products) in enumerate(match_requests, 1):
+            product_list = "\n".join([f"   {i+1}. {p['name']} - ₹{p['price']}"
+                                      for i, p in enumerate(scraped_products)])
+            sections.append(f'Item {n}: "{user_item}"\n{product_list}')
+        basket = "\n".join(sections)
         prompt = f"""
-        User is searching for: "{user_item}"
-        Available products:
-        {product_list}
-        Return the NUMBER (1-{len(scraped_products)}) of the BEST matching product.
+        For each shopping item below, pick the BEST matching product from its list.
+        {basket}
         Consider:
         - Brand relevance
         - Size/quantity match
         - Product type similarity
-        Return ONLY the number, nothing else.
-        If no good match, return "0".
+        Return ONLY a JSON object mapping item number to product number,
+        e.g. {{"1": 2, "2": 1}}. Use 0 when nothing matches.
         """
-        response = model.generate_content(prompt)
-        match_num = int(response.text.strip())
-        if match_num > 0 and match_num <= len(scraped_products):
-            return scraped_products[match_num - 1]
-        return scraped_products[0] if scraped_products else None
+        response = generate_content('match_batch', prompt)
+        matches_json = response.text.strip()
+        matches_json = matches_json.replace('```json', '').replace('```', '').strip()
     except Exception as e:
-        print(f"AI matching error: {e}")
-        return scraped_products[0] if scraped_products else None
+        logger.warning("AI batch matching error: %s", e)
+        return [match_products_by_name(*request) for request in match_requests]
 
-def generate_shopping_insights(comparison_data, price_trends):
-    """Generate AI-powered shopping insights"""
     try:
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        prompt = f"""
-        Analyze this shopping comparison data and provide insights:
-        {json.dumps(comparison_data, indent=2)}
-        Price trends (if available):
-        {json.dumps(price_trends, indent=2)}
-        Generate insights in JSON format:
-        {{
-            "recommendation": "Which platform to use and why (1-2 sentences)",
-            "price_trend": "Are prices rising/falling/stable? (1 sentence)",
-            "savings_tip": "How to maximize savings (1 sentence)",
-            "smart_suggestion": "Should they combine orders or buy from one platform? Why?"
-        }}
-        Be concise, practical, and money-saving focused.
-        Return ONLY the JSON object.
-        """
-        response = model.generate_content(prompt)
-        insights_json = response.text.strip()
-        insights_json = insights_json.replace('```json', '').replace('```', '').strip()
-        insights = json.loads(insights_json)
-        return insights
-    except Exception as e:
-        print(f"AI insights error: {e}")
-        return {
-            "recommendation": "Compare prices above to find the best deal.",
-            "price_trend": "Price data unavailable.",
-            "savings_tip": "Consider delivery fees when choosing a platform.",
-            "smart_suggestion": "Buy all items from the cheapest overall platform to save on delivery."
+        matches = json.loads(matches_json)
+    except ValueError as e:
+        logger.warning("AI batch matching parse error: %s", e)
+        matches = {}
+    results = []
+    for n, (user_item, scraped_products) in enumerate(match_requests, 1):
+        try:
+            match_num = int(matches[str(n)])
+        except (KeyError, TypeError, ValueError):
+            results.append(match_products_by_name(user_item, scraped_products))
+            continue
+        if match_num > 0 and match_num <= len(scraped_products):
+            results.append(scraped_products[match_num - 1])
+        else:
+            results.append(scraped_products[0] if scraped_products else None)
+    return results
+
+def apply_product_matches(platform, platform_data, items, location):
+    """Resolve every item with candidate products on a platform in one AI call"""
+    pending = [(index, result) for index, result in enumerate(platform_data['items'])
+               if result.get('candidates')]
+    if not pending:
+        return
+    matches = match_products_batch_with_ai([(items[index], result['candidates'])
+                                            for index, result in pending])
+    for (index, result), match in zip(pending, matches):
+        del result['candidates']
+        if match:
+            result['name'] = match['name']
+            result['price'] = match['price']
+        # Cache the matched product so later hits skip matching
+        price_cache.set(price_cache_key(platform, items[index], location), dict(result))
+    platform_data.update(calculate_fees(platform, platform_data['items']))
+
+def insights_input(comparison_data, price_trends, optimal_plan):
+    """The parts of a comparison the insights prompt needs, in compact form
+
+    Per platform: total, fees and [name, price] of available items; trends
+    as [avg, min, max] for products with history; the plan's orders only.
+    """
+    platforms = {
+        name: {
+            "total": round(data['total'], 2),
+            "fees": data['delivery_fee'] + data['platform_fee'],
+            "items": [[item['name'], item['price']] for item in data['items'] if item['price'] > 0]
         }
+        for name, data in comparison_data.items()
+    }
+    trends = {product: {platform: [t['avg_price'], t['min_price'], t['max_price']]
+                        for platform, t in by_platform.items()}
+              for product, by_platform in price_trends.items() if by_platform}
+    plan = optimal_plan and {
+        "orders": {platform: order['items'] for platform, order in optimal_plan['orders'].items()},
+        "total": optimal_plan['total'],
+        "savings": optimal_plan['savings'],
+        "unavailable": optimal_plan['unavailable']
+    }
+    return {"platforms": platforms, "trends": trends, "plan": plan}
+def insights_prompt(data):
+    return f"""
+    Analyze this shopping comparison and provide insights.
+    Platforms (total in ₹, fees, [item, price]):
+    {compact(data['platforms'])}
+    Price trends over 7 days, per product and platform as [avg, min, max]:
+    {compact(data['trends'])}
+    Cheapest way to buy the basket (already computed, do not recalculate):
+    {compact(data['plan'])}
+    Generate insights in JSON format:
+    {{
+        "recommendation": "Which platform to use and why (1-2 sentences)",
+        "price_trend": "Are prices rising/falling/stable? (1 sentence)",
+        "savings_tip": "How to maximize savings (1 sentence)"
+    }}
+    Be concise, practical, and money-saving focused.
+    Return ONLY the JSON object.
+    """
+def insights_key(data):
+    return ('insights', GEMINI_MODEL, fingerprint(data))
+def smart_suggestion(optimal_plan):
+    if optimal_plan:
+        return describe_plan(optimal_plan)
+    return "Buy all items from the cheapest overall platform to save on delivery."
+def fallback_insights(optimal_plan):
+    """Insights to show when Gemini is unavailable"""
+    return {
+        "recommendation": "Compare prices above to find the best deal.",
+        "price_trend": "Price data unavailable.",
+        "savings_tip": "Consider delivery fees when choosing a platform.",
+        "smart_suggestion": smart_suggestion(optimal_plan)
+    }
+def pending_insights(optimal_plan, job):
+    """Fallback insights pointing at the follow-up URL of a late Gemini call"""
+    return {**fallback_insights(optimal_plan), "pending": True,
+            "insights_url": f"/api/insights/{job.id}"}
+def _insights_job(comparison_data, price_trends, optimal_plan, emit=None):
+    return generate_shopping_insights(comparison_data, price_trends, optimal_plan)
+def request_insights(comparison, budget=None):
+    """Insights for a prepared comparison, waiting at most budget seconds
+
+    Returns (insights, job). job is None when the insights are final;
+    otherwise they are fallbacks and the Gemini call keeps running in job.
+    """
+    budget = INSIGHTS_BUDGET if budget is None else budget
+    try:
+        job = insights_jobs.submit(_insights_job, comparison['platforms'],
+                                   comparison['price_trends'], comparison['optimal_plan'])
+    except JobQueueFull:
+        logger.warning("Insights queue full, using fallback insights")
+        return fallback_insights(comparison['optimal_plan']), None
+    if job.wait(budget):
+        if job.status == DONE:
+            return job.result, None
+        return fallback_insights(comparison['optimal_plan']), None
+    return pending_insights(comparison['optimal_plan'], job), job
+def generate_shopping_insights(comparison_data, price_trends, optimal_plan=None):
+    """Generate AI-powered shopping insights
+
+    The split-or-single-platform question is answered by the optimizer;
+    its plan is given to the model as a fact and becomes smart_suggestion.
+    """
+    try:
+        data = insights_input(comparison_data, price_trends, optimal_plan)
+        def call():
+            return parse_json_response(generate_content('insights', insights_prompt(data)).text)
+        key = insights_key(data)
+        insights = memoize(llm_cache, llm_flights, key, call, ttl=INSIGHTS_CACHE_TTL)
+        return {**insights, "smart_suggestion": smart_suggestion(optimal_plan)}
+    except Exception as e:
+        logger.warning("AI insights error: %s", e)
+        return fallback_insights(optimal_plan)
 #working fine        
+@app.route('/api/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Counters, gauges and latency histograms in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/metrics/slow-requests', methods=['GET'])
+def slow_request_profiles():
+    """Sampled stack profiles of recent slow requests (needs PROFILE_SLOW_MS)"""
+    return jsonify({"threshold_ms": metrics.PROFILE_SLOW_MS, "profiles": metrics.recent_profiles()})
+
+def admin_denied(action):
+    """403 response unless the X-Admin-Token header matches ADMIN_TOKEN, else None"""
+    if not ADMIN_TOKEN:
+        return jsonify({"error": f"{action} over the API is disabled"}), 403
+    if not hmac.compare_digest(request.headers.get('X-Admin-Token', ''), ADMIN_TOKEN):
+        return jsonify({"error": "Invalid admin token"}), 403
+    return None
+
+@app.route('/api/maintenance/retention', methods=['GET'])
+def retention_status():
+    """Progress of the running retention pass and the outcome of the last one"""
+    return jsonify(retention.status())
+
+@app.route('/api/maintenance/retention', methods=['POST'])
+def start_retention():
+    """Start a retention pass in the background; body may set "days"
+
+    Only with the X-Admin-Token header matching ADMIN_TOKEN; without one
+    configured, retention runs from the scheduler or retention.py only.
+    """
+    denied = admin_denied("Starting retention")
+    if denied:
+        return denied
+    data = request.get_json(silent=True)
+    if data is None:
+        data = {}
+    if not isinstance(data, dict):
+        return jsonify({"error": "Body must be a JSON object"}), 400
+    days = data.get('days', retention.RETENTION_DAYS)
+    if isinstance(days, bool) or not isinstance(days, int):
+        return jsonify({"error": "days must be an integer"}), 400
+    if days < 1:
+        return jsonify({"error": "days must be at least 1"}), 400
+    if not retention.start_retention(days):
+        return jsonify({"error": "Retention is already running", **retention.status()}), 409
+    return jsonify(retention.status()), 202
+
 @app.route('/api/health', methods=['GET'])
 def health_check():
     return jsonify({"status": "healthy", "timestamp": datetime.now().isoformat()})
@@ -124,89 +439,402 @@ def extract_items():
     except Exception as e:
         return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
 
+def summarize_platform(platform_data):
+    """Item and fee totals for one platform's scrape result"""
+    items_total = sum(item['price'] for item in platform_data['items']
+                    if item['price'] > 0)
+    delivery_fee = platform_data.get('delivery_fee', 0)
+    platform_fee = platform_data.get('platform_fee', 0)
+    return {
+        "items_total": items_total,
+        "delivery_fee": delivery_fee,
+        "platform_fee": platform_fee,
+        "total": items_total + delivery_fee + platform_fee,
+        "items": platform_data['items']
+    }
+
+def run_comparison(items, location, emit=None, platforms=None):
+    """Scrape, total, record history and generate insights for a basket
+
+    emit(event, data), if given, receives each platform's totals as soon as
+    they are ready and the insights last, for the streaming job API.
+    platforms optionally restricts the comparison to those platform names.
+    """
+    with metrics.collect_timings() as timings:
+        comparison = prepare_comparison(items, location, emit, platforms)
+        with metrics.stage('insights'):
+            insights, late = request_insights(comparison)
+    log_comparison(items, comparison, timings)
+    if late is not None and emit:
+        # Streaming clients get the fallback now and the real insights when ready
+        emit('insights', insights)
+        # Past that, the pending insights already sent still point at /api/insights/<id>
+        if late.wait(LLM_TIMEOUT):
+            insights = late.result if late.status == DONE else fallback_insights(comparison['optimal_plan'])
+    return comparison_result(comparison, insights, emit)
+
+def log_comparison(items, comparison, timings):
+    logger.info("Compared %d items on %d platforms: %s", len(items), len(comparison['platforms']),
+                metrics.server_timing(timings))
+
+def save_history(rows):
+    with metrics.stage('history_write'):
+        save_price_history_bulk(rows)
+
+def prepare_comparison(items, location, emit=None, platforms=None):
+    """Everything in a comparison before the insights call
+
+    Returns platform totals, the cheapest platform, the optimal plan and
+    price trends; the insights are added by comparison_result.
+    """
+    def match_platform(platform_name, platform_data):
+        apply_product_matches(platform_name, platform_data, items, location)
+        if emit:
+            emit('platform', {"platform": platform_name, **summarize_platform(platform_data)})
+
+    # Platforms are matched in parallel, off the thread collecting scrape results
+    matches = []
+    def on_platform_done(platform_name, platform_data):
+        matches.append(matching.submit(match_platform, platform_name, platform_data))
+
+    popularity.record(items, location)
+    # Scrape prices from all platforms
+    if SCRAPER_MODE == 'live':
+        with metrics.stage('scrape'):
+            all_results = scrape_all_platforms(items, location, on_platform_done=on_platform_done,
+                                               platforms=platforms)
+    else:
+        with metrics.stage('scrape'):
+            all_results = mock_scrape_all_platforms(items, location, platforms=platforms)
+        for platform_name, platform_data in all_results.items():
+            on_platform_done(platform_name, platform_data)
+    # Time spent waiting on matching beyond the overlap with scraping
+    with metrics.stage('match'):
+        for future in matches:
+            future.result()
+    logger.debug("Scrape results: %s", all_results)
+    # Calculate total costs per platform
+    platform_totals = {platform_name: summarize_platform(platform_data)
+                       for platform_name, platform_data in all_results.items()}
+    # Find cheapest platform
+    cheapest_platform = min(platform_totals.items(),
+                          key=lambda x: x[1]['total'])[0]
+    # Save price history in the background; nothing later in the request reads it
+    history_rows = [(item['name'], platform, item['price'])
+                    for platform, data in platform_totals.items()
+                    for item in data['items'] if item['price'] > 0]
+    if HISTORY_WRITE_BEHIND:
+        get_history_writer().enqueue(history_rows)
+    else:
+        pipeline.submit(save_history, history_rows)
+    # Trends are queried while the plan is computed
+    names = [item['name'] for platform in platform_totals.values()
+             for item in platform['items'] if item['price'] > 0]
+    trends_future = pipeline.submit(get_price_trends_bulk, names)
+    # Cheapest plan, possibly split across platforms
+    with metrics.stage('optimize'):
+        optimal_plan = optimize_basket(items, all_results)
+    # Time spent waiting on trends beyond the overlap
+    with metrics.stage('trends'):
+        price_trends = trends_future.result()
+    return {
+        "platforms": platform_totals,
+        "cheapest_platform": cheapest_platform,
+        "optimal_plan": optimal_plan,
+        "price_trends": price_trends
+    }
+
+def comparison_result(comparison, insights, emit=None):
+    """Response body for a prepared comparison and its insights"""
+    if emit:
+        emit('insights', insights)
+    return {
+        "platforms": comparison['platforms'],
+        "cheapest_platform": comparison['cheapest_platform'],
+        "optimal_plan": comparison['optimal_plan'],
+        "insights": insights,
+        # Chat about this comparison by session id instead of resending it
+        "chat_session_id": chat_sessions.create(comparison),
+        "timestamp": datetime.now().isoformat()
+    }
+
 @app.route('/api/compare-prices', methods=['POST'])
 def compare_prices():
     """Compare prices across all platforms"""
-    print("*********Received price comparison request**********")
     try:
         data = request.json
         items = data.get('items', [])
         location = data.get('location', 'Pune')
+        platforms = data.get('platforms')
         if not items:
             return jsonify({"error": "No items provided"}), 400
-        # Scrape prices from all platforms
-        all_results = mock_scrape_all_platforms(items, location)
-        print("*************", all_results)
-        # Calculate total costs per platform
-        platform_totals = {}
-        for platform_name, platform_data in all_results.items():
-            items_total = sum(item['price'] for item in platform_data['items']
-                            if item['price'] > 0)
-            delivery_fee = platform_data.get('delivery_fee', 0)
-            platform_fee = platform_data.get('platform_fee', 0)
-            total = items_total + delivery_fee + platform_fee
-            platform_totals[platform_name] = {
-                "items_total": items_total,
-                "delivery_fee": delivery_fee,
-                "platform_fee": platform_fee,
-                "total": total,
-                "items": platform_data['items']
-            }
-        # Find cheapest platform
-        cheapest_platform = min(platform_totals.items(),
-                              key=lambda x: x[1]['total'])[0]
-        # Save price history
-        for platform, data in platform_totals.items():
-            for item in data['items']:
-                if item['price'] > 0:
-                    save_price_history(item['name'], platform, item['price'])
-        # Get price trends
-        price_trends = {}
-        for item_name in [item['name'] for platform in platform_totals.values()
-                         for item in platform['items'] if item['price'] > 0]:
-            price_trends[item_name] = get_price_trends(item_name)
-        # Generate AI insights
-        insights = generate_shopping_insights(platform_totals, price_trends)
+        error = platforms is not None and platform_selection_error(platforms)
+        if error:
+            return jsonify(error), 400
+        return jsonify(run_comparison(items, location, platforms=platforms))
+    except Exception as e:
+        return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
+
+@app.route('/api/insights/<insights_id>', methods=['GET'])
+def get_late_insights(insights_id):
+    """Insights that missed a comparison's budget; 202 while still pending
+
+    ?wait=<seconds> (up to 30) holds the request until they are ready.
+    """
+    job = insights_jobs.get(insights_id)
+    if job is None:
+        return jsonify({"error": "Insights not found"}), 404
+    try:
+        wait = min(max(float(request.args.get('wait', 0)), 0), 30)
+    except ValueError:
+        return jsonify({"error": "wait must be a number"}), 400
+    if not job.wait(wait):
+        return jsonify({"insights_id": job.id, "status": job.status}), 202
+    if job.status != DONE:
+        return jsonify({"insights_id": job.id, "status": job.status, "error": job.error}), 500
+    return jsonify({"insights_id": job.id, "status": job.status, "insights": job.result})
+
+@app.route('/api/compare-prices/jobs', methods=['POST'])
+def create_comparison_job():
+    """Start a price comparison in the background and return its job id"""
+    try:
+        data = request.json
+        items = data.get('items', [])
+        location = data.get('location', 'Pune')
+        platforms = data.get('platforms')
+        if not items:
+            return jsonify({"error": "No items provided"}), 400
+        error = platforms is not None and platform_selection_error(platforms)
+        if error:
+            return jsonify(error), 400
+        job = job_manager.submit(run_comparison, items, location, platforms=platforms)
         return jsonify({
-            "platforms": platform_totals,
-            "cheapest_platform": cheapest_platform,
-            "insights": insights,
-            "timestamp": datetime.now().isoformat()
-        })
+            "job_id": job.id,
+            "status": job.status,
+            "poll_url": f"/api/compare-prices/jobs/{job.id}",
+            "stream_url": f"/api/compare-prices/jobs/{job.id}/stream"
+        }), 202
+    except JobQueueFull as e:
+        return jsonify({"error": str(e)}), 503
     except Exception as e:
         return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
 
+@app.route('/api/compare-prices/jobs/<job_id>', methods=['GET'])
+def get_comparison_job(job_id):
+    """Poll a comparison job: status, events so far and the final result"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify(job.to_dict())
+
+@app.route('/api/compare-prices/jobs/<job_id>/stream', methods=['GET'])
+def stream_comparison_job(job_id):
+    """Server-Sent Events: one event per platform, then insights, then done"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+
+    def generate():
+        sent = 0
+        while True:
+            events = job.wait_for_events(sent, timeout=15)
+            for event in events:
+                yield f"event: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+            sent += len(events)
+            if job.finished is not None and sent == len(job.events):
+                break
+            if not events:
+                # Keep proxies from closing an idle connection
+                yield ": keep-alive\n\n"
+        if job.status == DONE:
+            yield f"event: done\ndata: {json.dumps(job.result)}\n\n"
+        else:
+            yield f"event: error\ndata: {json.dumps({'error': job.error})}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+def _list_arg(name):
+    """Query parameter given as repeated keys and/or comma-separated values"""
+    return [v.strip() for raw in request.args.getlist(name) for v in raw.split(',') if v.strip()]
+
+@app.route('/api/history', methods=['GET'])
+def price_history_chart():
+    """Chart series for many products/platforms, downsampled server-side
+
+    Query: products (required), platforms, days (default 30), points
+    (default 100), method (lttb or minmax). Responses carry an ETag so
+    unchanged charts revalidate with a 304.
+    """
+    try:
+        products = _list_arg('products')
+        platforms = _list_arg('platforms') or None
+        days = min(max(int(request.args.get('days', 30)), 1), 365)
+        points = min(max(int(request.args.get('points', 100)), 2), 2000)
+        method = request.args.get('method', 'lttb')
+        if not products:
+            return jsonify({"error": "No products provided"}), 400
+        if method not in DOWNSAMPLE_METHODS:
+            return jsonify({"error": f"method must be one of {', '.join(DOWNSAMPLE_METHODS)}"}), 400
+
+        resolution = 'hour' if days <= 7 else 'day'
+        fmt = '%Y-%m-%d %H:00' if resolution == 'hour' else '%Y-%m-%d'
+        series = []
+        for (product, platform), rows in get_price_series_bulk(products, platforms, days, resolution).items():
+            xy = [(datetime.strptime(bucket, fmt).timestamp(), price) for bucket, price in rows]
+            sampled = downsample(xy, points, method)
+            series.append({
+                "product": product,
+                "platform": platform,
+                "points": [{"date": datetime.fromtimestamp(x).strftime(fmt), "price": round(y, 2)}
+                           for x, y in sampled]
+            })
+
+        response = jsonify({"resolution": resolution, "days": days, "series": series})
+        response.set_etag(hashlib.sha256(response.get_data()).hexdigest())
+        response.cache_control.public = True
+        response.cache_control.max_age = HISTORY_CACHE_MAX_AGE
+        return response.make_conditional(request)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e), "trace": traceback.format_exc()}), 500
+
+@app.route('/api/history/export', methods=['GET'])
+def export_history():
+    """Stream price history as CSV or NDJSON, chunk by chunk (admin token required)"""
+    denied = admin_denied("Exporting history")
+    if denied:
+        return denied
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+    chunks = iter_export(fmt, request.args.get('since'), request.args.get('until'))
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers={
+        "Content-Disposition": f"attachment; filename=price_history.{fmt}"
+    })
+
+@app.route('/api/history/import', methods=['POST'])
+def import_history():
+    """Load CSV or NDJSON price history from the request body without buffering it
+
+    Needs the admin token. Rows are committed in batches, so a failed import
+    reports rows_committed: the rows before the failing batch that were saved.
+    """
+    denied = admin_denied("Importing history")
+    if denied:
+        return denied
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({"error": "format must be csv or ndjson"}), 400
+    try:
+        lines = io.TextIOWrapper(request.stream, encoding='utf-8', newline='')
+        count = import_price_history(iter_import_rows(lines, fmt))
+        return jsonify({"imported": count})
+    except ImportAborted as e:
+        if isinstance(e.error, (ValueError, csv.Error)):
+            return jsonify({"error": f"Invalid {fmt} input: {e.error}", "line": getattr(e.error, 'line', None),
+                            "rows_committed": e.rows_committed}), 400
+        return jsonify({"error": str(e.error), "rows_committed": e.rows_committed,
+                        "trace": traceback.format_exc()}), 500
+
+def chat_prompt(user_message, context, history=()):
+    """Prompt for one chat turn; context is the session's compact comparison summary"""
+    turns = ''.join(f'\n    User: {question}\n    Assistant: {answer}' for question, answer in history)
+    return f"""
+    You are a smart shopping assistant for Indian quick-commerce platforms.
+    Comparison summary (totals in ₹ per platform, cheapest platform, optimal
+    plan, and price gaps as [item, cheapest platform, price, dearest platform, price]):
+    {context}
+    Conversation so far:{turns or ' (none)'}
+    User question: "{user_message}"
+    Provide a helpful, concise response (2-3 sentences max).
+    Focus on:
+    - Price trends
+    - Money-saving tips
+    - Platform recommendations
+    - Product availability
+    Be conversational and friendly.
+    """
+def chat_session(data):
+    """(session id, session) for a chat request, or (None, None) if the id has expired
+
+    Requests without a session_id start a session from their context, so
+    older clients that send the comparison every turn keep working.
+    """
+    session_id = data.get('session_id')
+    if not session_id:
+        session_id = chat_sessions.create(data.get('context'))
+    session = chat_sessions.get(session_id)
+    return (session_id, session) if session is not None else (None, None)
+
+def stream_chat(session_id, user_message, prompt):
+    """Server-Sent Events: a token event per chunk from Gemini, then done"""
+    def generate():
+        parts = []
+        try:
+            for chunk in generate_content('chat', prompt, stream=True):
+                parts.append(chunk.text)
+                yield f"event: token\ndata: {json.dumps({'text': chunk.text})}\n\n"
+            answer = ''.join(parts).strip()
+            chat_sessions.add_turn(session_id, user_message, answer)
+            done = {"answer": answer, "session_id": session_id, "timestamp": datetime.now().isoformat()}
+            yield f"event: done\ndata: {json.dumps(done)}\n\n"
+        except Exception as e:
+            logger.warning("Chat stream error: %s", e)
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
 
 @app.route('/api/chat', methods=['POST'])
 def chat():
-    """Conversational AI assistant"""
+    """Conversational AI assistant
+
+    Body: message, and session_id (from a comparison result or an earlier
+    turn) or context. With "stream": true the answer is sent as
+    Server-Sent Events. An expired session_id gets a 404; resend the
+    context to start a new session.
+    """
     try:
         data = request.json
         user_message = data.get('message', '')
-        context = data.get('context', {})
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        prompt = f"""
-        You are a smart shopping assistant for Indian quick-commerce platforms.
-        User question: "{user_message}"
-        Context (previous comparison data):
-        {json.dumps(context, indent=2)}
-        Provide a helpful, concise response (2-3 sentences max).
-        Focus on:
-        - Price trends
-        - Money-saving tips
-        - Platform recommendations
-        - Product availability
-        Be conversational and friendly.
-        """
-        response = model.generate_content(prompt)
+        session_id, session = chat_session(data)
+        if session is None:
+            return jsonify({"error": "Chat session not found or expired"}), 404
+        prompt = chat_prompt(user_message, session['context'], session['history'])
+        if data.get('stream'):
+            return stream_chat(session_id, user_message, prompt)
+        response = generate_content('chat', prompt)
         answer = response.text.strip()
+        chat_sessions.add_turn(session_id, user_message, answer)
         return jsonify({
             "answer": answer,
+            "session_id": session_id,
             "timestamp": datetime.now().isoformat()
         })
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def substitute_prompt(product_name, reason):
+    return f"""
+    Product: "{product_name}"
+    Issue: {reason}
+    Suggest 2-3 substitute products available in Indian quick-commerce.
+    Return JSON format:
+    {{
+        "substitutes": [
+            {{"name": "Product 1", "reason": "Why it's a good substitute"}},
+            {{"name": "Product 2", "reason": "Why it's a good substitute"}}
+        ]
+    }}
+    Return ONLY the JSON.
+    """
+def substitute_key(product_name, reason):
+    return ('substitute', GEMINI_MODEL, normalize_item(product_name), normalize_item(reason))
+
 @app.route('/api/substitute', methods=['POST'])
 def suggest_substitute():
     """Suggest product substitutes"""
@@ -214,24 +842,11 @@ def suggest_substitute():
         data = request.json
         product_name = data.get('product', '')
         reason = data.get('reason', 'out of stock')
-        model = genai.GenerativeModel('gemini-2.5-flash')
-        prompt = f"""
-        Product: "{product_name}"
-        Issue: {reason}
-        Suggest 2-3 substitute products available in Indian quick-commerce.
-        Return JSON format:
-        {{
-            "substitutes": [
-                {{"name": "Product 1", "reason": "Why it's a good substitute"}},
-                {{"name": "Product 2", "reason": "Why it's a good substitute"}}
-            ]
-        }}
-        Return ONLY the JSON.
-        """
-        response = model.generate_content(prompt)
-        suggestions_json = response.text.strip()
-        suggestions_json = suggestions_json.replace('```json', '').replace('```', '').strip()
-        suggestions = json.loads(suggestions_json)
+        def call():
+            response = generate_content('substitute', substitute_prompt(product_name, reason))
+            return parse_json_response(response.text)
+        key = substitute_key(product_name, reason)
+        suggestions = memoize(llm_cache, llm_flights, key, call)
         return jsonify(suggestions)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,270 @@
+"""ASGI entry point: the same API served from a single asyncio event loop
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+
+Gemini calls use generate_content_async, so waiting on the model holds no
+thread. Scraping and SQLite have no async drivers, so they run in worker
+threads via asyncio.to_thread. Every await has a timeout, and a client
+that disconnects cancels its request. Routes without an async version
+(comparison jobs and their event streams, late insights, history,
+export/import, metrics) are handled by the Flask app mounted underneath. Every route
+and JSON body therefore matches app.py.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import traceback
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import google.generativeai as genai
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+import app as backend
+import item_parser
+import metrics
+from cache import llm_cache, allm_flights, amemoize
+from chat import chat_sessions
+from platforms import platform_selection_error
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on one Gemini call, shared with the Flask app
+LLM_TIMEOUT = backend.LLM_TIMEOUT
+# Upper bound on scraping, matching and DB work for one comparison
+COMPARE_TIMEOUT = float(os.getenv('COMPARE_TIMEOUT', '60'))
+# Threads for blocking work (scrapers, SQLite) and for the mounted Flask routes
+ASGI_THREADS = int(os.getenv('ASGI_THREADS', '32'))
+
+
+async def generate_content(kind, prompt, stream=False):
+    """Awaitable generate_content with LLM_TIMEOUT, counted like app.generate_content
+
+    With stream=True the timeout covers opening the stream; iterate the
+    response with async for to receive chunks.
+    """
+    model = genai.GenerativeModel(backend.GEMINI_MODEL)
+    start = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(model.generate_content_async(prompt, stream=stream), LLM_TIMEOUT)
+    except asyncio.TimeoutError:
+        metrics.LLM_CALLS.inc(kind=kind, outcome='timeout')
+        raise asyncio.TimeoutError(f"Gemini did not answer within {LLM_TIMEOUT:g}s") from None
+    except Exception:
+        metrics.LLM_CALLS.inc(kind=kind, outcome='error')
+        raise
+    finally:
+        metrics.STAGE_SECONDS.observe(time.perf_counter() - start, stage=f'llm_{kind}')
+    metrics.LLM_CALLS.inc(kind=kind, outcome='ok')
+    return response
+
+
+async def extract_items_with_ai(user_input):
+    items, confidence = item_parser.parse_items(user_input)
+    item_parser.record(confidence >= item_parser.FAST_PATH_CONFIDENCE)
+    if confidence >= item_parser.FAST_PATH_CONFIDENCE:
+        return items
+    try:
+        async def call():
+            response = await generate_content('extract', backend.extraction_prompt(user_input))
+            return backend.parse_json_response(response.text)
+        return await amemoize(llm_cache, allm_flights, backend.extraction_key(user_input), call)
+    except Exception as e:
+        logger.warning("AI extraction error: %s", e)
+        return [item.strip() for item in user_input.split(',')]
+
+
+async def generate_shopping_insights(comparison):
+    optimal_plan = comparison['optimal_plan']
+    try:
+        data = backend.insights_input(comparison['platforms'], comparison['price_trends'], optimal_plan)
+
+        async def call():
+            prompt = backend.insights_prompt(data)
+            return backend.parse_json_response((await generate_content('insights', prompt)).text)
+        key = backend.insights_key(data)
+        insights = await amemoize(llm_cache, allm_flights, key, call, ttl=backend.INSIGHTS_CACHE_TTL)
+        return {**insights, "smart_suggestion": backend.smart_suggestion(optimal_plan)}
+    except Exception as e:
+        logger.warning("AI insights error: %s", e)
+        return backend.fallback_insights(optimal_plan)
+
+
+async def request_insights(comparison):
+    """Insights within INSIGHTS_BUDGET, else fallbacks plus a follow-up URL
+
+    A late Gemini call keeps running as a task whose result is published
+    through the same insights job store as app.request_insights uses.
+    """
+    task = asyncio.ensure_future(generate_shopping_insights(comparison))
+    try:
+        return await asyncio.wait_for(asyncio.shield(task), backend.INSIGHTS_BUDGET)
+    except asyncio.TimeoutError:
+        job = backend.insights_jobs.track()
+        task.add_done_callback(lambda t: job.finish(error='cancelled') if t.cancelled()
+                               else job.finish(t.result()))
+        return backend.pending_insights(comparison['optimal_plan'], job)
+
+
+def _prepare_comparison(items, location, platforms):
+    """prepare_comparison in a worker thread, returning its stage timings too"""
+    with metrics.collect_timings() as timings:
+        comparison = backend.prepare_comparison(items, location, platforms=platforms)
+    return comparison, dict(timings)
+
+
+def timed(handler):
+    """Record a native route in the request latency histogram, like the Flask hooks"""
+    async def wrapper(request):
+        start = time.perf_counter()
+        status = 500
+        try:
+            response = await handler(request)
+            status = response.status_code
+            return response
+        finally:
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method,
+                                            endpoint=request.url.path, status=status)
+    return wrapper
+
+
+@timed
+async def health_check(request):
+    return JSONResponse({"status": "healthy", "timestamp": datetime.now().isoformat()})
+
+
+@timed
+async def extract_items(request):
+    """Extract items from natural language input"""
+    try:
+        data = await request.json()
+        user_input = data.get('input', '')
+        if not user_input:
+            return JSONResponse({"error": "No input provided"}, status_code=400)
+        items = await extract_items_with_ai(user_input)
+        return JSONResponse({"items": items, "count": len(items)})
+    except Exception as e:
+        return JSONResponse({"error": str(e), "trace": traceback.format_exc()}, status_code=500)
+
+
+@timed
+async def compare_prices(request):
+    """Compare prices across all platforms"""
+    try:
+        data = await request.json()
+        items = data.get('items', [])
+        location = data.get('location', 'Pune')
+        platforms = data.get('platforms')
+        if not items:
+            return JSONResponse({"error": "No items provided"}, status_code=400)
+        error = platforms is not None and platform_selection_error(platforms)
+        if error:
+            return JSONResponse(error, status_code=400)
+
+        comparison, timings = await asyncio.wait_for(
+            asyncio.to_thread(_prepare_comparison, items, location, platforms), COMPARE_TIMEOUT)
+        start = time.perf_counter()
+        insights = await request_insights(comparison)
+        timings['insights'] = time.perf_counter() - start
+        metrics.STAGE_SECONDS.observe(timings['insights'], stage='insights')
+
+        backend.log_comparison(items, comparison, timings)
+        return JSONResponse(backend.comparison_result(comparison, insights),
+                            headers={"Server-Timing": metrics.server_timing(timings)})
+    except asyncio.TimeoutError:
+        return JSONResponse({"error": f"Comparison took longer than {COMPARE_TIMEOUT:g}s"},
+                            status_code=504)
+    except Exception as e:
+        return JSONResponse({"error": str(e), "trace": traceback.format_exc()}, status_code=500)
+
+
+def stream_chat(session_id, user_message, prompt):
+    """Server-Sent Events: a token event per chunk from Gemini, then done"""
+    async def generate():
+        parts = []
+        try:
+            async for chunk in await generate_content('chat', prompt, stream=True):
+                parts.append(chunk.text)
+                yield f"event: token\ndata: {json.dumps({'text': chunk.text})}\n\n"
+            answer = ''.join(parts).strip()
+            chat_sessions.add_turn(session_id, user_message, answer)
+            done = {"answer": answer, "session_id": session_id, "timestamp": datetime.now().isoformat()}
+            yield f"event: done\ndata: {json.dumps(done)}\n\n"
+        except Exception as e:
+            logger.warning("Chat stream error: %s", e)
+            yield f"event: error\ndata: {json.dumps({'error': str(e)})}\n\n"
+
+    return StreamingResponse(generate(), media_type='text/event-stream',
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@timed
+async def chat(request):
+    """Conversational AI assistant, with the same sessions and streaming as app.chat"""
+    try:
+        data = await request.json()
+        user_message = data.get('message', '')
+        session_id, session = backend.chat_session(data)
+        if session is None:
+            return JSONResponse({"error": "Chat session not found or expired"}, status_code=404)
+        prompt = backend.chat_prompt(user_message, session['context'], session['history'])
+        if data.get('stream'):
+            return stream_chat(session_id, user_message, prompt)
+        response = await generate_content('chat', prompt)
+        answer = response.text.strip()
+        chat_sessions.add_turn(session_id, user_message, answer)
+        return JSONResponse({
+            "answer": answer,
+            "session_id": session_id,
+            "timestamp": datetime.now().isoformat()
+        })
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@timed
+async def suggest_substitute(request):
+    """Suggest product substitutes"""
+    try:
+        data = await request.json()
+        product_name = data.get('product', '')
+        reason = data.get('reason', 'out of stock')
+
+        async def call():
+            response = await generate_content('substitute', backend.substitute_prompt(product_name, reason))
+            return backend.parse_json_response(response.text)
+        key = backend.substitute_key(product_name, reason)
+        return JSONResponse(await amemoize(llm_cache, allm_flights, key, call))
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # to_thread uses the loop's default executor; size it for blocking scrapes
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix='asgi'))
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route('/api/health', health_check, methods=['GET']),
+        Route('/api/extract-items', extract_items, methods=['POST']),
+        Route('/api/compare-prices', compare_prices, methods=['POST']),
+        Route('/api/chat', chat, methods=['POST']),
+        Route('/api/substitute', suggest_substitute, methods=['POST']),
+        Mount('/', app=WSGIMiddleware(backend.app, workers=ASGI_THREADS)),
+    ],
+    middleware=[Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'],
+                           allow_headers=['*'])],
+    lifespan=lifespan,
+)
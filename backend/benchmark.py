@@ -0,0 +1,340 @@
+"""Offline benchmarks for the comparison pipeline
+
+Needs no network or API key: scraping goes through
+mock_scrape_all_platforms, Gemini is replaced by a stub with configurable
+latency and price_history is filled with synthetic rows in a temporary
+database. Results are written as JSON; pass --baseline with an earlier
+results file to print how each latency moved.
+
+    python benchmark.py --output bench.json
+    python benchmark.py --rows 10000,1000000,10000000 --skip endpoints,throughput  # large histories
+    python benchmark.py --baseline bench.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import threading
+import tracemalloc
+import contextlib
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+
+def log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+def int_list(value):
+    return [int(v) for v in value.split(',') if v.strip()]
+
+
+def summarize(samples):
+    """Latency percentiles in milliseconds for a list of durations in seconds"""
+    ordered = sorted(samples)
+    if not ordered:
+        return {"count": 0}
+
+    def pct(p):
+        return round(ordered[min(int(p / 100 * len(ordered)), len(ordered) - 1)] * 1000, 3)
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": pct(50),
+        "p90_ms": pct(90),
+        "p99_ms": pct(99),
+        "max_ms": round(ordered[-1] * 1000, 3)
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def max_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+@contextlib.contextmanager
+def traced(result):
+    """Record the peak Python heap allocated inside the block in result"""
+    tracemalloc.start()
+    try:
+        yield
+    finally:
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result["peak_alloc_mb"] = round(peak / (1024 * 1024), 2)
+        result["max_rss_mb"] = max_rss_mb()
+
+
+class _StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """Stands in for genai.GenerativeModel, answering each prompt kind offline"""
+    latency = 0.0
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def generate_content(self, prompt, **kwargs):
+        time.sleep(self.latency)
+        if 'JSON array of items' in prompt:
+            return _StubResponse('["milk 1L", "bread brown"]')
+        if 'mapping item number to product number' in prompt:
+            return _StubResponse('{}')
+        if 'Return ONLY the number' in prompt:
+            return _StubResponse('1')
+        if '"recommendation"' in prompt:
+            return _StubResponse(json.dumps({
+                "recommendation": "Stub recommendation.",
+                "price_trend": "Stable.",
+                "savings_tip": "Stub tip."
+            }))
+        return _StubResponse('{"substitutes": [], "tip": "Stub."}')
+
+
+def synthetic_history(rows, products, platforms, days, seed=0):
+    """Yield price_history rows spread uniformly over the last `days` days"""
+    rng = random.Random(seed)
+    base = {product: rng.uniform(20, 400) for product in products}
+    start = datetime.now() - timedelta(days=days)
+    span = days * 86400
+    for _ in range(rows):
+        product = rng.choice(products)
+        timestamp = start + timedelta(seconds=rng.random() * span)
+        yield (product, rng.choice(platforms), round(base[product] * rng.uniform(0.85, 1.15), 2),
+               timestamp.strftime('%Y-%m-%d %H:%M:%S'))
+
+
+def product_names(count):
+    import item_parser
+    terms = sorted(item_parser.GROCERY_TERMS)
+    return [terms[i % len(terms)] + ('' if i < len(terms) else f' {i // len(terms)}')
+            for i in range(count)]
+
+
+def basket(size, rng):
+    import item_parser
+    return rng.sample(sorted(item_parser.GROCERY_TERMS), size)
+
+
+def bench_endpoints(app, args):
+    """Latency of the main endpoints for each basket size, one client"""
+    client = app.test_client()
+    rng = random.Random(1)
+    results = {"compare_prices": {}}
+    with traced(results):
+        for size in args.basket_sizes:
+            results["compare_prices"][str(size)] = timed(
+                lambda: client.post('/api/compare-prices', json={"items": basket(size, rng)}),
+                args.iterations)
+        results["extract_items"] = timed(
+            lambda: client.post('/api/extract-items',
+                                json={"input": "2 liters of milk, brown bread and a dozen eggs"}),
+            args.iterations)
+        results["history"] = timed(
+            lambda: client.get('/api/history?products=milk,bread,eggs&days=30&points=100'),
+            args.iterations)
+    return results
+
+
+def bench_throughput(app, args):
+    """Requests per second of /api/compare-prices with concurrent clients"""
+    results = {}
+    size = args.basket_sizes[len(args.basket_sizes) // 2]
+    for clients in args.clients:
+        samples = []
+        lock = threading.Lock()
+
+        def worker(seed):
+            client = app.test_client()
+            rng = random.Random(seed)
+            for _ in range(args.requests_per_client):
+                start = time.perf_counter()
+                client.post('/api/compare-prices', json={"items": basket(size, rng)})
+                with lock:
+                    samples.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as pool:
+            list(pool.map(worker, range(clients)))
+        elapsed = time.perf_counter() - start
+        results[str(clients)] = {
+            "basket_size": size,
+            "requests_per_sec": round(len(samples) / elapsed, 2),
+            **summarize(samples)
+        }
+    results["max_rss_mb"] = max_rss_mb()
+    return results
+
+
+def bench_scrapers(args):
+    """Mock scraping, HTTP page parsing and the basket optimizer by basket size"""
+    from scraper import mock_scrape_all_platforms
+    from platforms import get_platform
+    from http_scraper import parse_html
+    from optimizer import optimize_basket
+
+    rng = random.Random(2)
+    results = {"mock_scrape": {}, "optimize_basket": {}}
+    with traced(results):
+        for size in args.basket_sizes:
+            items = basket(size, rng)
+            results["mock_scrape"][str(size)] = timed(
+                lambda: mock_scrape_all_platforms(items), args.iterations)
+            scraped = mock_scrape_all_platforms(items)
+            results["optimize_basket"][str(size)] = timed(
+                lambda: optimize_basket(items, scraped), args.iterations)
+
+        cards = ''.join(f'<div data-testid="product-card"><h4>Product {i}</h4>'
+                        f'<span>₹{rng.randint(10, 500)}</span></div>' for i in range(200))
+        page = f'<html><body>{cards}</body></html>'
+        selectors = get_platform("Zepto").selectors
+        results["parse_html_200_cards"] = timed(lambda: parse_html(page, selectors, 5),
+                                                args.iterations)
+    return results
+
+
+def bench_database(args, workdir):
+    """Bulk load and query times against synthetic histories of each size"""
+    import database
+    products = product_names(args.products)
+    platforms = ["Zepto", "Blinkit", "Instamart", "Flipkart Minutes"]
+    rng = random.Random(3)
+    results = {}
+    for rows in args.rows:
+        log(f"database: generating {rows} rows")
+        database.DB_PATH = os.path.join(workdir, f'history-{rows}.db')
+        database.init_db()
+        start = time.perf_counter()
+        database.import_price_history(
+            synthetic_history(rows, products, platforms, args.history_days, seed=rows))
+        load = time.perf_counter() - start
+
+        sample = rng.sample(products, min(10, len(products)))
+        size = {
+            "load_sec": round(load, 2),
+            "load_rows_per_sec": round(rows / load) if load else None,
+            "db_size_mb": round(os.path.getsize(database.DB_PATH) / (1024 * 1024), 1),
+            "price_trends_bulk_10": timed(
+                lambda: database.get_price_trends_bulk(sample), args.iterations),
+            "historical_comparison": timed(
+                lambda: database.get_historical_comparison(sample[0], platforms[0]),
+                args.iterations),
+            "price_series_bulk_10": timed(
+                lambda: database.get_price_series_bulk(sample, days=args.history_days),
+                args.iterations),
+            "save_price_history_bulk_20": timed(
+                lambda: database.save_price_history_bulk(
+                    [(rng.choice(products), rng.choice(platforms), 99.0) for _ in range(20)]),
+                args.iterations),
+            "export_first_chunk": timed(
+                lambda: next(database.iter_price_history_chunks(), None), args.iterations),
+            "max_rss_mb": max_rss_mb()
+        }
+        results[str(rows)] = size
+        if not args.keep_db:
+            os.remove(database.DB_PATH)
+    return results
+
+
+def compare(results, baseline, path=''):
+    """Print the change of every p50/p99 between baseline and results"""
+    for key, value in results.items():
+        name = f'{path}.{key}' if path else key
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        if isinstance(value, dict):
+            compare(value, old or {}, name)
+        elif key in ('p50_ms', 'p99_ms', 'requests_per_sec') and isinstance(old, (int, float)) and old:
+            change = (value - old) / old * 100
+            print(f'{name:70s} {old:10.3f} -> {value:10.3f} ({change:+.1f}%)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', default='benchmark-results.json')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    parser.add_argument('--iterations', type=int, default=50,
+                        help='samples per latency measurement')
+    parser.add_argument('--basket-sizes', type=int_list, default=[1, 5, 10, 20])
+    parser.add_argument('--clients', type=int_list, default=[1, 4, 16],
+                        help='concurrent client counts for the throughput run')
+    parser.add_argument('--requests-per-client', type=int, default=25)
+    parser.add_argument('--rows', type=int_list, default=[10_000, 100_000],
+                        help='price_history sizes for the database benchmarks '
+                             '(millions of rows take a long time, pass them explicitly)')
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--history-days', type=int, default=90)
+    parser.add_argument('--llm-latency', type=float, default=0.0,
+                        help='seconds the stubbed Gemini call sleeps')
+    parser.add_argument('--skip', default='',
+                        help='comma-separated sections to skip: endpoints,throughput,scrapers,database')
+    parser.add_argument('--keep-db', action='store_true', help='keep the generated databases')
+    args = parser.parse_args()
+    skip = set(filter(None, args.skip.split(',')))
+
+    workdir = tempfile.mkdtemp(prefix='price-bench-')
+    # Must be set before the app modules read their configuration
+    os.environ['PRICES_DB_PATH'] = os.path.join(workdir, 'app.db')
+    os.environ['SCRAPER_MODE'] = 'mock'
+    os.environ.setdefault('HISTORY_WRITE_BEHIND', 'false')
+    os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+    import google.generativeai as genai
+    StubModel.latency = args.llm_latency
+    genai.GenerativeModel = StubModel
+
+    results = {
+        "started_at": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "args": {k: v for k, v in vars(args).items() if k not in ('output', 'baseline')}
+    }
+    try:
+        with contextlib.redirect_stdout(open(os.devnull, 'w')):
+            from app import app
+            from cache import llm_cache, price_cache
+            llm_cache.clear()
+            price_cache.clear()
+            for name, run in (("endpoints", lambda: bench_endpoints(app, args)),
+                              ("throughput", lambda: bench_throughput(app, args)),
+                              ("scrapers", lambda: bench_scrapers(args)),
+                              ("database", lambda: bench_database(args, workdir))):
+                if name in skip:
+                    continue
+                log(f"running {name}")
+                start = time.perf_counter()
+                results[name] = run()
+                results[name]["elapsed_sec"] = round(time.perf_counter() - start, 2)
+    finally:
+        if not args.keep_db:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    log(f"results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            compare(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+import logging
+import os
+import threading
+import time
+import atexit
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+BROWSER_POOL_SIZE = int(os.getenv('BROWSER_POOL_SIZE', '4'))
+# Recycle a browser after this many page loads to shed leaked memory
+BROWSER_MAX_PAGES = int(os.getenv('BROWSER_MAX_PAGES', '50'))
+# Cap on resident memory of all pooled browsers combined
+BROWSER_MAX_MEMORY_MB = int(os.getenv('BROWSER_MAX_MEMORY_MB', '1500'))
+BROWSER_CHECKOUT_TIMEOUT = float(os.getenv('BROWSER_CHECKOUT_TIMEOUT', '30'))
+# Assumed size of a browser we have not measured yet (or when /proc is missing)
+DRIVER_MEMORY_ESTIMATE_MB = 250
+
+
+def _process_tree_rss_mb(root_pid):
+    """Resident memory of a process and all its descendants, in MB (Linux only)"""
+    children = {}
+    rss_kb = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/status') as f:
+                ppid, rss = None, 0
+                for line in f:
+                    if line.startswith('PPid:'):
+                        ppid = int(line.split()[1])
+                    elif line.startswith('VmRSS:'):
+                        rss = int(line.split()[1])
+        except (OSError, ValueError):
+            continue
+        pid = int(entry)
+        rss_kb[pid] = rss
+        children.setdefault(ppid, []).append(pid)
+
+    total, stack = 0, [root_pid]
+    while stack:
+        pid = stack.pop()
+        total += rss_kb.get(pid, 0)
+        stack.extend(children.get(pid, []))
+    return total / 1024
+
+
+class PooledDriver:
+    """A pooled WebDriver that counts page loads; delegates everything else"""
+
+    def __init__(self, driver):
+        self.driver = driver
+        self.pages = 0
+        self.memory_mb = DRIVER_MEMORY_ESTIMATE_MB
+
+    def get(self, url):
+        self.pages += 1
+        return self.driver.get(url)
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+
+class DriverPool:
+    """Long-lived pool of warm headless browsers
+
+    Drivers are created lazily up to max_size, handed out with checkout() and
+    returned with checkin(). A driver is health-checked before reuse and
+    retired when it crashes, has served max_pages loads, or would push the
+    pool over max_memory_mb.
+    """
+
+    def __init__(self, factory, max_size=BROWSER_POOL_SIZE, max_pages=BROWSER_MAX_PAGES,
+                 max_memory_mb=BROWSER_MAX_MEMORY_MB):
+        self._factory = factory
+        self.max_size = max_size
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self._idle = []
+        self._all = set()
+        self._pending = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        atexit.register(self.close)
+
+    def _memory_mb(self):
+        return sum(pooled.memory_mb for pooled in self._all)
+
+    def _can_grow(self):
+        size = len(self._all) + self._pending
+        projected = self._memory_mb() + (self._pending + 1) * DRIVER_MEMORY_ESTIMATE_MB
+        # Always allow one browser, otherwise a low cap would deadlock scraping
+        return size == 0 or (size < self.max_size and projected <= self.max_memory_mb)
+
+    def checkout(self, timeout=None):
+        """Take a healthy driver from the pool, starting one if there is room"""
+        timeout = BROWSER_CHECKOUT_TIMEOUT if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._cond:
+                while not self._closed and not self._idle and not self._can_grow():
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError("No browser available in pool")
+                    self._cond.wait(remaining)
+                if self._closed:
+                    raise RuntimeError("Driver pool is closed")
+                pooled = self._idle.pop() if self._idle else None
+                if pooled is None:
+                    self._pending += 1
+
+            if pooled is None:
+                try:
+                    pooled = PooledDriver(self._factory())
+                finally:
+                    with self._cond:
+                        self._pending -= 1
+                        if pooled is not None:
+                            self._all.add(pooled)
+                        self._cond.notify()
+                return pooled
+
+            if self._is_healthy(pooled):
+                return pooled
+            self._retire(pooled)
+
+    def checkin(self, pooled, broken=False):
+        """Return a driver to the pool, retiring it if it is worn out or broken"""
+        if broken or pooled.pages >= self.max_pages or not self._is_healthy(pooled):
+            self._retire(pooled)
+            return
+
+        try:
+            pooled.memory_mb = _process_tree_rss_mb(pooled.driver.service.process.pid)
+        except Exception:
+            pass
+
+        with self._cond:
+            if self._closed or self._memory_mb() > self.max_memory_mb:
+                retire = True
+            else:
+                retire = False
+                self._idle.append(pooled)
+                self._cond.notify()
+        if retire:
+            self._retire(pooled)
+
+    @contextmanager
+    def session(self, timeout=None):
+        """Check out a driver for the duration of a with-block"""
+        pooled = self.checkout(timeout)
+        broken = False
+        try:
+            yield pooled
+        except Exception:
+            broken = not self._is_healthy(pooled)
+            raise
+        finally:
+            self.checkin(pooled, broken=broken)
+
+    def warm(self, count=None):
+        """Start browsers ahead of the first request"""
+        started = []
+        for _ in range(self.max_size if count is None else count):
+            with self._cond:
+                if not self._can_grow():
+                    break
+            try:
+                started.append(self.checkout(timeout=0))
+            except Exception as e:
+                logger.warning("Browser warm-up error: %s", e)
+                break
+        for pooled in started:
+            self.checkin(pooled)
+        return len(started)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "size": len(self._all),
+                "idle": len(self._idle),
+                "memory_mb": round(self._memory_mb(), 1)
+            }
+
+    def _is_healthy(self, pooled):
+        try:
+            return pooled.driver.execute_script('return 1') == 1
+        except Exception:
+            return False
+
+    def _retire(self, pooled):
+        with self._cond:
+            self._all.discard(pooled)
+            if pooled in self._idle:
+                self._idle.remove(pooled)
+            self._cond.notify()
+        try:
+            pooled.driver.quit()
+        except Exception as e:
+            logger.warning("Error closing browser: %s", e)
+
+    def close(self):
+        """Quit every browser; checked-out ones are quit when returned"""
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for pooled in idle:
+            self._retire(pooled)
@@ -0,0 +1,283 @@
+import logging
+import os
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+FRESH = 'fresh'
+STALE = 'stale'
+
+
+class TTLCache:
+    """In-memory LRU cache with per-entry TTL and a stale-while-revalidate window
+
+    get() returns (value, state) where state is FRESH within ttl, STALE for a
+    further stale_ttl seconds (callers serve it and refresh in the background)
+    and None on a miss. Keys are tuples of JSON-serializable parts.
+
+    When db_path is given, entries are also written to a SQLite table so the
+    cache survives restarts; memory misses fall through to it.
+    """
+
+    def __init__(self, max_entries=1024, ttl=300, stale_ttl=0, db_path=None, namespace='default'):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.namespace = namespace
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            # Usually the prices database: a new file must get this before its first table
+            self._db.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            self._db.execute('PRAGMA journal_mode=WAL')
+            self._db.execute('''
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    namespace TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    PRIMARY KEY (namespace, key)
+                )
+            ''')
+            self._db.commit()
+
+    def _state(self, expires_at, now):
+        if now < expires_at:
+            return FRESH
+        if now < expires_at + self.stale_ttl:
+            return STALE
+        return None
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, expires_at = entry
+                state = self._state(expires_at, now)
+                if state is not None:
+                    self._entries.move_to_end(key)
+                    self._count(state)
+                    return value, state
+                del self._entries[key]
+
+        entry = self._db_get(key)
+        if entry is not None:
+            value, expires_at = entry
+            state = self._state(expires_at, now)
+            if state is not None:
+                with self._lock:
+                    self._store(key, value, expires_at)
+                    self._count(state)
+                return value, state
+
+        with self._lock:
+            self.misses += 1
+        return None, None
+
+    def state(self, key):
+        """FRESH, STALE or None for key, without counting a hit or miss"""
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            entry = self._db_get(key)
+        return self._state(entry[1], now) if entry is not None else None
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._store(key, value, expires_at)
+        self._db_set(key, value, expires_at)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+        if self._db is not None:
+            with self._lock:
+                self._db.execute('DELETE FROM cache_entries WHERE namespace = ? AND key = ?',
+                                 (self.namespace, json.dumps(key)))
+                self._db.commit()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._db is not None:
+                self._db.execute('DELETE FROM cache_entries WHERE namespace = ?', (self.namespace,))
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses
+            }
+
+    def _count(self, state):
+        if state == FRESH:
+            self.hits += 1
+        else:
+            self.stale_hits += 1
+
+    def _store(self, key, value, expires_at):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _db_get(self, key):
+        if self._db is None:
+            return None
+        try:
+            with self._lock:
+                row = self._db.execute(
+                    'SELECT value, expires_at FROM cache_entries WHERE namespace = ? AND key = ?',
+                    (self.namespace, json.dumps(key))).fetchone()
+            return (json.loads(row[0]), row[1]) if row else None
+        except Exception as e:
+            logger.warning("Cache read error: %s", e)
+            return None
+
+    def _db_set(self, key, value, expires_at):
+        if self._db is None:
+            return
+        try:
+            with self._lock:
+                self._db.execute('''
+                    INSERT OR REPLACE INTO cache_entries (namespace, key, value, expires_at)
+                    VALUES (?, ?, ?, ?)
+                ''', (self.namespace, json.dumps(key), json.dumps(value), expires_at))
+                self._db.commit()
+        except Exception as e:
+            logger.warning("Cache write error: %s", e)
+
+
+class SingleFlight:
+    """Collapses concurrent calls for the same key into one in-flight call"""
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event(), "value": None, "error": None}
+            else:
+                self.shared += 1
+
+        if not leader:
+            call['done'].wait()
+            if call['error'] is not None:
+                raise call['error']
+            return call['value']
+
+        try:
+            call['value'] = fn()
+            return call['value']
+        except Exception as e:
+            call['error'] = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+
+class AsyncSingleFlight:
+    """SingleFlight for coroutines running on one event loop
+
+    Waiters are shielded from each other: a caller that is cancelled stops
+    waiting, but the shared call keeps running for the others.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.shared = 0
+
+    async def do(self, key, fn):
+        task = self._calls.get(key)
+        if task is None:
+            task = self._calls[key] = asyncio.ensure_future(fn())
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.shared += 1
+        return await asyncio.shield(task)
+
+
+def memoize(cache, flights, key, fn, ttl=None):
+    """Return the cached value for key, or compute it once via fn and cache it
+
+    Exceptions from fn propagate and are not cached, so callers keep their
+    own fallbacks and a transient failure is retried on the next call.
+    """
+    value, state = cache.get(key)
+    if state is not None:
+        return value
+
+    def compute():
+        value = fn()
+        cache.set(key, value, ttl)
+        return value
+    return flights.do(key, compute)
+
+
+async def amemoize(cache, flights, key, fn, ttl=None):
+    """memoize for a coroutine function; the SQLite tier is read in a thread"""
+    value, state = await asyncio.to_thread(cache.get, key)
+    if state is not None:
+        return value
+
+    async def compute():
+        value = await fn()
+        await asyncio.to_thread(cache.set, key, value, ttl)
+        return value
+    return await flights.do(key, compute)
+
+
+def normalize_item(item):
+    """Canonical form of a search term for cache keys: lowercased, single-spaced"""
+    return ' '.join(str(item).lower().split())
+
+
+# Scraped price per (platform, normalized item, location). Set PRICE_CACHE_DB
+# to a file path to keep entries across restarts.
+price_cache = TTLCache(
+    max_entries=int(os.getenv('PRICE_CACHE_MAX_ENTRIES', '5000')),
+    ttl=float(os.getenv('PRICE_CACHE_TTL', '300')),
+    stale_ttl=float(os.getenv('PRICE_CACHE_STALE_TTL', '900')),
+    db_path=os.getenv('PRICE_CACHE_DB') or None,
+    namespace='prices'
+)
+
+
+def price_cache_key(platform, item, location):
+    return (platform, normalize_item(item), normalize_item(location))
+
+
+# Gemini responses keyed by (call kind, model, normalized inputs). Persisted in
+# the prices database unless LLM_CACHE_DB points elsewhere.
+llm_cache = TTLCache(
+    max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', '2000')),
+    ttl=float(os.getenv('LLM_CACHE_TTL', '86400')),
+    db_path=os.getenv('LLM_CACHE_DB') or os.getenv('PRICES_DB_PATH') or
+            os.path.join(os.path.dirname(__file__), 'prices.db'),
+    namespace='llm'
+)
+llm_flights = SingleFlight()
+allm_flights = AsyncSingleFlight()
@@ -0,0 +1,207 @@
+import re
+import math
+import logging
+import threading
+from collections import defaultdict
+
+import database
+from item_parser import UNITS
+
+logger = logging.getLogger(__name__)
+
+# Packaging and joining words that may differ between two names of one product
+FILLER_WORDS = frozenset({"a", "an", "and", "the", "of", "with", "pack", "packet", "pouch",
+                          "bottle", "jar", "tin", "box", "pc", "pcs", "piece", "pieces"})
+
+_BRACKETED = re.compile(r'\([^)]*\)|\[[^\]]*\]')
+_QUANTITY = re.compile(r'(\d+(?:\.\d+)?)\s*(' + '|'.join(sorted(UNITS, key=len, reverse=True)) + r')\b')
+_NUMBER = re.compile(r'\d+(?:\.\d+)?[a-z]*')
+_PUNCTUATION = re.compile(r'[^\w.]+')
+
+
+def _number(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else str(value)
+
+
+def normalize(name):
+    """Alias form of a product name
+
+    Lowercased, bracketed notes such as "(Instamart)" dropped, quantities
+    unified ("1 Ltr" -> "1l") and punctuation collapsed to single spaces.
+    """
+    text = _BRACKETED.sub(' ', str(name).lower())
+    text = _QUANTITY.sub(lambda m: _number(m.group(1)) + UNITS[m.group(2)].lower(), text)
+    text = _PUNCTUATION.sub(' ', text).replace(' . ', ' ')
+    return ' '.join(text.split()).strip('. ')
+
+
+def content_words(alias):
+    """Words of a normalized name that identify the product, in any order"""
+    return frozenset(alias.split()) - FILLER_WORDS
+
+
+def trigrams(text):
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def quantities(text):
+    """Numeric tokens ("1l", "500g", "12") that must agree for two names to match"""
+    return frozenset(_NUMBER.findall(text))
+
+
+class TrigramIndex:
+    """Inverted index from character trigrams to keys, for fuzzy name lookups
+
+    search() scores candidates by Jaccard similarity of trigram sets, or by
+    overlap (shared / smaller set) when one name may contain the other.
+    """
+
+    def __init__(self):
+        self._grams = {}
+        self._postings = defaultdict(set)
+
+    def __len__(self):
+        return len(self._grams)
+
+    def add(self, key, text):
+        grams = trigrams(text)
+        self._grams[key] = grams
+        for gram in grams:
+            self._postings[gram].add(key)
+
+    def search(self, text, limit=5, overlap=False, min_score=0.0):
+        """Best (key, score) pairs for text, highest score first
+
+        With a Jaccard min_score only keys sharing one of the query's rarest
+        trigrams can qualify (prefix filtering), so common trigrams such as
+        "mil" are never scanned in full.
+        """
+        grams = trigrams(text)
+        if overlap or min_score <= 0:
+            probe = grams
+        else:
+            # A key reaching min_score shares at least this many of our trigrams
+            needed = math.ceil(min_score * len(grams))
+            rarest = sorted(grams, key=lambda gram: len(self._postings.get(gram, ())))
+            probe = rarest[:len(grams) - needed + 1]
+        candidates = set()
+        for gram in probe:
+            candidates.update(self._postings.get(gram, ()))
+        scored = []
+        for key in candidates:
+            other = self._grams[key]
+            count = len(grams & other)
+            if overlap:
+                score = count / min(len(grams), len(other))
+            else:
+                score = count / (len(grams) + len(other) - count)
+            if score >= min_score:
+                scored.append((key, score))
+        scored.sort(key=lambda pair: pair[1], reverse=True)
+        return scored[:limit]
+
+
+class Catalog:
+    """Canonical products and their aliases, mirrored from SQLite in memory
+
+    resolve() maps a scraped or typed name to a product id. Names that
+    normalize to a known alias are that product; otherwise a name whose
+    content words are exactly those of a known alias, in any order and give
+    or take packaging words, joins its product. Both are dict lookups. No
+    other similarity merges names: products that differ by one word ("Bread"
+    and "Brown Bread") stay apart. With create set, a matched name is stored
+    as a new alias and names with no match become new products.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._path = None
+        self._aliases = {}
+        self._by_words = {}
+        self._names = {}
+
+    def _load(self):
+        """(Re)load from the database, once per DB_PATH"""
+        if self._path == database.DB_PATH:
+            return
+        conn = database.get_connection()
+        self._aliases = {}
+        self._by_words = {}
+        self._names = dict(conn.execute('SELECT id, canonical_name FROM products'))
+        for alias, product_id in conn.execute('SELECT alias, product_id FROM product_aliases'):
+            self._remember(alias, product_id)
+        self._path = database.DB_PATH
+
+    def _remember(self, alias, product_id):
+        self._aliases[alias] = product_id
+        words = content_words(alias)
+        if words:
+            self._by_words.setdefault(words, product_id)
+
+    def _match(self, alias):
+        words = content_words(alias)
+        return self._by_words.get(words) if words else None
+
+    def _store_alias(self, conn, alias, product_id):
+        conn.execute('INSERT OR IGNORE INTO product_aliases (alias, product_id) VALUES (?, ?)',
+                     (alias, product_id))
+        self._remember(alias, product_id)
+
+    def _lookup(self, alias):
+        product_id = self._aliases.get(alias)
+        return product_id if product_id is not None else self._match(alias)
+
+    def _add(self, conn, alias):
+        """Id for alias, storing it as an alias of its match or of a new product"""
+        product_id = self._aliases.get(alias)
+        if product_id is not None:
+            return product_id
+        product_id = self._match(alias)
+        if product_id is None:
+            conn.execute('INSERT OR IGNORE INTO products (canonical_name) VALUES (?)', (alias,))
+            product_id = conn.execute('SELECT id FROM products WHERE canonical_name = ?',
+                                      (alias,)).fetchone()[0]
+            self._names[product_id] = alias
+        self._store_alias(conn, alias, product_id)
+        return product_id
+
+    def resolve(self, name, create=True):
+        """Product id for name, or None if unknown and create is False"""
+        return self.resolve_many([name], create)[name]
+
+    def resolve_many(self, names, create=True):
+        """{name: product id} for distinct names (None for unknown ones if not create)
+
+        Without create nothing is written, not even aliases for fuzzy matches.
+        With it, the batch's new aliases and products go in one transaction.
+        """
+        aliases = {name: normalize(name) for name in dict.fromkeys(names)}
+        distinct = [alias for alias in dict.fromkeys(aliases.values()) if alias]
+        with self._lock:
+            self._load()
+            if not create:
+                ids = {alias: self._lookup(alias) for alias in distinct}
+            else:
+                conn = database.get_connection()
+                try:
+                    with conn:
+                        ids = {alias: self._add(conn, alias) for alias in distinct}
+                except Exception:
+                    # Reload on next use: the rolled back entries are still in memory
+                    self._path = None
+                    raise
+        return {name: ids.get(alias) for name, alias in aliases.items()}
+
+    def canonical_name(self, product_id):
+        with self._lock:
+            self._load()
+            return self._names.get(product_id)
+
+    def stats(self):
+        with self._lock:
+            return {"products": len(self._names), "aliases": len(self._aliases)}
+
+
+catalog = Catalog()
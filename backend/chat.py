@@ -0,0 +1,119 @@
+import os
+import json
+import uuid
+import threading
+
+from cache import TTLCache
+
+# Prompt token budgets for the comparison summary and for earlier turns of a session
+CHAT_CONTEXT_TOKENS = int(os.getenv('CHAT_CONTEXT_TOKENS', '400'))
+CHAT_HISTORY_TOKENS = int(os.getenv('CHAT_HISTORY_TOKENS', '600'))
+# Idle sessions are dropped after this many seconds
+CHAT_SESSION_TTL = float(os.getenv('CHAT_SESSION_TTL', '3600'))
+CHAT_MAX_SESSIONS = int(os.getenv('CHAT_MAX_SESSIONS', '2000'))
+
+
+def compact(value):
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+
+def estimate_tokens(text):
+    """Rough Gemini token count: about four characters per token"""
+    return (len(text) + 3) // 4
+
+
+def price_deltas(platforms):
+    """[item, cheapest platform, price, dearest platform, price] per item, largest gap first
+
+    Items line up by position across platforms, as in a comparison result.
+    """
+    prices = {}
+    for platform, data in platforms.items():
+        for index, item in enumerate(data.get('items', [])):
+            if item.get('price', 0) > 0 and item.get('available', True):
+                name, by_platform = prices.setdefault(index, (item['name'], {}))
+                by_platform[platform] = item['price']
+    deltas = []
+    for name, by_platform in prices.values():
+        if len(by_platform) < 2:
+            continue
+        low = min(by_platform, key=by_platform.get)
+        high = max(by_platform, key=by_platform.get)
+        deltas.append([name, low, by_platform[low], high, by_platform[high]])
+    deltas.sort(key=lambda d: d[4] - d[2], reverse=True)
+    return deltas
+
+
+def summarize_comparison(comparison, budget=CHAT_CONTEXT_TOKENS):
+    """Compact JSON summary of a comparison result within `budget` tokens
+
+    Keeps platform totals, the cheapest platform, the optimal plan and the
+    items whose prices differ most between platforms. Deltas, then the
+    plan's per-platform items are dropped until the summary fits. Context
+    that is not a comparison result is serialized compactly and truncated.
+    """
+    if not isinstance(comparison, dict) or 'platforms' not in comparison:
+        return compact(comparison or {})[:budget * 4]
+    platforms = comparison.get('platforms') or {}
+    plan = comparison.get('optimal_plan') or {}
+    summary = {
+        "cheapest": comparison.get('cheapest_platform'),
+        "totals": {name: round(data.get('total', 0), 2) for name, data in platforms.items()},
+        "plan": plan and {
+            "total": plan.get('total'),
+            "savings": plan.get('savings'),
+            "orders": {platform: order['items'] for platform, order in plan.get('orders', {}).items()},
+            "unavailable": plan.get('unavailable', [])
+        },
+        "deltas": price_deltas(platforms)
+    }
+    text = compact(summary)
+    while estimate_tokens(text) > budget and summary['deltas']:
+        summary['deltas'] = summary['deltas'][:len(summary['deltas']) // 2]
+        text = compact(summary)
+    if estimate_tokens(text) > budget and summary['plan']:
+        summary['plan'] = {k: v for k, v in summary['plan'].items() if k in ('total', 'savings')}
+        text = compact(summary)
+    return text[:budget * 4]
+
+
+class ChatSessions:
+    """Server-side chat state: the compacted comparison plus recent turns
+
+    The summary is built once when the session is created, so later turns
+    send only the session id. Turns are trimmed oldest first to stay within
+    CHAT_HISTORY_TOKENS.
+    """
+
+    def __init__(self, ttl=CHAT_SESSION_TTL, max_sessions=CHAT_MAX_SESSIONS,
+                 history_tokens=CHAT_HISTORY_TOKENS):
+        self._store = TTLCache(max_entries=max_sessions, ttl=ttl, namespace='chat')
+        self.history_tokens = history_tokens
+        self._lock = threading.Lock()
+
+    def create(self, context=None):
+        session_id = uuid.uuid4().hex
+        self._store.set(session_id, {"context": summarize_comparison(context), "history": []})
+        return session_id
+
+    def get(self, session_id):
+        session, _ = self._store.get(session_id)
+        return session
+
+    def add_turn(self, session_id, message, answer):
+        """Append a question and answer, dropping the oldest turns over budget"""
+        with self._lock:
+            session = self.get(session_id)
+            if session is None:
+                return
+            history = session['history'] + [[message, answer]]
+            while len(history) > 1 and estimate_tokens(compact(history)) > self.history_tokens:
+                history.pop(0)
+            # Re-setting also renews the session's TTL
+            self._store.set(session_id, {**session, "history": history})
+
+    def stats(self):
+        return {"sessions": self._store.stats()['entries']}
+
+
+chat_sessions = ChatSessions()
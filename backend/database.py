@@ -1,10 +1,67 @@
+import logging
 import sqlite3
 from datetime import datetime, timedelta
 import os
-DB_PATH = os.path.join(os.path.dirname(__file__), 'prices.db')
+import io
+import csv
+import sys
+import json
+import queue
+import threading
+
+import catalog
+
+logger = logging.getLogger(__name__)
+DB_PATH = os.getenv('PRICES_DB_PATH', os.path.join(os.path.dirname(__file__), 'prices.db'))
+PRAGMAS = (
+    # Only takes effect when the file is created; lets retention shrink it in steps
+    "PRAGMA auto_vacuum=INCREMENTAL",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA mmap_size=134217728",
+    "PRAGMA busy_timeout=5000",
+)
+AUTO_VACUUM_INCREMENTAL = 2
+# Rollup table -> (bucket column, SQL expression bucketing a timestamp).
+# Rollups are keyed by catalog product id, so every alias of a product
+# ("Milk 1L", "milk 1 ltr (Instamart)") lands in one series.
+ROLLUPS = {
+    "price_daily": ("day", "DATE({ts})"),
+    "price_hourly": ("hour", "STRFTIME('%Y-%m-%d %H:00', {ts})"),
+}
+_local = threading.local()
+def get_connection():
+    """Per-thread connection to DB_PATH, opened once with tuned pragmas
+
+    WAL lets readers run alongside the writer, and synchronous=NORMAL skips
+    the fsync on every commit (still durable across application crashes).
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.path != DB_PATH:
+        conn = sqlite3.connect(DB_PATH)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        _local.conn = conn
+        _local.path = DB_PATH
+    return conn
+def enable_incremental_vacuum(conn):
+    """Make sure the file uses auto_vacuum=INCREMENTAL, so retention can shrink it
+
+    The pragma only takes effect on a file without tables; a database created
+    before it was set is rewritten once with VACUUM. Returns True if it did.
+    """
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == AUTO_VACUUM_INCREMENTAL:
+        return False
+    logger.info("Converting %s to auto_vacuum=INCREMENTAL (one-time VACUUM)", DB_PATH)
+    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+    conn.execute('VACUUM')
+    return True
 def init_db():
     """Initialize SQLite database"""
-    conn = sqlite3.connect(DB_PATH)
+    conn = get_connection()
+    enable_incremental_vacuum(conn)
     cursor = conn.cursor()
 
     cursor.execute('''
@@ -22,107 +79,556 @@ def init_db():
         ON price_history(product_name, platform)
     ''')
 
+    # Superseded by idx_product_id_timestamp once lookups went by product id
+    cursor.execute('DROP INDEX IF EXISTS idx_product_timestamp')
+
     cursor.execute('''
         CREATE INDEX IF NOT EXISTS idx_timestamp
         ON price_history(timestamp)
     ''')
 
+    # Product catalog: canonical products and the normalized names that map to them
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS products (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            canonical_name TEXT NOT NULL UNIQUE,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS product_aliases (
+            alias TEXT PRIMARY KEY,
+            product_id INTEGER NOT NULL REFERENCES products(id)
+        ) WITHOUT ROWID
+    ''')
+    columns = {row[1] for row in cursor.execute('PRAGMA table_info(price_history)')}
+    if 'product_id' not in columns:
+        cursor.execute('ALTER TABLE price_history ADD COLUMN product_id INTEGER REFERENCES products(id)')
+    # Covers the trend lookups: seek by product, range-scan timestamp, read the rest
+    cursor.execute('''
+        CREATE INDEX IF NOT EXISTS idx_product_id_timestamp
+        ON price_history(product_id, timestamp, platform, price)
+    ''')
+
+    # Pre-aggregated price_history, kept current by an insert trigger so trend
+    # and chart queries scan one row per bucket instead of every raw row.
+    # Rollups from before the catalog (keyed by product_name) are set aside
+    # and merged into the new tables by migrate_product_ids().
+    for table, (bucket, expr) in ROLLUPS.items():
+        columns = {row[1] for row in cursor.execute(f'PRAGMA table_info({table})')}
+        if 'product_name' in columns:
+            cursor.execute(f'DROP TRIGGER IF EXISTS trg_{table}_insert')
+            cursor.execute(f'ALTER TABLE {table} RENAME TO {table}_legacy')
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {table} (
+                product_id INTEGER NOT NULL,
+                platform TEXT NOT NULL,
+                {bucket} TEXT NOT NULL,
+                price_sum REAL NOT NULL,
+                price_min REAL NOT NULL,
+                price_max REAL NOT NULL,
+                data_points INTEGER NOT NULL,
+                PRIMARY KEY (product_id, platform, {bucket})
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_{table}_insert
+            AFTER INSERT ON price_history
+            WHEN NEW.product_id IS NOT NULL
+            BEGIN
+                INSERT INTO {table} (product_id, platform, {bucket},
+                                     price_sum, price_min, price_max, data_points)
+                VALUES (NEW.product_id, NEW.platform, {expr.format(ts='NEW.timestamp')},
+                        NEW.price, NEW.price, NEW.price, 1)
+                {_ROLLUP_MERGE.format(bucket=bucket)};
+            END
+        ''')
+
     conn.commit()
-    conn.close()
+    migrate_product_ids()
+_ROLLUP_MERGE = '''
+    ON CONFLICT (product_id, platform, {bucket}) DO UPDATE SET
+        price_sum = price_sum + excluded.price_sum,
+        price_min = MIN(price_min, excluded.price_min),
+        price_max = MAX(price_max, excluded.price_max),
+        data_points = data_points + excluded.data_points
+'''
+def backfill_rollups():
+    """Rebuild rollup rows from raw price_history (for databases created before rollups)
+
+    Buckets are recomputed from their raw rows only where those rows account
+    for at least as many points as the rollup already holds, so buckets
+    that retention has partly or fully deleted keep their summaries.
+    Returns rows written per table.
+    """
+    conn = get_connection()
+    written = {}
+    with conn:
+        for table, (bucket, expr) in ROLLUPS.items():
+            cursor = conn.execute(f'''
+                INSERT INTO {table} (product_id, platform, {bucket},
+                                     price_sum, price_min, price_max, data_points)
+                SELECT product_id, platform, {expr.format(ts='timestamp')},
+                       SUM(price), MIN(price), MAX(price), COUNT(*)
+                FROM price_history
+                WHERE product_id IS NOT NULL
+                GROUP BY 1, 2, 3
+                ON CONFLICT (product_id, platform, {bucket}) DO UPDATE SET
+                    price_sum = excluded.price_sum,
+                    price_min = excluded.price_min,
+                    price_max = excluded.price_max,
+                    data_points = excluded.data_points
+                WHERE excluded.data_points >= {table}.data_points
+            ''')
+            written[table] = cursor.rowcount
+    return written
+def migrate_product_ids():
+    """Assign catalog product ids to history recorded without one
+
+    Every distinct product_name still lacking an id is resolved through the
+    catalog (creating products as needed) and the ids are written back in
+    one UPDATE. Legacy name-keyed rollups are merged into the id-keyed
+    tables and dropped, which keeps the daily and hourly summaries of raw
+    rows already removed by cleanup. Otherwise the newly assigned rows,
+    which the insert trigger skipped, are added to the rollups. Names that
+    normalize to nothing stay unassigned. Returns the number of rows updated.
+    """
+    conn = get_connection()
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    legacy = [table for table in ROLLUPS if f'{table}_legacy' in tables]
+    sources = ['SELECT DISTINCT product_name FROM price_history WHERE product_id IS NULL']
+    sources += [f'SELECT DISTINCT product_name FROM {table}_legacy' for table in legacy]
+    names = [row[0] for row in conn.execute(' UNION '.join(sources))]
+    if not names:
+        return 0
+
+    ids = catalog.catalog.resolve_many(names)
+    with conn:
+        conn.execute('CREATE TEMP TABLE IF NOT EXISTS name_map (product_name TEXT PRIMARY KEY, product_id INTEGER)')
+        conn.execute('DELETE FROM name_map')
+        conn.executemany('INSERT INTO name_map VALUES (?, ?)',
+                         [(name, product_id) for name, product_id in ids.items() if product_id])
+        conn.execute('CREATE TEMP TABLE IF NOT EXISTS migrated (id INTEGER PRIMARY KEY)')
+        conn.execute('DELETE FROM migrated')
+        conn.execute('''
+            INSERT INTO migrated
+            SELECT h.id FROM price_history h JOIN name_map m ON m.product_name = h.product_name
+            WHERE h.product_id IS NULL
+        ''')
+        updated = conn.execute('''
+            UPDATE price_history
+            SET product_id = (SELECT product_id FROM name_map WHERE name_map.product_name = price_history.product_name)
+            WHERE id IN (SELECT id FROM migrated)
+        ''').rowcount
+        # Legacy rollups already count these rows; otherwise the trigger skipped them
+        for table, (bucket, expr) in ROLLUPS.items() if not legacy else ():
+            conn.execute(f'''
+                INSERT INTO {table} (product_id, platform, {bucket},
+                                     price_sum, price_min, price_max, data_points)
+                SELECT product_id, platform, {expr.format(ts='timestamp')},
+                       SUM(price), MIN(price), MAX(price), COUNT(*)
+                FROM price_history
+                WHERE id IN (SELECT id FROM migrated)
+                GROUP BY 1, 2, 3
+                {_ROLLUP_MERGE.format(bucket=bucket)}
+            ''')
+        for table in legacy:
+            bucket = ROLLUPS[table][0]
+            conn.execute(f'''
+                INSERT INTO {table} (product_id, platform, {bucket},
+                                     price_sum, price_min, price_max, data_points)
+                SELECT m.product_id, l.platform, l.{bucket}, SUM(l.price_sum), MIN(l.price_min),
+                       MAX(l.price_max), SUM(l.data_points)
+                FROM {table}_legacy l JOIN name_map m ON m.product_name = l.product_name
+                GROUP BY 1, 2, 3
+                {_ROLLUP_MERGE.format(bucket=bucket)}
+            ''')
+            conn.execute(f'DROP TABLE {table}_legacy')
+        conn.execute('DROP TABLE name_map')
+        conn.execute('DROP TABLE migrated')
+    if not updated and not legacy:
+        return 0
+    logger.info("Assigned product ids to %d history rows (%d names)", updated, len(names))
+    return updated
 def save_price_history(product_name, platform, price):
     """Save price data to history"""
+    return save_price_history_bulk([(product_name, platform, price)])
+def save_price_history_bulk(rows):
+    """Save many (product_name, platform, price) rows in one transaction"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
-
-        cursor.execute('''
-            INSERT INTO price_history (product_name, platform, price)
-            VALUES (?, ?, ?)
-        ''', (product_name, platform, price))
-
-        conn.commit()
-        conn.close()
+        rows = list(rows)
+        ids = catalog.catalog.resolve_many(row[0] for row in rows)
+        conn = get_connection()
+        with conn:
+            conn.executemany('''
+                INSERT INTO price_history (product_name, product_id, platform, price)
+                VALUES (?, ?, ?, ?)
+            ''', [(name, ids[name], platform, price) for name, platform, price in rows])
         return True
     except Exception as e:
-        print(f"Error saving price history: {e}")
+        logger.error("Error saving price history: %s", e)
         return False
+class PriceHistoryWriter:
+    """Write-behind queue for price_history inserts
+
+    enqueue() returns immediately; a background thread drains the queue and
+    writes everything waiting in a single transaction. When the queue is
+    full the caller writes synchronously instead of dropping rows.
+    """
+
+    def __init__(self, max_pending=10000, batch_size=500):
+        self._queue = queue.Queue(maxsize=max_pending)
+        self.batch_size = batch_size
+        self._thread = threading.Thread(target=self._run, name='price-history-writer', daemon=True)
+        self._thread.start()
+
+    def enqueue(self, rows):
+        for n, row in enumerate(rows):
+            try:
+                self._queue.put_nowait(row)
+            except queue.Full:
+                save_price_history_bulk(rows[n:])
+                return
+
+    def flush(self):
+        """Block until everything enqueued so far has been written"""
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            save_price_history_bulk(batch)
+            for _ in batch:
+                self._queue.task_done()
+_writer = None
+_writer_lock = threading.Lock()
+def get_history_writer():
+    """Shared write-behind writer, started on first use"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = PriceHistoryWriter()
+        return _writer
 def get_price_trends(product_name, days=7):
     """Get price trends for a product"""
+    return get_price_trends_bulk([product_name], days).get(product_name, {})
+def get_price_trends_bulk(product_names, days=7):
+    """Get price trends for many products with a single query
+
+    Names are resolved to catalog product ids and passed as one JSON parameter, so the query
+    plan is the same however large the basket is. Reads the hourly rollup,
+    so the cost depends on the window length rather than the raw row count. Returns
+    {product_name: {platform: {avg_price, min_price, max_price, data_points}}}
+    with an empty dict for products that have no history.
+    """
+    names = list(dict.fromkeys(product_names))
+    trends = {name: {} for name in names}
+    if not names:
+        return trends
     try:
-        conn = sqlite3.connect(DB_PATH)
+        ids = catalog.catalog.resolve_many(names, create=False)
+        conn = get_connection()
         cursor = conn.cursor()
 
         cutoff_date = datetime.now() - timedelta(days=days)
 
         cursor.execute('''
-            SELECT platform, AVG(price) as avg_price,
-                   MIN(price) as min_price, MAX(price) as max_price,
-                   COUNT(*) as data_points
-            FROM price_history
-            WHERE product_name = ? AND timestamp >= ?
-            GROUP BY platform
-        ''', (product_name, cutoff_date))
-
-        results = cursor.fetchall()
-
-        trends = {}
-        for row in results:
-            platform, avg_price, min_price, max_price, data_points = row
-            trends[platform] = {
+            SELECT product_id, platform, SUM(price_sum) / SUM(data_points) as avg_price,
+                   MIN(price_min) as min_price, MAX(price_max) as max_price,
+                   SUM(data_points) as data_points
+            FROM price_hourly
+            WHERE product_id IN (SELECT value FROM json_each(?))
+              AND hour >= ?
+            GROUP BY product_id, platform
+        ''', (json.dumps(sorted({i for i in ids.values() if i})), cutoff_date.strftime('%Y-%m-%d %H:00')))
+
+        by_id = {}
+        for row in cursor.fetchall():
+            product_id, platform, avg_price, min_price, max_price, data_points = row
+            by_id.setdefault(product_id, {})[platform] = {
                 "avg_price": round(avg_price, 2),
                 "min_price": round(min_price, 2),
                 "max_price": round(max_price, 2),
                 "data_points": data_points
             }
-
-        conn.close()
+        # Names that resolve to the same product share its trends
+        for name in names:
+            trends[name] = dict(by_id.get(ids[name], {}))
         return trends
     except Exception as e:
-        print(f"Error getting price trends: {e}")
-        return {}
+        logger.error("Error getting price trends: %s", e)
+        return trends
 def get_historical_comparison(product_name, platform, days=30):
     """Get historical price data for chart"""
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        return list(iter_historical_comparison(product_name, platform, days))
+    except Exception as e:
+        logger.error("Error getting historical data: %s", e)
+        return []
+def iter_historical_comparison(product_name, platform, days=30):
+    """Yield daily {date, price} points for a chart without building a list"""
+    conn = get_connection()
+    cursor = conn.cursor()
 
-        cutoff_date = datetime.now() - timedelta(days=days)
+    cutoff_date = datetime.now() - timedelta(days=days)
 
-        cursor.execute('''
-            SELECT DATE(timestamp) as date, AVG(price) as avg_price
-            FROM price_history
-            WHERE product_name = ? AND platform = ? AND timestamp >= ?
-            GROUP BY DATE(timestamp)
-            ORDER BY DATE(timestamp)
-        ''', (product_name, platform, cutoff_date))
+    cursor.execute('''
+        SELECT day as date, price_sum / data_points as avg_price
+        FROM price_daily
+        WHERE product_id = ? AND platform = ? AND day >= ?
+        ORDER BY day
+    ''', (catalog.catalog.resolve(product_name, create=False), platform,
+          cutoff_date.strftime('%Y-%m-%d')))
 
-        results = cursor.fetchall()
+    for date, avg_price in cursor:
+        yield {"date": date, "price": round(avg_price, 2)}
+def get_price_series_bulk(product_names, platforms=None, days=30, resolution='day'):
+    """Average price per bucket for many product/platform pairs in one query
 
-        data = [{"date": row[0], "price": round(row[1], 2)} for row in results]
+    resolution is 'day' (price_daily) or 'hour' (price_hourly). Returns
+    {(product_name, platform): [(bucket, avg_price), ...]} in bucket order.
+    """
+    table, bucket = ('price_hourly', 'hour') if resolution == 'hour' else ('price_daily', 'day')
+    fmt = '%Y-%m-%d %H:00' if resolution == 'hour' else '%Y-%m-%d'
+    cutoff = (datetime.now() - timedelta(days=days)).strftime(fmt)
+    names_by_id = {}
+    for name, product_id in catalog.catalog.resolve_many(product_names, create=False).items():
+        if product_id is not None:
+            names_by_id.setdefault(product_id, []).append(name)
+    platform_filter = 'AND platform IN (SELECT value FROM json_each(?))' if platforms else ''
+    params = [json.dumps(sorted(names_by_id)), cutoff] + ([json.dumps(list(platforms))] if platforms else [])
 
+    conn = get_connection()
+    cursor = conn.execute(f'''
+        SELECT product_id, platform, {bucket}, price_sum / data_points
+        FROM {table}
+        WHERE product_id IN (SELECT value FROM json_each(?))
+          AND {bucket} >= ? {platform_filter}
+        ORDER BY product_id, platform, {bucket}
+    ''', params)
+
+    series = {}
+    for product_id, platform, bucket_value, avg_price in cursor:
+        for product_name in names_by_id[product_id]:
+            series.setdefault((product_name, platform), []).append((bucket_value, avg_price))
+    return series
+EXPORT_COLUMNS = ("product_name", "platform", "price", "timestamp")
+EXPORT_FORMATS = ("csv", "ndjson", "parquet")
+EXPORT_CHUNK_SIZE = 5000
+def guess_format(path, default='ndjson'):
+    """Export/import format from a file extension"""
+    ext = os.path.splitext(path or '')[1].lstrip('.').lower()
+    return {"csv": "csv", "ndjson": "ndjson", "jsonl": "ndjson", "parquet": "parquet"}.get(ext, default)
+def iter_price_history_chunks(since=None, until=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield lists of (product_name, platform, price, timestamp) rows
+
+    Rows are read in rowid order with fetchmany, so memory use is bounded by
+    chunk_size whatever the table size. A dedicated connection gives the
+    export one consistent snapshot.
+    """
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        clauses, params = [], []
+        if since:
+            clauses.append('timestamp >= ?')
+            params.append(since)
+        if until:
+            clauses.append('timestamp < ?')
+            params.append(until)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        cursor = conn.execute(f'''
+            SELECT product_name, platform, price, timestamp
+            FROM price_history {where}
+            ORDER BY id
+        ''', params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
         conn.close()
-        return data
-    except Exception as e:
-        print(f"Error getting historical data: {e}")
-        return []
-def cleanup_old_data(days=90):
-    """Remove price data older than specified days"""
+def iter_export(fmt='ndjson', since=None, until=None, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield a CSV or NDJSON export as text, one piece per fetched chunk"""
+    return _format_chunks(fmt, iter_price_history_chunks(since, until, chunk_size))
+def _format_chunks(fmt, chunks):
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS)
+        for rows in chunks:
+            writer.writerows(rows)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    elif fmt == 'ndjson':
+        for rows in chunks:
+            yield ''.join(json.dumps(dict(zip(EXPORT_COLUMNS, row))) + '\n' for row in rows)
+    else:
+        raise ValueError(f"Unsupported streaming format: {fmt}")
+def export_price_history(path, fmt=None, since=None, until=None):
+    """Write price history to a file (or stdout for '-'); returns rows written"""
+    fmt = fmt or guess_format(path)
+    if fmt == 'parquet':
+        return _export_parquet(path, since, until)
+    count = 0
+    def counted(chunks):
+        nonlocal count
+        for rows in chunks:
+            count += len(rows)
+            yield rows
+    out = sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
     try:
-        conn = sqlite3.connect(DB_PATH)
-        cursor = conn.cursor()
+        out.writelines(_format_chunks(fmt, counted(iter_price_history_chunks(since, until))))
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    return count
+def _export_parquet(path, since, until):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ValueError("Parquet export requires pyarrow (pip install pyarrow)")
+    schema = pa.schema([("product_name", pa.string()), ("platform", pa.string()),
+                        ("price", pa.float64()), ("timestamp", pa.string())])
+    count = 0
+    with pq.ParquetWriter(path, schema) as writer:
+        for rows in iter_price_history_chunks(since, until):
+            columns = [list(column) for column in zip(*rows)]
+            writer.write_table(pa.Table.from_arrays(columns, schema=schema))
+            count += len(rows)
+    return count
+class InvalidImportRow(ValueError):
+    """A record of an import that cannot be turned into a price_history row"""
 
-        cutoff_date = datetime.now() - timedelta(days=days)
+    def __init__(self, line, reason):
+        super().__init__(f"line {line}: {reason}")
+        self.line = line
+class ImportAborted(Exception):
+    """An import that stopped part-way; earlier batches stay committed"""
 
-        cursor.execute('''
-            DELETE FROM price_history
-            WHERE timestamp < ?
-        ''', (cutoff_date,))
+    def __init__(self, error, rows_committed):
+        super().__init__(f"{error} ({rows_committed} rows committed)")
+        self.error = error
+        self.rows_committed = rows_committed
+def _import_row(line, record):
+    if not isinstance(record, dict):
+        raise InvalidImportRow(line, "expected an object with product_name, platform and price")
+    for field in ('product_name', 'platform'):
+        if not isinstance(record.get(field), str) or not record[field].strip():
+            raise InvalidImportRow(line, f"{field} must be a non-empty string")
+    price = record.get('price')
+    if isinstance(price, bool) or not isinstance(price, (int, float, str)):
+        raise InvalidImportRow(line, "price must be a number")
+    try:
+        price = float(price)
+    except ValueError:
+        raise InvalidImportRow(line, f"price must be a number, got {price!r}") from None
+    timestamp = record.get('timestamp') or None
+    if timestamp is not None and not isinstance(timestamp, str):
+        raise InvalidImportRow(line, "timestamp must be a string")
+    return record['product_name'], record['platform'], price, timestamp
+def iter_import_rows(lines, fmt='ndjson'):
+    """Parse CSV or NDJSON text lines into insertable rows, lazily
 
-        deleted_count = cursor.rowcount
-        conn.commit()
-        conn.close()
+    Raises InvalidImportRow naming the line of the first bad record.
+    """
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        records = ((reader.line_num, record) for record in reader)
+    elif fmt == 'ndjson':
+        def parsed():
+            for line, text in enumerate(lines, 1):
+                if not text.strip():
+                    continue
+                try:
+                    yield line, json.loads(text)
+                except ValueError as e:
+                    raise InvalidImportRow(line, f"invalid JSON ({e})") from None
+        records = parsed()
+    else:
+        raise ValueError(f"Unsupported streaming format: {fmt}")
+    for line, record in records:
+        yield _import_row(line, record)
+def import_price_history(rows, batch_size=EXPORT_CHUNK_SIZE):
+    """Insert rows from an iterable in batches of batch_size; returns rows imported
 
-        return deleted_count
+    Each batch is one transaction, so memory stays bounded and live inserts
+    can interleave with a long import. Names are resolved to catalog product
+    ids per batch; rollups are updated by the trigger. An error part-way
+    raises ImportAborted, which says how many rows were already committed.
+    """
+    conn = get_connection()
+    count = 0
+    batch = []
+    def flush():
+        ids = catalog.catalog.resolve_many(row[0] for row in batch)
+        with conn:
+            conn.executemany('''
+                INSERT INTO price_history (product_name, product_id, platform, price, timestamp)
+                VALUES (?, ?, ?, ?, COALESCE(?, CURRENT_TIMESTAMP))
+            ''', [(name, ids[name], platform, price, ts) for name, platform, price, ts in batch])
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= batch_size:
+                flush()
+                count += len(batch)
+                batch = []
+        if batch:
+            flush()
+            count += len(batch)
     except Exception as e:
-        print(f"Error cleaning up old data: {e}")
-        return 0
\ No newline at end of file
+        raise ImportAborted(e, count) from e
+    return count
+def import_price_history_file(path, fmt=None):
+    """Import a CSV, NDJSON or Parquet file (or stdin for '-')"""
+    fmt = fmt or guess_format(path)
+    if fmt == 'parquet':
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Parquet import requires pyarrow (pip install pyarrow)")
+        batches = pq.ParquetFile(path).iter_batches(batch_size=EXPORT_CHUNK_SIZE)
+        rows = ((r['product_name'], r['platform'], r['price'], r.get('timestamp'))
+                for batch in batches for r in batch.to_pylist())
+        return import_price_history(rows)
+    if path == '-':
+        return import_price_history(iter_import_rows(sys.stdin, fmt))
+    with open(path, newline='', encoding='utf-8') as f:
+        return import_price_history(iter_import_rows(f, fmt))
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Price history maintenance")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('backfill-rollups', help="Rebuild rollup tables from raw price_history")
+    export_parser = commands.add_parser('export', help="Stream price history to a file")
+    export_parser.add_argument('output', nargs='?', default='-', help="File path, or - for stdout")
+    export_parser.add_argument('--format', choices=EXPORT_FORMATS)
+    export_parser.add_argument('--since', help="Only rows at or after this timestamp")
+    export_parser.add_argument('--until', help="Only rows before this timestamp")
+    import_parser = commands.add_parser('import', help="Load price history from a file")
+    import_parser.add_argument('input', help="File path, or - for stdin")
+    import_parser.add_argument('--format', choices=EXPORT_FORMATS)
+    args = parser.parse_args()
+
+    init_db()
+    if args.command == 'backfill-rollups':
+        for table, count in backfill_rollups().items():
+            print(f"{table}: {count} rows written")
+    elif args.command == 'export':
+        count = export_price_history(args.output, args.format, args.since, args.until)
+        print(f"Exported {count} rows", file=sys.stderr)
+    elif args.command == 'import':
+        try:
+            count = import_price_history_file(args.input, args.format)
+        except ImportAborted as e:
+            sys.exit(f"Import stopped: {e}")
+        print(f"Imported {count} rows", file=sys.stderr)
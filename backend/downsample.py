@@ -0,0 +1,67 @@
+def lttb(points, threshold):
+    """Largest-Triangle-Three-Buckets downsampling of (x, y) points sorted by x
+
+    Keeps the first and last points and, from each of threshold - 2 buckets,
+    the point forming the largest triangle with its neighbours, which
+    preserves the visual shape of a line chart. A threshold below 3 leaves
+    just the first and last points.
+    """
+    n = len(points)
+    if threshold >= n:
+        return list(points)
+    if threshold < 3:
+        return [points[0], points[-1]]
+
+    sampled = [points[0]]
+    bucket_size = (n - 2) / (threshold - 2)
+    a = 0
+    for i in range(threshold - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+
+        # Average of the next bucket is the third corner of the triangle
+        next_start, next_end = end, min(int((i + 2) * bucket_size) + 1, n)
+        next_bucket = points[next_start:next_end] or [points[-1]]
+        avg_x = sum(p[0] for p in next_bucket) / len(next_bucket)
+        avg_y = sum(p[1] for p in next_bucket) / len(next_bucket)
+
+        ax, ay = points[a]
+        best, best_area = start, -1.0
+        for j in range(start, end):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+    sampled.append(points[-1])
+    return sampled
+
+
+def minmax(points, threshold):
+    """Bucketed min/max downsampling: the lowest and highest point of each bucket
+
+    Guarantees price spikes and dips survive, at up to threshold points.
+    """
+    n = len(points)
+    if threshold >= n or threshold < 2:
+        return list(points)
+
+    buckets = max(threshold // 2, 1)
+    bucket_size = n / buckets
+    sampled = []
+    for i in range(buckets):
+        bucket = points[int(i * bucket_size):int((i + 1) * bucket_size)]
+        if not bucket:
+            continue
+        low = min(bucket, key=lambda p: p[1])
+        high = max(bucket, key=lambda p: p[1])
+        sampled.extend(sorted({low, high}, key=lambda p: p[0]))
+    return sampled
+
+
+METHODS = {"lttb": lttb, "minmax": minmax}
+
+
+def downsample(points, threshold, method='lttb'):
+    return METHODS[method](points, threshold)
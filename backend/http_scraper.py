@@ -0,0 +1,114 @@
+import os
+import json
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from lxml import html as lxml_html
+
+from rate_limit import throttle
+
+HTTP_TIMEOUT = float(os.getenv('HTTP_SCRAPE_TIMEOUT', '5'))
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
+
+NAME_KEYS = ("name", "title", "product_name", "productName", "display_name")
+PRICE_KEYS = ("price", "selling_price", "sellingPrice", "sp", "discounted_price", "mrp")
+
+_local = threading.local()
+
+
+def get_session():
+    """Per-thread keep-alive session, so connections to each site are reused"""
+    session = getattr(_local, 'session', None)
+    if session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+        session.headers.update({
+            "User-Agent": USER_AGENT,
+            "Accept": "application/json, text/html;q=0.9",
+        })
+        _local.session = session
+    return session
+
+
+def _parse_price(value):
+    if isinstance(value, (int, float)):
+        return float(value)
+    return float(str(value).replace('₹', '').replace(',', '').strip())
+
+
+def _product_from(obj):
+    """(name, price) if obj looks like a product record, else None"""
+    name = next((obj[k] for k in NAME_KEYS if isinstance(obj.get(k), str)), None)
+    price = next((obj[k] for k in PRICE_KEYS if obj.get(k) not in (None, '')), None)
+    if name is None or price is None:
+        return None
+    try:
+        return {"name": name.strip(), "price": _parse_price(price)}
+    except (TypeError, ValueError):
+        return None
+
+
+def find_products(data, limit):
+    """First list of products in a JSON document (depth-first), or None if there is none"""
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, list):
+            products = [p for p in (_product_from(o) for o in node if isinstance(o, dict)) if p]
+            if products:
+                return products[:limit]
+            stack.extend(reversed(node))
+        elif isinstance(node, dict):
+            stack.extend(reversed(list(node.values())))
+    return None
+
+
+def parse_html(text, selectors, limit):
+    """Product cards from server-rendered HTML, or None if the page has none
+
+    Falls back to the JSON state that Next.js style pages embed in a script
+    tag. None means the page needs a real browser to render results.
+    """
+    tree = lxml_html.fromstring(text)
+    products = []
+    for card in tree.xpath(selectors['card'])[:limit] if selectors else []:
+        name_elem = card.xpath(selectors['name'])
+        price_elem = card.xpath(selectors['price'])
+        try:
+            price = _parse_price(price_elem[0].text_content()) if price_elem else 0.0
+        except ValueError:
+            continue
+        products.append({
+            "name": name_elem[0].text_content().strip() if name_elem else '',
+            "price": price
+        })
+    if products:
+        return products
+
+    for script in tree.xpath('//script[@id="__NEXT_DATA__" or @type="application/json"]'):
+        try:
+            products = find_products(json.loads(script.text_content()), limit)
+        except ValueError:
+            continue
+        if products:
+            return products
+    return None
+
+
+def search(url, selectors, limit):
+    """Fetch a search URL over plain HTTP and extract products
+
+    Returns a non-empty list of products, or None when no products could be
+    recognized and the caller should fall back to the browser. selectors
+    are the platform's card/name/price XPaths for HTML responses.
+    """
+    throttle(url)
+    response = get_session().get(url, timeout=HTTP_TIMEOUT)
+    response.raise_for_status()
+
+    if 'json' in response.headers.get('Content-Type', ''):
+        return find_products(response.json(), limit)
+    return parse_html(response.text, selectors, limit)
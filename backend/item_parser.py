@@ -0,0 +1,137 @@
+import os
+import re
+import threading
+
+# Parses at or above this confidence skip the Gemini extraction call
+FAST_PATH_CONFIDENCE = float(os.getenv('FAST_PATH_CONFIDENCE', '0.8'))
+
+GROCERY_TERMS = {
+    "milk", "bread", "egg", "butter", "cheese", "paneer", "curd", "dahi", "yogurt",
+    "ghee", "cream", "buttermilk", "lassi", "rice", "atta", "flour", "maida", "sooji",
+    "rava", "poha", "oats", "cornflakes", "muesli", "sugar", "salt", "jaggery", "honey",
+    "oil", "dal", "toor", "moong", "chana", "rajma", "besan", "tea", "coffee",
+    "cold coffee", "juice", "water", "soda", "cola", "onion", "potato", "tomato",
+    "garlic", "ginger", "chilli", "coriander", "lemon", "cucumber", "carrot",
+    "cabbage", "spinach", "capsicum", "banana", "apple", "mango", "orange", "grapes",
+    "chicken", "mutton", "fish", "chips", "biscuit", "cookie", "namkeen", "chocolate",
+    "noodles", "pasta", "ketchup", "jam", "peanut butter", "soap", "shampoo",
+    "toothpaste", "detergent", "dishwash", "tissue", "diaper", "ice cream",
+}
+BRANDS = {
+    "amul", "mother dairy", "nandini", "gowardhan", "britannia", "modern", "harvest gold",
+    "nestle", "tata", "aashirvaad", "fortune", "saffola", "maggi", "haldiram", "lays",
+    "parle", "sunfeast", "cadbury", "kissan", "dabur", "patanjali", "india gate",
+    "daawat", "red label", "taj mahal", "bru", "nescafe", "colgate", "surf excel",
+}
+# Adjectives that follow the product in normalized form ("brown bread" -> "bread brown")
+DESCRIPTORS = {"brown", "white", "multigrain", "whole wheat", "toned", "full cream",
+               "skimmed", "salted", "unsalted", "basmati", "green", "red", "fresh"}
+FILLER_WORDS = {
+    "i", "i'd", "need", "want", "would", "like", "get", "me", "buy", "order", "please",
+    "some", "of", "a", "an", "the", "also", "add", "to", "cart", "pack", "packet",
+    "packets", "bottle", "bottles", "few", "can", "you",
+}
+UNITS = {
+    "l": "L", "ltr": "L", "ltrs": "L", "liter": "L", "liters": "L", "litre": "L",
+    "litres": "L", "ml": "ml", "kg": "kg", "kgs": "kg", "kilo": "kg", "kilos": "kg",
+    "kilogram": "kg", "kilograms": "kg", "g": "g", "gm": "g", "gms": "g",
+    "gram": "g", "grams": "g",
+}
+COUNT_WORDS = {"dozen": 12, "half dozen": 6, "one": 1, "two": 2, "three": 3, "four": 4,
+               "five": 5, "six": 6, "ten": 10, "twelve": 12}
+
+_SEPARATORS = re.compile(r'\s*(?:,|;|\n|&|\band\b|\bplus\b)\s*', re.IGNORECASE)
+_QUANTITY = re.compile(r'(\d+(?:\.\d+)?)\s*(' + '|'.join(sorted(UNITS, key=len, reverse=True)) + r')\b')
+_COUNT = re.compile(r'\b(half dozen|' + '|'.join(COUNT_WORDS) + r'|\d+)\b')
+
+_DESCRIPTOR = {d: re.compile(rf'\b{d}\b') for d in DESCRIPTORS}
+_BRAND = re.compile(r'\b(?:' + '|'.join(sorted(BRANDS, key=len, reverse=True)) + r')\b')
+_BRAND_WORDS = {word for brand in BRANDS for word in brand.split()}
+_MULTIWORD_TERMS = [term for term in GROCERY_TERMS if ' ' in term]
+
+_stats_lock = threading.Lock()
+_stats = {"fast_path": 0, "fallback": 0}
+
+
+def _number(value):
+    value = float(value)
+    return str(int(value)) if value.is_integer() else str(value)
+
+
+def _known(word):
+    return word in GROCERY_TERMS or word.rstrip('s') in GROCERY_TERMS or \
+        word.rstrip('es') in GROCERY_TERMS
+
+
+def _parse_segment(segment):
+    """Normalize one phrase; returns (item, recognized)"""
+    text = segment.lower().strip(' .!?')
+
+    quantity = ''
+    match = _QUANTITY.search(text)
+    if match:
+        quantity = _number(match.group(1)) + UNITS[match.group(2)]
+        text = text[:match.start()] + ' ' + text[match.end():]
+    else:
+        match = _COUNT.search(text)
+        if match:
+            word = match.group(1)
+            quantity = str(COUNT_WORDS.get(word, word))
+            text = text[:match.start()] + ' ' + text[match.end():]
+
+    words = [w for w in text.split() if w not in FILLER_WORDS]
+    phrase = ' '.join(words)
+    if not phrase:
+        return None, False
+
+    descriptors = [d for d, pattern in _DESCRIPTOR.items() if pattern.search(phrase)]
+    for descriptor in descriptors:
+        phrase = _DESCRIPTOR[descriptor].sub(' ', phrase)
+    phrase = ' '.join(phrase.split())
+
+    recognized = any(term in phrase for term in _MULTIWORD_TERMS) or \
+        any(_known(word) for word in phrase.split()) or \
+        _BRAND.search(phrase) is not None
+    # Too many unexplained words means this is a sentence, not a list entry
+    unknown = [w for w in phrase.split() if not _known(w) and w not in _BRAND_WORDS]
+    if len(unknown) > 2:
+        recognized = False
+
+    parts = [phrase] + sorted(descriptors, key=segment.lower().find) + ([quantity] if quantity else [])
+    return ' '.join(p for p in parts if p), recognized
+
+
+def parse_items(user_input):
+    """Rule-based extraction of shopping items from free text
+
+    Returns (items, confidence), where confidence is the share of phrases
+    that mention a known grocery term or brand. Mirrors the normalization
+    the Gemini prompt asks for: "2 liters of milk" -> "milk 2L",
+    "a dozen eggs" -> "eggs 12", "brown bread" -> "bread brown".
+    """
+    items = []
+    recognized = 0
+    segments = [s for s in _SEPARATORS.split(user_input) if s and s.strip()]
+    for segment in segments:
+        item, known = _parse_segment(segment)
+        if item is None:
+            continue
+        items.append(item)
+        recognized += known
+    confidence = recognized / len(items) if items else 0.0
+    return items, confidence
+
+
+def record(fast_path):
+    """Count whether a request was answered locally or sent to Gemini"""
+    with _stats_lock:
+        _stats["fast_path" if fast_path else "fallback"] += 1
+
+
+def stats():
+    with _stats_lock:
+        total = _stats["fast_path"] + _stats["fallback"]
+        return {
+            **_stats,
+            "hit_rate": round(_stats["fast_path"] / total, 3) if total else 0.0
+        }
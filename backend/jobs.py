@@ -0,0 +1,149 @@
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+JOB_QUEUE_SIZE = int(os.getenv('JOB_QUEUE_SIZE', '32'))
+# Finished jobs are kept this long for late pollers, then dropped
+JOB_RESULT_TTL = float(os.getenv('JOB_RESULT_TTL', '600'))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class JobQueueFull(Exception):
+    """Raised by JobManager.submit when the bounded queue has no room"""
+
+
+class Job:
+    """A unit of background work and the ordered events it has emitted"""
+
+    def __init__(self, fn, args, kwargs):
+        self.id = uuid.uuid4().hex
+        self.status = QUEUED
+        self.events = []
+        self.result = None
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+        self._cond = threading.Condition()
+
+    def emit(self, event, data):
+        """Record an intermediate result; wakes up anyone streaming the job"""
+        with self._cond:
+            self.events.append({"event": event, "data": data})
+            self._cond.notify_all()
+
+    def wait_for_events(self, since, timeout=None):
+        """Events after index `since`, blocking until one arrives or the job ends"""
+        with self._cond:
+            if len(self.events) <= since and self.status in (QUEUED, RUNNING):
+                self._cond.wait(timeout)
+            return self.events[since:]
+
+    def wait(self, timeout=None):
+        """Block until the job has finished; returns True if it did"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self.finished is not None, timeout)
+
+    def run(self):
+        with self._cond:
+            self.status = RUNNING
+        try:
+            result = self._fn(*self._args, emit=self.emit, **self._kwargs)
+        except Exception as e:
+            logger.exception("Job %s failed: %s", self.id, e)
+            self.finish(error=str(e))
+        else:
+            self.finish(result)
+
+    def finish(self, result=None, error=None):
+        """Record the outcome; FAILED when error is given, DONE otherwise"""
+        with self._cond:
+            self.result = result
+            self.error = error
+            self.status = FAILED if error is not None else DONE
+            self.finished = time.time()
+            self._cond.notify_all()
+
+    def to_dict(self):
+        with self._cond:
+            return {
+                "job_id": self.id,
+                "status": self.status,
+                "events": list(self.events),
+                "result": self.result,
+                "error": self.error
+            }
+
+
+class JobManager:
+    """Bounded queue of background jobs drained by a fixed set of worker threads
+
+    Job functions are called as fn(*args, emit=job.emit, **kwargs) and may
+    call emit(event, data) to publish partial results before returning.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, max_queued=JOB_QUEUE_SIZE, result_ttl=JOB_RESULT_TTL):
+        self.result_ttl = result_ttl
+        self._queue = queue.Queue(maxsize=max_queued)
+        self._jobs = {}
+        self._lock = threading.Lock()
+        for n in range(workers):
+            threading.Thread(target=self._worker, name=f'job-worker-{n}', daemon=True).start()
+
+    def submit(self, fn, *args, **kwargs):
+        self._purge()
+        job = Job(fn, args, kwargs)
+        with self._lock:
+            self._jobs[job.id] = job
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job.id]
+            raise JobQueueFull("Too many jobs in progress, try again shortly")
+        return job
+
+    def track(self):
+        """Register a running job whose work happens elsewhere, e.g. in an asyncio task
+
+        The caller reports the outcome with job.finish(); until then the job
+        can be looked up and waited on like a queued one.
+        """
+        self._purge()
+        job = Job(None, (), {})
+        job.status = RUNNING
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _worker(self):
+        while True:
+            job = self._queue.get()
+            try:
+                job.run()
+            finally:
+                self._queue.task_done()
+
+    def _purge(self):
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items()
+                       if job.finished is not None and job.finished < cutoff]
+            for job_id in expired:
+                del self._jobs[job_id]
@@ -0,0 +1,237 @@
+import os
+import sys
+import time
+import logging
+import threading
+from bisect import bisect_left
+from collections import Counter as _Tally, deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Requests slower than this (ms) get a sampled stack profile; 0 disables profiling
+PROFILE_SLOW_MS = float(os.getenv('PROFILE_SLOW_MS', '0'))
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))
+PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '20'))
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join('{}="{}"'.format(n, str(v).replace('\\', '\\\\').replace('"', '\\"'))
+                     for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    """Monotonic count per label combination"""
+    kind = 'counter'
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(n, '') for n in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, _labels(self.labels, key), value)
+                    for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram per label combination"""
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(n, '') for n in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        out = []
+        with self._lock:
+            values = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                out.append((self.name + '_bucket',
+                            _labels(self.labels + ('le',), key + (bound,)), cumulative))
+            out.append((self.name + '_sum', _labels(self.labels, key), round(total, 6)))
+            out.append((self.name + '_count', _labels(self.labels, key), cumulative))
+        return out
+
+
+class Gauge:
+    """Values read on each scrape from callback() -> {label value tuple: number}"""
+    kind = 'gauge'
+
+    def __init__(self, name, help, labels, callback):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.callback = callback
+
+    def samples(self):
+        try:
+            values = self.callback()
+        except Exception as e:
+            logger.warning("Gauge %s failed: %s", self.name, e)
+            return []
+        return [(self.name, _labels(self.labels, key), value) for key, value in sorted(values.items())]
+
+
+REGISTRY = []
+
+
+def register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+
+def render():
+    """All registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for metric in REGISTRY:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        lines.extend(f'{name}{labels} {value}' for name, labels, value in metric.samples())
+    return '\n'.join(lines) + '\n'
+
+
+REQUEST_SECONDS = register(Histogram(
+    'http_request_duration_seconds', 'HTTP request latency', ('method', 'endpoint', 'status')))
+STAGE_SECONDS = register(Histogram(
+    'comparison_stage_duration_seconds', 'Time spent per comparison stage', ('stage',)))
+LLM_CALLS = register(Counter(
+    'llm_calls_total', 'Gemini calls made, by call kind and outcome', ('kind', 'outcome')))
+SCRAPE_CALLS = register(Counter(
+    'scrape_calls_total', 'Platform lookups, by platform, method and outcome',
+    ('platform', 'method', 'outcome')))
+
+_local = threading.local()
+
+
+@contextmanager
+def stage(name):
+    """Time a block as comparison stage `name`, and add it to the current request's timings"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        timings = getattr(_local, 'timings', None)
+        if timings is not None:
+            timings[name] = timings.get(name, 0.0) + elapsed
+
+
+def start_timings():
+    """Begin collecting stage timings on this thread; returns the dict they go into"""
+    _local.timings = {}
+    return _local.timings
+
+
+def stop_timings():
+    _local.timings = None
+
+
+@contextmanager
+def collect_timings():
+    """Collect stage timings on this thread into the yielded dict (seconds)
+
+    Nested use shares the outer dict, so a request and the comparison it
+    runs report into the same timings.
+    """
+    timings = getattr(_local, 'timings', None)
+    if timings is not None:
+        yield timings
+        return
+    timings = start_timings()
+    try:
+        yield timings
+    finally:
+        stop_timings()
+
+
+def server_timing(timings):
+    """Server-Timing header value for a dict of stage durations in seconds"""
+    return ', '.join(f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings.items())
+
+
+class _Sampler(threading.Thread):
+    """Samples one thread's Python stack every interval until stopped"""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = _Tally()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+_profiles = deque(maxlen=PROFILE_KEEP)
+
+
+def start_profile():
+    """Start sampling the calling thread if slow-request profiling is enabled"""
+    if PROFILE_SLOW_MS <= 0:
+        return None
+    sampler = _Sampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+    sampler.start()
+    return sampler
+
+
+def finish_profile(sampler, label, elapsed):
+    """Stop a sampler and keep its profile if the request was slow"""
+    if sampler is None:
+        return
+    sampler.stop()
+    if elapsed * 1000 < PROFILE_SLOW_MS:
+        return
+    top = sampler.stacks.most_common(10)
+    _profiles.append({"request": label, "duration_ms": round(elapsed * 1000, 1),
+                      "samples": sum(sampler.stacks.values()),
+                      "stacks": [{"stack": stack, "count": count} for stack, count in top]})
+    logger.warning("Slow request %s took %.0f ms; hottest stack: %s",
+                   label, elapsed * 1000, top[0][0] if top else 'n/a')
+
+
+def recent_profiles():
+    """Collapsed stack profiles of the most recent slow requests"""
+    return list(_profiles)
@@ -0,0 +1,218 @@
+import os
+
+import numpy as np
+
+from platforms import get_platform
+
+# Baskets with more surviving assignments than this use greedy + local search
+MAX_COMBINATIONS = int(os.getenv('OPTIMIZER_MAX_COMBINATIONS', '250000'))
+CHUNK_SIZE = 65536
+
+
+class _Fees:
+    """Fee parameters of the platforms being compared, as aligned arrays"""
+
+    def __init__(self, platforms):
+        adapters = [get_platform(name) for name in platforms]
+        self.delivery = np.array([a.delivery_fee for a in adapters], dtype=float)
+        self.platform = np.array([a.platform_fee for a in adapters], dtype=float)
+        self.threshold = np.array([a.free_delivery_threshold for a in adapters], dtype=float)
+
+    def total(self, subtotals, used):
+        """Fees per row of (rows, platforms) subtotals, charging only used platforms"""
+        delivery = np.where(subtotals > self.threshold, 0.0, self.delivery)
+        return ((delivery + self.platform) * used).sum(axis=1)
+
+    def savings_bound(self):
+        """Largest fee change moving one item between platforms can cause
+
+        The target may become newly used (delivery + platform fee) and the
+        source may drop back under its free-delivery threshold (delivery).
+        """
+        if not len(self.delivery):
+            return 0.0
+        return float((self.delivery + self.platform).max() + self.delivery.max())
+
+
+def _price_matrix(items, results, platforms):
+    """(items, platforms) array of available prices, inf where unavailable"""
+    prices = np.full((len(items), len(platforms)), np.inf)
+    for p, platform in enumerate(platforms):
+        for i, result in enumerate(results[platform]['items'][:len(items)]):
+            if result.get('available', True) and result['price'] > 0:
+                prices[i, p] = result['price']
+    return prices
+
+
+def _candidates(prices, bound):
+    """Per item, the platforms that could appear in an optimal plan
+
+    An option costing more than its item's cheapest price plus the largest
+    possible fee saving can always be improved by moving the item, so it
+    is pruned before enumeration.
+    """
+    best = prices.min(axis=1, keepdims=True)
+    keep = np.isfinite(prices) & (prices <= best + bound + 1e-9)
+    return [np.flatnonzero(row) for row in keep]
+
+
+def _evaluate(prices, fees, choices):
+    """Totals for a (rows, items) array of platform choices"""
+    rows, k = choices.shape[0], prices.shape[1]
+    item_prices = prices[np.arange(prices.shape[0]), choices]
+    subtotals = np.zeros((rows, k))
+    counts = np.zeros((rows, k))
+    for p in range(k):
+        mask = choices == p
+        subtotals[:, p] = np.where(mask, item_prices, 0.0).sum(axis=1)
+        counts[:, p] = mask.sum(axis=1)
+    return subtotals.sum(axis=1) + fees.total(subtotals, counts > 0)
+
+
+def _exhaustive(prices, fees, candidates):
+    """Cheapest assignment over every combination of candidate platforms"""
+    radices = np.array([len(c) for c in candidates])
+    total = int(np.prod(radices))
+    best_cost, best_choice = np.inf, None
+    for start in range(0, total, CHUNK_SIZE):
+        index = np.arange(start, min(start + CHUNK_SIZE, total))
+        choices = np.empty((len(index), len(candidates)), dtype=int)
+        # Decode each combination number as a mixed-radix digit per item
+        for i, options in enumerate(candidates):
+            choices[:, i] = options[index % radices[i]]
+            index = index // radices[i]
+        costs = _evaluate(prices, fees, choices)
+        row = int(costs.argmin())
+        if costs[row] < best_cost:
+            best_cost, best_choice = float(costs[row]), choices[row]
+    return best_choice, total
+
+
+def _local_search(prices, fees, candidates):
+    """Greedy start plus single-item and whole-platform moves until no move helps
+
+    Starts from every single-platform plan that covers the basket and from
+    each item's cheapest platform, then keeps the best local optimum.
+    """
+    n, k = prices.shape
+    starts = [prices.argmin(axis=1)]
+    starts += [np.full(n, p) for p in range(k) if np.isfinite(prices[:, p]).all()]
+    evaluated = 0
+    best_cost, best_choice = np.inf, None
+    for choice in starts:
+        choice = choice.copy()
+        cost = float(_evaluate(prices, fees, choice[None, :])[0])
+        improved = True
+        while improved:
+            improved = False
+            # All single-item moves of the current plan, scored in one batch
+            moves = [(i, p) for i in range(n) for p in candidates[i] if p != choice[i]]
+            # Emptying a platform by moving its items to their next-best option
+            for p in set(choice.tolist()):
+                moved = choice.copy()
+                for i in np.flatnonzero(choice == p):
+                    others = [q for q in candidates[i] if q != p]
+                    if not others:
+                        break
+                    moved[i] = min(others, key=lambda q: prices[i, q])
+                else:
+                    moves.append((None, moved))
+            if not moves:
+                break
+            neighbours = np.repeat(choice[None, :], len(moves), axis=0)
+            for row, (i, p) in enumerate(moves):
+                if i is None:
+                    neighbours[row] = p
+                else:
+                    neighbours[row, i] = p
+            costs = _evaluate(prices, fees, neighbours)
+            evaluated += len(moves)
+            row = int(costs.argmin())
+            if costs[row] < cost - 1e-9:
+                choice, cost, improved = neighbours[row], float(costs[row]), True
+        if cost < best_cost:
+            best_cost, best_choice = cost, choice
+    return best_choice, evaluated
+
+
+def _order(adapter_fees, names, prices):
+    items_total = round(float(sum(prices)), 2)
+    delivery_fee = 0.0 if items_total > adapter_fees['threshold'] else adapter_fees['delivery']
+    return {
+        "items": names,
+        "items_total": items_total,
+        "delivery_fee": delivery_fee,
+        "platform_fee": adapter_fees['platform'],
+        "total": round(items_total + delivery_fee + adapter_fees['platform'], 2)
+    }
+
+
+def optimize_basket(items, results):
+    """Cheapest way to buy the basket, split across platforms if that saves money
+
+    results maps platform name to its scrape result ({"items": [...]}, one
+    entry per item in order). Each platform used charges its platform fee
+    and, below its free-delivery threshold, its delivery fee. Items no
+    platform has in stock are listed under "unavailable".
+
+    Returns the plan's orders per platform, its total, the best
+    single-platform total that covers the same items and the saving.
+    """
+    platforms = list(results)
+    prices = _price_matrix(items, results, platforms)
+    fees = _Fees(platforms)
+    stocked = np.flatnonzero(np.isfinite(prices).any(axis=1)) if platforms else np.array([], dtype=int)
+    in_stock = set(stocked.tolist())
+    unavailable = [item for i, item in enumerate(items) if i not in in_stock]
+
+    plan = {"orders": {}, "total": 0.0, "split": False, "unavailable": unavailable,
+            "single_platform": None, "single_platform_total": None, "savings": 0.0,
+            "method": "exhaustive", "evaluated": 0}
+    if not len(stocked):
+        return plan
+
+    prices = prices[stocked]
+    candidates = _candidates(prices, fees.savings_bound())
+    combinations = 1
+    for options in candidates:
+        combinations *= len(options)
+        if combinations > MAX_COMBINATIONS:
+            break
+    if combinations <= MAX_COMBINATIONS:
+        choice, evaluated = _exhaustive(prices, fees, candidates)
+    else:
+        choice, evaluated = _local_search(prices, fees, candidates)
+        plan['method'] = 'local_search'
+
+    total = float(_evaluate(prices, fees, choice[None, :])[0])
+    for p in sorted(set(choice.tolist())):
+        rows = np.flatnonzero(choice == p)
+        adapter_fees = {"delivery": float(fees.delivery[p]), "platform": float(fees.platform[p]),
+                        "threshold": float(fees.threshold[p])}
+        plan['orders'][platforms[p]] = _order(adapter_fees, [items[stocked[i]] for i in rows],
+                                              prices[rows, p])
+
+    # Single-platform plans are the columns that stock every item
+    covering = [p for p in range(len(platforms)) if np.isfinite(prices[:, p]).all()]
+    if covering:
+        singles = _evaluate(prices, fees, np.array([[p] * len(stocked) for p in covering]))
+        best = int(singles.argmin())
+        plan['single_platform'] = platforms[covering[best]]
+        plan['single_platform_total'] = round(float(singles[best]), 2)
+        plan['savings'] = round(float(singles[best]) - total, 2)
+
+    plan.update({"total": round(total, 2), "split": len(plan['orders']) > 1, "evaluated": evaluated})
+    return plan
+
+
+def describe_plan(plan):
+    """One-sentence, deterministic answer to "split the order or not?" """
+    orders = plan['orders']
+    if not orders:
+        return "None of the items are available right now."
+    if not plan['split']:
+        platform = next(iter(orders))
+        return f"Buy everything from {platform} (₹{plan['total']:.2f}); splitting the order would not save money."
+    parts = ', '.join(f"{', '.join(order['items'])} from {platform}" for platform, order in orders.items())
+    saving = f", saving ₹{plan['savings']:.2f} over {plan['single_platform']}" if plan['single_platform'] else ''
+    return f"Split the order: {parts} for ₹{plan['total']:.2f} in total{saving}."
@@ -0,0 +1,80 @@
+import os
+import threading
+from urllib.parse import quote
+
+FREE_DELIVERY_THRESHOLD = 199
+# Comma-separated platform names to skip, e.g. DISABLED_PLATFORMS="Blinkit"
+DISABLED_PLATFORMS = {name.strip() for name in os.getenv('DISABLED_PLATFORMS', '').split(',')
+                      if name.strip()}
+
+
+class PlatformAdapter:
+    """Everything the orchestrator needs to know about one platform
+
+    scrape(items, location) returns {"items": [...]} with one result per item
+    in order. search_url is a template with a {query} placeholder. selectors
+    (optional) are XPath expressions for the lightweight HTTP scraper.
+    concurrency caps simultaneous lookups on this platform across requests.
+    """
+
+    def __init__(self, name, scrape, search_url, delivery_fee=0, platform_fee=0,
+                 free_delivery_threshold=FREE_DELIVERY_THRESHOLD, concurrency=2,
+                 selectors=None, enabled=True):
+        self.name = name
+        self.scrape = scrape
+        self.search_url = search_url
+        self.delivery_fee = delivery_fee
+        self.platform_fee = platform_fee
+        self.free_delivery_threshold = free_delivery_threshold
+        self.concurrency = concurrency
+        self.selectors = selectors
+        self.enabled = enabled and name not in DISABLED_PLATFORMS
+        self.slots = threading.BoundedSemaphore(concurrency)
+
+    def url_for(self, item):
+        return self.search_url.format(query=quote(item))
+
+    def fees(self, items):
+        """Delivery and platform fee for a basket of scraped items"""
+        items_total = sum(item['price'] for item in items)
+        return {
+            "delivery_fee": 0 if items_total > self.free_delivery_threshold else self.delivery_fee,
+            "platform_fee": self.platform_fee
+        }
+
+
+PLATFORMS = {}
+
+
+def register_platform(adapter):
+    PLATFORMS[adapter.name] = adapter
+    return adapter
+
+
+def get_platform(name):
+    return PLATFORMS[name]
+
+
+def enabled_platforms(names=None):
+    """Enabled adapters in registration order, optionally limited to names"""
+    if isinstance(names, str):
+        names = [names]
+    names = None if names is None else set(names)
+    return [adapter for name, adapter in PLATFORMS.items()
+            if adapter.enabled and (names is None or name in names)]
+
+
+def platform_selection_error(names):
+    """Error body for a request's "platforms" value, or None if it selects something
+
+    It must be a list of registered platform names with at least one enabled.
+    """
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        return {"error": "platforms must be a list of platform names"}
+    unknown = [name for name in names if name not in PLATFORMS]
+    if unknown:
+        return {"error": f"Unknown platforms: {', '.join(unknown)}", "unknown": unknown,
+                "available": [adapter.name for adapter in enabled_platforms()]}
+    if not enabled_platforms(names):
+        return {"error": "No enabled platforms selected"}
+    return None
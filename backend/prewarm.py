@@ -0,0 +1,241 @@
+"""Background pre-fetching of prices for the most requested items
+
+Comparisons record which items are asked for in which location. Every
+PREWARM_INTERVAL seconds (with jitter) the scheduler queues the top
+PREWARM_TOP_N items per location for each enabled platform, skipping
+entries that are still fresh in the price cache. A few workers drain the
+bounded queue through the normal scrapers, so per-domain politeness limits
+and platform slots apply; on top of that each platform has its own small
+token bucket, and a platform whose lookups fail is backed off
+exponentially. Results only land in the price cache: they are unmatched
+candidates, so price_history is left to comparisons, which record the
+product they matched.
+
+Each process runs its own scheduler; with several app workers, enable it
+in one of them only.
+"""
+import os
+import time
+import queue
+import random
+import logging
+import threading
+
+from cache import price_cache, price_cache_key, normalize_item, FRESH
+from platforms import enabled_platforms
+from rate_limit import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+# Seconds between pre-warm rounds; a little under PRICE_CACHE_TTL keeps popular entries fresh
+PREWARM_INTERVAL = float(os.getenv('PREWARM_INTERVAL', '240'))
+# Rounds start up to this fraction of the interval early or late
+PREWARM_JITTER = float(os.getenv('PREWARM_JITTER', '0.2'))
+PREWARM_TOP_N = int(os.getenv('PREWARM_TOP_N', '20'))
+PREWARM_WORKERS = int(os.getenv('PREWARM_WORKERS', '2'))
+PREWARM_QUEUE_SIZE = int(os.getenv('PREWARM_QUEUE_SIZE', '500'))
+# Background lookups per second allowed per platform, in addition to the shared scrape limits
+PREWARM_RATE_PER_SEC = float(os.getenv('PREWARM_RATE_PER_SEC', '0.2'))
+# Backoff after failed lookups on a platform: base * 2^(failures - 1), capped, with jitter
+PREWARM_BACKOFF_BASE = float(os.getenv('PREWARM_BACKOFF_BASE', '30'))
+PREWARM_BACKOFF_MAX = float(os.getenv('PREWARM_BACKOFF_MAX', '1800'))
+# Requests older than this many seconds count half as much towards popularity
+POPULARITY_HALF_LIFE = float(os.getenv('POPULARITY_HALF_LIFE', '86400'))
+POPULARITY_MAX_TRACKED = int(os.getenv('POPULARITY_MAX_TRACKED', '5000'))
+
+
+class Popularity:
+    """Exponentially decayed request counts per (location, item)"""
+
+    def __init__(self, half_life=POPULARITY_HALF_LIFE, max_tracked=POPULARITY_MAX_TRACKED):
+        self.half_life = half_life
+        self.max_tracked = max_tracked
+        self._scores = {}
+        self._lock = threading.Lock()
+
+    def _decayed(self, score, updated, now):
+        return score * 0.5 ** ((now - updated) / self.half_life)
+
+    def record(self, items, location):
+        now = time.time()
+        location = normalize_item(location)
+        with self._lock:
+            for item in {normalize_item(item) for item in items}:
+                key = (location, item)
+                score, updated = self._scores.get(key, (0.0, now))
+                self._scores[key] = (self._decayed(score, updated, now) + 1, now)
+            if len(self._scores) > self.max_tracked:
+                self._prune(now)
+
+    def _prune(self, now):
+        ranked = sorted(self._scores, key=lambda key: self._decayed(*self._scores[key], now))
+        for key in ranked[:len(self._scores) - self.max_tracked]:
+            del self._scores[key]
+
+    def top(self, n):
+        """{location: [item, ...]} with each location's n most requested items"""
+        now = time.time()
+        with self._lock:
+            scored = [(self._decayed(score, updated, now), location, item)
+                      for (location, item), (score, updated) in self._scores.items()]
+        scored.sort(reverse=True)
+        top = {}
+        for _, location, item in scored:
+            items = top.setdefault(location, [])
+            if len(items) < n:
+                items.append(item)
+        return top
+
+    def __len__(self):
+        return len(self._scores)
+
+
+class Prewarmer:
+    """Scheduler thread plus workers that keep popular prices in the cache
+
+    fetch(platform, items, location) must return one result per item and
+    cache the available ones, like scraper.scrape_items.
+    """
+
+    def __init__(self, fetch, popularity, interval=PREWARM_INTERVAL, top_n=PREWARM_TOP_N,
+                 workers=PREWARM_WORKERS, queue_size=PREWARM_QUEUE_SIZE):
+        self.fetch = fetch
+        self.popularity = popularity
+        self.interval = interval
+        self.top_n = top_n
+        self.workers = workers
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._pending = set()
+        self._buckets = {}
+        self._failures = {}
+        self._backoff_until = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self.counts = {"queued": 0, "dropped": 0, "fetched": 0, "unavailable": 0,
+                       "failed": 0, "deferred": 0, "rounds": 0}
+
+    def start(self):
+        if self._threads:
+            return
+        self._threads = [threading.Thread(target=self._schedule, name='prewarm-scheduler', daemon=True)]
+        self._threads += [threading.Thread(target=self._work, name=f'prewarm-{n}', daemon=True)
+                          for n in range(self.workers)]
+        for thread in self._threads:
+            thread.start()
+        logger.info("Pre-warming top %d items every %.0fs", self.top_n, self.interval)
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.counts[name] += amount
+
+    def _jittered(self, seconds):
+        return seconds * random.uniform(1 - PREWARM_JITTER, 1 + PREWARM_JITTER)
+
+    def _schedule(self):
+        while not self._stop.wait(self._jittered(self.interval)):
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.warning("Pre-warm round failed: %s", e)
+
+    def run_once(self):
+        """Queue every popular (platform, item, location) not fresh in the cache"""
+        self._count('rounds')
+        queued = 0
+        for location, items in self.popularity.top(self.top_n).items():
+            for adapter in enabled_platforms():
+                for item in items:
+                    task = (adapter.name, item, location)
+                    if price_cache.state(price_cache_key(*task)) == FRESH:
+                        continue
+                    with self._lock:
+                        if task in self._pending:
+                            continue
+                        self._pending.add(task)
+                    try:
+                        self._queue.put_nowait(task)
+                        queued += 1
+                    except queue.Full:
+                        with self._lock:
+                            self._pending.discard(task)
+                        self._count('dropped')
+        self._count('queued', queued)
+        return queued
+
+    def _bucket(self, platform):
+        with self._lock:
+            if platform not in self._buckets:
+                self._buckets[platform] = TokenBucket(PREWARM_RATE_PER_SEC, 1)
+            return self._buckets[platform]
+
+    def _backing_off(self, platform):
+        with self._lock:
+            return time.monotonic() < self._backoff_until.get(platform, 0)
+
+    def _record_outcome(self, platform, ok):
+        with self._lock:
+            if ok:
+                self._failures.pop(platform, None)
+                return
+            failures = self._failures.get(platform, 0) + 1
+            self._failures[platform] = failures
+            delay = min(PREWARM_BACKOFF_MAX, PREWARM_BACKOFF_BASE * 2 ** (failures - 1))
+            self._backoff_until[platform] = time.monotonic() + self._jittered(delay)
+        logger.info("Pre-warm backing off %s for about %.0fs after %d failures",
+                    platform, delay, failures)
+
+    def _work(self):
+        while not self._stop.is_set():
+            try:
+                task = self._queue.get(timeout=1)
+            except queue.Empty:
+                continue
+            try:
+                self._process(*task)
+            finally:
+                with self._lock:
+                    self._pending.discard(task)
+                self._queue.task_done()
+
+    def _process(self, platform, item, location):
+        # Left for the next round rather than holding a worker while backing off
+        if self._backing_off(platform):
+            self._count('deferred')
+            return
+        while not self._bucket(platform).acquire(timeout=1):
+            if self._stop.is_set():
+                return
+        # A user request may have fetched it while the task was queued
+        if price_cache.state(price_cache_key(platform, item, location)) == FRESH:
+            return
+        try:
+            result = self.fetch(platform, [item], location)[0]
+        except Exception as e:
+            logger.warning("Pre-warm %s lookup for %r failed: %s", platform, item, e)
+            self._count('failed')
+            self._record_outcome(platform, False)
+            return
+        if result.get('available') and result.get('price', 0) > 0:
+            self._count('fetched')
+            self._record_outcome(platform, True)
+        else:
+            # Scrapers report blocks and page errors as unavailable, so these back off too
+            self._count('unavailable')
+            self._record_outcome(platform, False)
+
+    def stats(self):
+        with self._lock:
+            return {**self.counts, "queue_depth": self._queue.qsize(),
+                    "tracked_items": len(self.popularity),
+                    "backing_off": sum(1 for until in self._backoff_until.values()
+                                       if time.monotonic() < until)}
+
+
+popularity = Popularity()
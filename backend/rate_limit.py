@@ -0,0 +1,69 @@
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+# Default politeness budget per domain: sustained requests/second and burst size
+SCRAPE_RATE_PER_SEC = float(os.getenv('SCRAPE_RATE_PER_SEC', '1.0'))
+SCRAPE_BURST = int(os.getenv('SCRAPE_BURST', '3'))
+
+
+class TokenBucket:
+    """Thread-safe token bucket refilled continuously at `rate` tokens/second"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self, tokens=1):
+        """Take tokens if available right now; never blocks"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= tokens:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens=1, timeout=None):
+        """Block until tokens are available. Returns False if timeout expires first."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return True
+                wait_for = (tokens - self._tokens) / self.rate
+            if deadline is not None:
+                remaining = deadline - now
+                if remaining <= 0:
+                    return False
+                wait_for = min(wait_for, remaining)
+            time.sleep(wait_for)
+
+
+_buckets = {}
+_buckets_lock = threading.Lock()
+
+
+def get_bucket(domain, rate=None, capacity=None):
+    """Shared bucket for a domain, created on first use"""
+    with _buckets_lock:
+        bucket = _buckets.get(domain)
+        if bucket is None:
+            bucket = TokenBucket(rate or SCRAPE_RATE_PER_SEC, capacity or SCRAPE_BURST)
+            _buckets[domain] = bucket
+        return bucket
+
+
+def throttle(url, timeout=None):
+    """Wait for the politeness budget of the URL's domain before fetching it"""
+    return get_bucket(urlparse(url).netloc).acquire(timeout=timeout)
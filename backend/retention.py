@@ -0,0 +1,256 @@
+"""Retention for price_history: bounded deletes, then incremental compaction
+
+Raw rows older than RETENTION_DAYS are deleted in batches of
+RETENTION_BATCH_SIZE, oldest first along idx_timestamp. Each batch is its
+own short transaction followed by a pause, so live inserts never wait
+behind retention for more than one batch. Their daily and hourly rollups
+stay (hourly ones until RETENTION_HOURLY_DAYS), so trends and charts keep
+their history. Afterwards freed pages are returned to the filesystem with
+incremental VACUUM, the WAL is checkpointed and statistics refreshed.
+
+    python retention.py --days 90
+
+init_db switches older databases to auto_vacuum=INCREMENTAL with a one-time
+VACUUM, so the file can shrink.
+
+In the app, a scheduler thread runs it every RETENTION_INTERVAL hours.
+GET /api/maintenance/retention reports on runs; POST starts one and needs
+the ADMIN_TOKEN in an X-Admin-Token header.
+"""
+import os
+import sys
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+
+import database
+
+logger = logging.getLogger(__name__)
+
+RETENTION_DAYS = int(os.getenv('RETENTION_DAYS', '90'))
+# Hourly rollups are only read for short ranges; daily rollups are kept indefinitely
+RETENTION_HOURLY_DAYS = int(os.getenv('RETENTION_HOURLY_DAYS', '90'))
+RETENTION_BATCH_SIZE = int(os.getenv('RETENTION_BATCH_SIZE', '2000'))
+# Pause between batches so other writers can take the lock
+RETENTION_PAUSE_MS = float(os.getenv('RETENTION_PAUSE_MS', '50'))
+# Free pages released per incremental_vacuum step
+RETENTION_VACUUM_PAGES = int(os.getenv('RETENTION_VACUUM_PAGES', '512'))
+# Rows sampled per index by ANALYZE, keeping it cheap on large tables
+RETENTION_ANALYSIS_LIMIT = int(os.getenv('RETENTION_ANALYSIS_LIMIT', '1000'))
+# Hours between scheduled runs; 0 disables the scheduler
+RETENTION_INTERVAL = float(os.getenv('RETENTION_INTERVAL', '24'))
+
+
+class RetentionRun:
+    """Progress of one retention run, safe to read from other threads"""
+
+    def __init__(self, days, hourly_days):
+        self.days = days
+        self.hourly_days = hourly_days
+        self.phase = 'starting'
+        self.candidates = 0
+        self.deleted = 0
+        self.hourly_deleted = 0
+        self.batches = 0
+        self.pages_freed = 0
+        self.error = None
+        self.started = time.time()
+        self.finished = None
+
+    def to_dict(self):
+        elapsed = (self.finished or time.time()) - self.started
+        return {
+            "phase": self.phase,
+            "days": self.days,
+            "candidates": self.candidates,
+            "deleted": self.deleted,
+            "progress": round(self.deleted / self.candidates, 3) if self.candidates else 1.0,
+            "hourly_rollups_deleted": self.hourly_deleted,
+            "batches": self.batches,
+            "pages_freed": self.pages_freed,
+            "error": self.error,
+            "started_at": datetime.fromtimestamp(self.started).isoformat(),
+            "elapsed_sec": round(elapsed, 2)
+        }
+
+
+def _pause(stop):
+    # Outside any transaction: this is where live inserts get the write lock
+    if stop is not None:
+        return stop.wait(RETENTION_PAUSE_MS / 1000)
+    time.sleep(RETENTION_PAUSE_MS / 1000)
+    return False
+
+
+def delete_old_rows(conn, cutoff, run, batch_size=RETENTION_BATCH_SIZE, stop=None):
+    """Delete price_history rows before cutoff, oldest first, one batch per transaction"""
+    run.phase = 'deleting'
+    # Counted along the index once, for progress reporting only
+    run.candidates = conn.execute(
+        'SELECT COUNT(*) FROM price_history INDEXED BY idx_timestamp WHERE timestamp < ?',
+        (cutoff,)).fetchone()[0]
+    while True:
+        with conn:
+            deleted = conn.execute('''
+                DELETE FROM price_history WHERE id IN (
+                    SELECT id FROM price_history INDEXED BY idx_timestamp
+                    WHERE timestamp < ?
+                    ORDER BY timestamp
+                    LIMIT ?
+                )
+            ''', (cutoff, batch_size)).rowcount
+        run.deleted += deleted
+        run.batches += 1
+        if deleted < batch_size or _pause(stop):
+            return run.deleted
+
+
+def delete_old_rollups(conn, cutoff, run, batch_size=RETENTION_BATCH_SIZE, stop=None):
+    """Delete hourly rollup rows before cutoff, one product per transaction
+
+    Each delete is a primary-key range seek per (product, platform); the
+    pause comes after about batch_size rows.
+    """
+    run.phase = 'pruning_rollups'
+    product_ids = [row[0] for row in conn.execute('SELECT DISTINCT product_id FROM price_hourly')]
+    since_pause = 0
+    for product_id in product_ids:
+        with conn:
+            deleted = conn.execute('DELETE FROM price_hourly WHERE product_id = ? AND hour < ?',
+                                   (product_id, cutoff)).rowcount
+        run.hourly_deleted += deleted
+        since_pause += deleted
+        if since_pause >= batch_size:
+            since_pause = 0
+            if _pause(stop):
+                break
+    return run.hourly_deleted
+
+
+def compact_database(conn, run, stop=None):
+    """Release free pages a few at a time, checkpoint the WAL and refresh statistics"""
+    run.phase = 'compacting'
+    if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == database.AUTO_VACUUM_INCREMENTAL:
+        while True:
+            free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if not free:
+                break
+            # executescript steps the pragma to completion; execute() frees a single page
+            conn.executescript(f'PRAGMA incremental_vacuum({min(free, RETENTION_VACUUM_PAGES)})')
+            run.pages_freed += free - conn.execute('PRAGMA freelist_count').fetchone()[0]
+            if _pause(stop):
+                return
+    else:
+        logger.warning("auto_vacuum is not incremental; freed pages are reused but the file "
+                       "does not shrink")
+    # PASSIVE never waits for readers or writers
+    conn.execute('PRAGMA wal_checkpoint(PASSIVE)').fetchall()
+    run.phase = 'analyzing'
+    conn.execute(f'PRAGMA analysis_limit={RETENTION_ANALYSIS_LIMIT}')
+    conn.execute('ANALYZE')
+    conn.commit()
+
+
+_lock = threading.Lock()
+_current = None
+_last = None
+
+
+def run_retention(days=RETENTION_DAYS, hourly_days=RETENTION_HOURLY_DAYS, stop=None):
+    """Run retention once on this thread; returns the finished RetentionRun
+
+    Rows without a product id are assigned one first, so every deleted row
+    is already counted in the rollups. Raises RuntimeError if a run is
+    already in progress.
+    """
+    global _current, _last
+    run = RetentionRun(days, hourly_days)
+    with _lock:
+        if _current is not None:
+            raise RuntimeError("Retention is already running")
+        _current = run
+    try:
+        conn = database.get_connection()
+        database.migrate_product_ids()
+        now = datetime.now()
+        stages = (
+            lambda: delete_old_rows(conn, (now - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S'),
+                                    run, stop=stop),
+            lambda: delete_old_rollups(conn, (now - timedelta(days=hourly_days)).strftime('%Y-%m-%d %H:00'),
+                                       run, stop=stop),
+            lambda: compact_database(conn, run, stop),
+        )
+        for stage in stages:
+            if stop is not None and stop.is_set():
+                break
+            stage()
+        run.phase = 'stopped' if stop is not None and stop.is_set() else 'done'
+        logger.info("Retention removed %d rows and %d hourly rollups in %d batches, freed %d pages",
+                    run.deleted, run.hourly_deleted, run.batches, run.pages_freed)
+    except Exception as e:
+        run.phase = 'failed'
+        run.error = str(e)
+        logger.error("Retention failed: %s", e)
+    finally:
+        run.finished = time.time()
+        with _lock:
+            _current = None
+            _last = run
+    return run
+
+
+def start_retention(days=RETENTION_DAYS):
+    """Run retention on a background thread; False if one is already running"""
+    with _lock:
+        if _current is not None:
+            return False
+    def run():
+        try:
+            run_retention(days)
+        except RuntimeError as e:
+            logger.info("Retention not started: %s", e)
+    threading.Thread(target=run, name='retention', daemon=True).start()
+    return True
+
+
+def status():
+    """Progress of the running retention pass, and the result of the last one"""
+    with _lock:
+        current, last = _current, _last
+    return {"running": current.to_dict() if current else None,
+            "last": last.to_dict() if last else None}
+
+
+class RetentionScheduler(threading.Thread):
+    """Runs retention every `interval` hours until stopped"""
+
+    def __init__(self, interval=RETENTION_INTERVAL):
+        super().__init__(name='retention-scheduler', daemon=True)
+        self.interval = interval
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval * 3600):
+            try:
+                run_retention(stop=self._stop_event)
+            except RuntimeError as e:
+                logger.info("Skipping scheduled retention: %s", e)
+
+    def stop(self):
+        self._stop_event.set()
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description="Delete old price history and compact the database")
+    parser.add_argument('--days', type=int, default=RETENTION_DAYS, help="Keep raw rows this many days")
+    parser.add_argument('--hourly-days', type=int, default=RETENTION_HOURLY_DAYS,
+                        help="Keep hourly rollups this many days")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+
+    database.init_db()
+    result = run_retention(args.days, args.hourly_days)
+    print(result.to_dict(), file=sys.stderr)
+    sys.exit(1 if result.error else 0)
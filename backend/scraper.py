@@ -1,12 +1,93 @@
 from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.chrome.options import Options
 from bs4 import BeautifulSoup
-import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+from browser_pool import DriverPool
+from rate_limit import throttle
+import http_scraper
+from platforms import PlatformAdapter, register_platform, get_platform, enabled_platforms
+from cache import price_cache, price_cache_key, STALE
+from catalog import TrigramIndex, normalize
+import metrics
+import threading
+import logging
+import os
 import random
 
+logger = logging.getLogger(__name__)
+
+# Scraping work runs on one worker pool per platform, sized to the adapter's
+# concurrency (see register_platform calls below), so a platform's queued
+# lookups wait in its own pool and never hold workers other platforms need.
+SCRAPE_DEADLINE = float(os.getenv('SCRAPE_DEADLINE', '30'))
+
+# Upper bound on waiting for a results page; readiness usually returns far sooner
+PAGE_READY_TIMEOUT = float(os.getenv('PAGE_READY_TIMEOUT', '10'))
+# A page counts as network-idle once no fetch/XHR is in flight and no
+# resource has finished for this long
+NETWORK_IDLE_MS = int(os.getenv('NETWORK_IDLE_MS', '500'))
+# Installed in every page before its own scripts run: counts fetch and XHR
+# requests in flight, which resource timing only lists once they complete
+TRACK_REQUESTS_JS = """
+    (function () {
+        window.__pendingRequests = 0;
+        window.__lastRequestEnd = 0;
+        function started() { window.__pendingRequests++; }
+        function ended() {
+            window.__pendingRequests = Math.max(0, window.__pendingRequests - 1);
+            window.__lastRequestEnd = performance.now();
+        }
+        var originalFetch = window.fetch;
+        if (originalFetch) {
+            window.fetch = function () {
+                started();
+                return originalFetch.apply(this, arguments).finally(ended);
+            };
+        }
+        var originalSend = XMLHttpRequest.prototype.send;
+        XMLHttpRequest.prototype.send = function () {
+            started();
+            this.addEventListener('loadend', ended);
+            return originalSend.apply(this, arguments);
+        };
+    })();
+"""
+NETWORK_IDLE_JS = """
+    if (document.readyState !== 'complete') return false;
+    if (window.__pendingRequests > 0) return false;
+    var entries = performance.getEntriesByType('resource');
+    var last = window.__lastRequestEnd || 0;
+    for (var i = 0; i < entries.length; i++) {
+        last = Math.max(last, entries[i].responseEnd);
+    }
+    return performance.now() - last > arguments[0];
+"""
+
+# Product cards kept per search so the AI matcher can pick a better one
+MAX_CANDIDATES = int(os.getenv('MAX_CANDIDATES', '5'))
+
+# Try the lightweight requests + lxml path before launching a browser
+SCRAPER_HTTP_MODE = os.getenv('SCRAPER_HTTP_MODE', 'true').lower() == 'true'
+
+_executors = {}
+_executors_lock = threading.Lock()
+
+def _platform_executor(platform):
+    """The platform's own worker pool, one thread per concurrency slot"""
+    with _executors_lock:
+        if platform not in _executors:
+            adapter = get_platform(platform)
+            _executors[platform] = ThreadPoolExecutor(
+                max_workers=adapter.concurrency,
+                thread_name_prefix=f"scraper-{adapter.name.lower().replace(' ', '-')}")
+        return _executors[platform]
+
+def calculate_fees(platform, items):
+    """Delivery and platform fee for a platform given its scraped items"""
+    return get_platform(platform).fees(items)
+
 def setup_driver():
     """Setup Selenium WebDriver with headless Chrome"""
     chrome_options = Options()
@@ -18,137 +99,200 @@ def setup_driver():
     chrome_options.add_argument('user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36')
 
     driver = webdriver.Chrome(options=chrome_options)
-    return driver
-
-def scrape_zepto(items, location='Pune'):
-    """Scrape prices from Zepto"""
-    results = []
-
-    print("Starting Zepto scraper...")
     try:
-        driver = setup_driver()
-        print("Selenium WebDriver for Zepto initialized.")
+        driver.execute_cdp_cmd('Page.addScriptToEvaluateOnNewDocument', {"source": TRACK_REQUESTS_JS})
+    except Exception as e:
+        # Readiness then falls back to resource timing alone
+        logger.warning("Could not install the request tracker: %s", e)
+    return driver
 
-        for item in items:
-            try:
-                # Navigate to Zepto search
-                print(f"Scraping Zepto for item: Entered Zepto")
-                search_url = f"https://www.zepto.com/search?query={item.replace(' ', '%20')}"
-                driver.get(search_url)
-                time.sleep(random.uniform(2, 4))
+def wait_for_page_ready(driver, locator, timeout=PAGE_READY_TIMEOUT):
+    """Wait until the product selector appears or the page goes network-idle
 
+    Polls every 100ms, so a page whose results are already rendered returns
+    almost immediately. A page only counts as idle while none of its fetch or
+    XHR requests is pending (see TRACK_REQUESTS_JS), so a slow search API
+    call is waited for; an idle page without the selector means no results.
+    """
+    def ready(d):
+        if d.find_elements(*locator):
+            return True
+        return d.execute_script(NETWORK_IDLE_JS, NETWORK_IDLE_MS)
 
-                # Wait for products to load
-                print(f"Scraping Zepto for item: Waiting for products to load")
-                WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.CSS_SELECTOR, '[data-testid="product-card"]'))
-                )
-                print("products loaded successfully")
+    WebDriverWait(driver, timeout, poll_frequency=0.1).until(ready)
 
-                # Get first product
-                soup = BeautifulSoup(driver.page_source, 'html.parser')
-                product_card = soup.find('div', {'data-testid': 'product-card'})
+def _with_candidates(result, candidates):
+    """Attach alternative products when a search returned more than one"""
+    if len(candidates) > 1:
+        result["candidates"] = candidates
+    return result
 
-                if product_card:
-                    name_elem = product_card.find('h4')
-                    price_elem = product_card.find('span', string=lambda x: x and '₹' in str(x))
+# Warm browsers shared by all Selenium scrapers; see browser_pool.py
+driver_pool = DriverPool(setup_driver)
 
-                    name = name_elem.text.strip() if name_elem else item
-                    price_text = price_elem.text.strip() if price_elem else '0'
-                    price = float(price_text.replace('₹', '').replace(',', '').strip())
+def _scrape_zepto_browser(items, location='Pune'):
+    """Scrape prices from Zepto"""
+    results = []
 
-                    results.append({
-                        "name": name,
-                        "price": price,
-                        "available": True,
-                        "url": search_url
-                    })
-                else:
+    logger.debug("Starting Zepto scraper...")
+    try:
+        with driver_pool.session() as driver:
+            logger.debug("Selenium WebDriver for Zepto checked out.")
+
+            for item in items:
+                try:
+                    # Navigate to Zepto search
+                    logger.debug("Scraping Zepto for item: Entered Zepto")
+                    search_url = get_platform("Zepto").url_for(item)
+                    throttle(search_url)
+                    driver.get(search_url)
+
+                    # Wait for products to load
+                    logger.debug("Scraping Zepto for item: Waiting for products to load")
+                    wait_for_page_ready(driver, (By.CSS_SELECTOR, '[data-testid="product-card"]'))
+                    logger.debug("products loaded successfully")
+
+                    # First product is the default pick; the rest are kept
+                    # as candidates for AI matching
+                    soup = BeautifulSoup(driver.page_source, 'html.parser')
+                    product_cards = soup.find_all('div', {'data-testid': 'product-card'},
+                                                  limit=MAX_CANDIDATES)
+
+                    if product_cards:
+                        candidates = []
+                        for product_card in product_cards:
+                            name_elem = product_card.find('h4')
+                            price_elem = product_card.find('span', string=lambda x: x and '₹' in str(x))
+
+                            name = name_elem.text.strip() if name_elem else item
+                            price_text = price_elem.text.strip() if price_elem else '0'
+                            price = float(price_text.replace('₹', '').replace(',', '').strip())
+                            candidates.append({"name": name, "price": price})
+
+                        results.append(_with_candidates({
+                            "name": candidates[0]['name'],
+                            "price": candidates[0]['price'],
+                            "available": True,
+                            "url": search_url
+                        }, candidates))
+                    else:
+                        results.append({
+                            "name": item,
+                            "price": 0,
+                            "available": False,
+                            "url": search_url
+                        })
+                except Exception as e:
+                    logger.warning("Error scraping Zepto for %s: %s", item, e)
                     results.append({
                         "name": item,
                         "price": 0,
                         "available": False,
-                        "url": search_url
+                        "url": ""
                     })
-            except Exception as e:
-                print(f"Error scraping Zepto for {item}: {e}")
-                results.append({
-                    "name": item,
-                    "price": 0,
-                    "available": False,
-                    "url": ""
-                })
-
-        driver.quit()
 
     except Exception as e:
-        print(f"Zepto scraper error: {e}")
+        logger.warning("Zepto scraper error: %s", e)
 
-    return {
-        "items": results,
-        "delivery_fee": 0 if sum(item['price'] for item in results) > 199 else 25,
-        "platform_fee": 2
-    }
-def scrape_blinkit(items, location='Pune'):
+    return {"items": results, **calculate_fees("Zepto", results)}
+def _scrape_blinkit_browser(items, location='Pune'):
     """Scrape prices from Blinkit"""
     results = []
 
     try:
-        driver = setup_driver()
-
-        for item in items:
-            try:
-                search_url = f"https://blinkit.com/s/?q={item.replace(' ', '%20')}"
-                driver.get(search_url)
-                time.sleep(random.uniform(2, 4))
-
-                WebDriverWait(driver, 10).until(
-                    EC.presence_of_element_located((By.CLASS_NAME, 'Product__UpdatedC'))
-                )
-
-                soup = BeautifulSoup(driver.page_source, 'html.parser')
-                product = soup.find('div', class_='Product__UpdatedC')
-
-                if product:
-                    name_elem = product.find('div', class_='Product__UpdatedTitle')
-                    price_elem = product.find('div', class_='Product__UpdatedPrice')
-
-                    name = name_elem.text.strip() if name_elem else item
-                    price_text = price_elem.text.strip() if price_elem else '0'
-                    price = float(price_text.replace('₹', '').replace(',', '').strip())
-
-                    results.append({
-                        "name": name,
-                        "price": price,
-                        "available": True,
-                        "url": search_url
-                    })
-                else:
+        with driver_pool.session() as driver:
+
+            for item in items:
+                try:
+                    search_url = get_platform("Blinkit").url_for(item)
+                    throttle(search_url)
+                    driver.get(search_url)
+
+                    wait_for_page_ready(driver, (By.CLASS_NAME, 'Product__UpdatedC'))
+
+                    soup = BeautifulSoup(driver.page_source, 'html.parser')
+                    products = soup.find_all('div', class_='Product__UpdatedC', limit=MAX_CANDIDATES)
+
+                    if products:
+                        candidates = []
+                        for product in products:
+                            name_elem = product.find('div', class_='Product__UpdatedTitle')
+                            price_elem = product.find('div', class_='Product__UpdatedPrice')
+
+                            name = name_elem.text.strip() if name_elem else item
+                            price_text = price_elem.text.strip() if price_elem else '0'
+                            price = float(price_text.replace('₹', '').replace(',', '').strip())
+                            candidates.append({"name": name, "price": price})
+
+                        results.append(_with_candidates({
+                            "name": candidates[0]['name'],
+                            "price": candidates[0]['price'],
+                            "available": True,
+                            "url": search_url
+                        }, candidates))
+                    else:
+                        results.append({
+                            "name": item,
+                            "price": 0,
+                            "available": False,
+                            "url": search_url
+                        })
+                except Exception as e:
+                    logger.warning("Error scraping Blinkit for %s: %s", item, e)
                     results.append({
                         "name": item,
                         "price": 0,
                         "available": False,
-                        "url": search_url
+                        "url": ""
                     })
-            except Exception as e:
-                print(f"Error scraping Blinkit for {item}: {e}")
-                results.append({
-                    "name": item,
-                    "price": 0,
-                    "available": False,
-                    "url": ""
-                })
-
-        driver.quit()
 
     except Exception as e:
-        print(f"Blinkit scraper error: {e}")
+        logger.warning("Blinkit scraper error: %s", e)
+
+    return {"items": results, **calculate_fees("Blinkit", results)}
+def _scrape_http_first(platform, items, location, browser_scraper):
+    """Look items up over plain HTTP, rendering in Chrome only what that misses
+
+    Items whose HTTP response can't be interpreted (or that error) are passed
+    to the Selenium scraper in one batch; the result order matches items.
+    """
+    results = [None] * len(items)
+    if SCRAPER_HTTP_MODE:
+        for index, item in enumerate(items):
+            try:
+                adapter = get_platform(platform)
+                url = adapter.url_for(item)
+                products = http_scraper.search(url, adapter.selectors, MAX_CANDIDATES)
+            except Exception as e:
+                logger.warning("HTTP scrape failed for %s %s: %s", platform, item, e)
+                metrics.SCRAPE_CALLS.inc(platform=platform, method='http', outcome='error')
+                continue
+            if products is None:
+                metrics.SCRAPE_CALLS.inc(platform=platform, method='http', outcome='needs_browser')
+                continue
+            metrics.SCRAPE_CALLS.inc(platform=platform, method='http', outcome='found')
+            candidates = [{"name": p['name'] or item, "price": p['price']} for p in products]
+            results[index] = _with_candidates({
+                "name": candidates[0]['name'],
+                "price": candidates[0]['price'],
+                "available": True,
+                "url": url
+            }, candidates)
 
-    return {
-        "items": results,
-        "delivery_fee": 0 if sum(item['price'] for item in results) > 199 else 25,
-        "platform_fee": 0
-    }
+    missing = [index for index, result in enumerate(results) if result is None]
+    if missing:
+        metrics.SCRAPE_CALLS.inc(len(missing), platform=platform, method='browser', outcome='started')
+        fallback = browser_scraper([items[index] for index in missing], location)['items']
+        for n, index in enumerate(missing):
+            results[index] = fallback[n] if n < len(fallback) else _unavailable(items[index])
+
+    return {"items": results, **calculate_fees(platform, results)}
+def scrape_zepto(items, location='Pune'):
+    """Scrape prices from Zepto"""
+    return _scrape_http_first("Zepto", items, location, _scrape_zepto_browser)
+def scrape_blinkit(items, location='Pune'):
+    """Scrape prices from Blinkit"""
+    return _scrape_http_first("Blinkit", items, location, _scrape_blinkit_browser)
 def scrape_instamart(items, location='Pune'):
     """Scrape prices from Swiggy Instamart"""
     results = []
@@ -163,14 +307,10 @@ def scrape_instamart(items, location='Pune'):
             "name": f"{item.title()} (Instamart)",
             "price": round(base_price, 2),
             "available": True,
-            "url": f"https://www.swiggy.com/instamart/search?q={item}"
+            "url": get_platform("Instamart").url_for(item)
         })
 
-    return {
-        "items": results,
-        "delivery_fee": 0 if sum(item['price'] for item in results) > 199 else 29,
-        "platform_fee": 3
-    }
+    return {"items": results, **calculate_fees("Instamart", results)}
 def scrape_flipkart_minutes(items, location='Pune'):
     """Scrape prices from Flipkart Minutes"""
     results = []
@@ -184,55 +324,206 @@ def scrape_flipkart_minutes(items, location='Pune'):
             "name": f"{item.title()} (Flipkart)",
             "price": round(base_price, 2),
             "available": True,
-            "url": f"https://www.flipkart.com/search?q={item}"
+            "url": get_platform("Flipkart Minutes").url_for(item)
         })
 
+    return {"items": results, **calculate_fees("Flipkart Minutes", results)}
+register_platform(PlatformAdapter(
+    "Zepto", scrape_zepto,
+    os.getenv('ZEPTO_SEARCH_URL', 'https://www.zepto.com/search?query={query}'),
+    delivery_fee=25, platform_fee=2, concurrency=2,
+    selectors={
+        "card": '//div[@data-testid="product-card"]',
+        "name": './/h4',
+        "price": './/span[contains(text(), "₹")]',
+    }
+))
+register_platform(PlatformAdapter(
+    "Blinkit", scrape_blinkit,
+    os.getenv('BLINKIT_SEARCH_URL', 'https://blinkit.com/s/?q={query}'),
+    delivery_fee=25, platform_fee=0, concurrency=2,
+    selectors={
+        "card": '//div[contains(concat(" ", normalize-space(@class), " "), " Product__UpdatedC ")]',
+        "name": './/div[contains(concat(" ", normalize-space(@class), " "), " Product__UpdatedTitle ")]',
+        "price": './/div[contains(concat(" ", normalize-space(@class), " "), " Product__UpdatedPrice ")]',
+    }
+))
+register_platform(PlatformAdapter(
+    "Instamart", scrape_instamart,
+    'https://www.swiggy.com/instamart/search?q={query}',
+    delivery_fee=29, platform_fee=3, concurrency=4
+))
+register_platform(PlatformAdapter(
+    "Flipkart Minutes", scrape_flipkart_minutes,
+    'https://www.flipkart.com/search?q={query}',
+    delivery_fee=0, platform_fee=5, concurrency=4
+))
+def _unavailable(item):
+    return {"name": item, "price": 0, "available": False, "url": ""}
+def _scrape_chunk(platform, chunk, location):
+    """Run one platform scraper over a chunk, holding a platform slot
+
+    Available results go into the price cache, including ones that arrive
+    after the request deadline, so the next request can use them.
+    """
+    adapter = get_platform(platform)
+    with adapter.slots:
+        scraped = adapter.scrape([item for _, item in chunk], location)['items']
+    # A scraper that crashed part-way returns fewer results than items
+    results = [(index, scraped[n] if n < len(scraped) else _unavailable(item))
+               for n, (index, item) in enumerate(chunk)]
+    for (_, item), (_, result) in zip(chunk, results):
+        metrics.SCRAPE_CALLS.inc(platform=platform, method='lookup',
+                                 outcome='available' if result['available'] else 'unavailable')
+        if result['available']:
+            price_cache.set(price_cache_key(platform, item, location), dict(result))
+    return results
+def scrape_items(platform, items, location='Pune'):
+    """Scrape items on one platform now, caching available prices; results in item order"""
+    return [result for _, result in _scrape_chunk(platform, list(enumerate(items)), location)]
+_refreshing = set()
+_refreshing_lock = threading.Lock()
+def _refresh_in_background(platform, indexed, location):
+    """Re-scrape stale cache entries without making the caller wait"""
+    with _refreshing_lock:
+        keys = {price_cache_key(platform, item, location) for _, item in indexed}
+        keys -= _refreshing
+        indexed = [(index, item) for index, item in indexed
+                   if price_cache_key(platform, item, location) in keys]
+        _refreshing.update(keys)
+    if not indexed:
+        return
+
+    def done(_):
+        with _refreshing_lock:
+            _refreshing.difference_update(keys)
+
+    _platform_executor(platform).submit(_scrape_chunk, platform, indexed, location).add_done_callback(done)
+def _platform_result(platform, items, platform_items):
+    partial = any(result is None for result in platform_items)
+    platform_items = [result if result is not None else _unavailable(item)
+                      for item, result in zip(items, platform_items)]
     return {
-        "items": results,
-        "delivery_fee": 0,
-        "platform_fee": 5
+        "items": platform_items,
+        **calculate_fees(platform, platform_items),
+        "partial": partial
     }
-def scrape_all_platforms(items, location='Pune'):
-    """Scrape all platforms and return consolidated results"""
+def scrape_all_platforms(items, location='Pune', deadline=None, on_platform_done=None, platforms=None):
+    """Scrape all platforms concurrently and return consolidated results
+
+    Cached prices are used first: fresh entries skip scraping entirely and
+    stale ones are served while a background refresh runs. The remaining
+    items are submitted one lookup per future to each platform's own pool,
+    which runs as many at once as the platform has slots, so a slow platform
+    only delays its own results. Lookups not finished when the deadline
+    expires are reported as unavailable and the platform is marked partial;
+    the ones that did finish are kept. Each platform's results are in after
+    its own queue drains, or at the deadline, whichever is first.
+
+    on_platform_done(platform, result), if given, is called as soon as each
+    platform's items are all in (or the deadline has passed). platforms
+    limits the run to those names; by default every enabled adapter runs.
+    """
+
+    logger.debug("Scraping prices for %s items in %s...", len(items), location)
+    deadline = SCRAPE_DEADLINE if deadline is None else deadline
+
+    adapters = enabled_platforms(platforms)
+    merged = {adapter.name: [None] * len(items) for adapter in adapters}
+    pending = {adapter.name: 0 for adapter in adapters}
+    missing = {}
+    for adapter in adapters:
+        platform = adapter.name
+        missing[platform], stale = [], []
+        for index, item in enumerate(items):
+            cached, state = price_cache.get(price_cache_key(platform, item, location))
+            if state is None:
+                missing[platform].append((index, item))
+                continue
+            merged[platform][index] = dict(cached)
+            if state == STALE:
+                stale.append((index, item))
+
+        if stale:
+            _refresh_in_background(platform, stale, location)
+
+    futures = {}
+    for platform, indexed in missing.items():
+        for entry in indexed:
+            future = _platform_executor(platform).submit(_scrape_chunk, platform, [entry], location)
+            futures[future] = platform
+            pending[platform] += 1
 
-    print(f"Scraping prices for {len(items)} items in {location}...")
+    results = {}
+    def finish(platform):
+        results[platform] = _platform_result(platform, items, merged[platform])
+        if on_platform_done:
+            on_platform_done(platform, results[platform])
+
+    for platform, count in pending.items():
+        if count == 0:
+            finish(platform)
+
+    def collect(future):
+        platform = futures.pop(future)
+        try:
+            for index, result in future.result():
+                merged[platform][index] = result
+        except Exception as e:
+            logger.warning("%s scraper error: %s", platform, e)
+        pending[platform] -= 1
+        if pending[platform] == 0:
+            finish(platform)
+
+    try:
+        for future in as_completed(list(futures), timeout=deadline):
+            collect(future)
+    except FuturesTimeout:
+        for future in list(futures):
+            if future.done():
+                collect(future)
+            else:
+                future.cancel()
+        for platform in merged:
+            if platform not in results:
+                finish(platform)
+
+    return {platform: results[platform] for platform in merged}
+# Sample mock data, matched to requested items through a trigram index
+MOCK_PRICES = {
+    "milk": {"Zepto": 56, "Blinkit": 58, "Instamart": 54, "Flipkart Minutes": 57},
+    "bread": {"Zepto": 35, "Blinkit": 33, "Instamart": 36, "Flipkart Minutes": 34},
+    "eggs": {"Zepto": 84, "Blinkit": 82, "Instamart": 85, "Flipkart Minutes": 83},
+}
+# Minimum trigram overlap between an item and a MOCK_PRICES key to use its prices
+MOCK_MATCH_SCORE = 0.75
+
+_mock_index = TrigramIndex()
+for _key in MOCK_PRICES:
+    _mock_index.add(_key, _key)
+
+
+def mock_match(item):
+    """MOCK_PRICES key for item ("Amul Milk 1L" -> "milk"), or None"""
+    hits = _mock_index.search(normalize(item), limit=1, overlap=True)
+    if hits and hits[0][1] >= MOCK_MATCH_SCORE:
+        return hits[0][0]
+    return None
 
-    results = {
-        "Zepto": scrape_zepto(items, location),
-        "Blinkit": scrape_blinkit(items, location),
-        "Instamart": scrape_instamart(items, location),
-        "Flipkart Minutes": scrape_flipkart_minutes(items, location)
-    }
 
-    return results
 # Mock function for testing without Selenium
-def mock_scrape_all_platforms(items, location='Pune'):
+def mock_scrape_all_platforms(items, location='Pune', platforms=None):
     """Mock scraper for testing without browser automation"""
-
-    # Sample mock data
-    mock_prices = {
-        "milk": {"Zepto": 56, "Blinkit": 58, "Instamart": 54, "Flipkart Minutes": 57},
-        "bread": {"Zepto": 35, "Blinkit": 33, "Instamart": 36, "Flipkart Minutes": 34},
-        "eggs": {"Zepto": 84, "Blinkit": 82, "Instamart": 85, "Flipkart Minutes": 83},
-    }
-
     results = {}
 
-    for platform in ["Zepto", "Blinkit", "Instamart", "Flipkart Minutes"]:
+    for adapter in enabled_platforms(platforms):
+        platform = adapter.name
         platform_items = []
 
         for item in items:
-            # Find closest match in mock data
-            item_lower = item.lower()
-            matched_key = None
-
-            for key in mock_prices.keys():
-                if key in item_lower or item_lower in key:
-                    matched_key = key
-                    break
-
-            if matched_key and platform in mock_prices[matched_key]:
-                price = mock_prices[matched_key][platform]
+            matched_key = mock_match(item)
+            if matched_key and platform in MOCK_PRICES[matched_key]:
+                price = MOCK_PRICES[matched_key][platform]
             else:
                 price = random.uniform(20, 150)
 
@@ -240,16 +531,12 @@ def mock_scrape_all_platforms(items, location='Pune'):
                 "name": item,
                 "price": round(price, 2),
                 "available": True,
-                "url": f"https://{platform.lower().replace(' ', '')}.com/search?q={item}"
+                "url": adapter.url_for(item)
             })
 
-        delivery_fee = 0 if sum(i['price'] for i in platform_items) > 199 else 25
-        platform_fee = {"Zepto": 2, "Blinkit": 0, "Instamart": 3, "Flipkart Minutes": 5}[platform]
-
         results[platform] = {
             "items": platform_items,
-            "delivery_fee": delivery_fee,
-            "platform_fee": platform_fee
+            **adapter.fees(platform_items)
         }
 
     return results
\ No newline at end of file
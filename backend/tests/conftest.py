@@ -0,0 +1,22 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Configuration is read at import time, so it is set before any backend module loads
+_workdir = tempfile.mkdtemp(prefix='price-tests-')
+os.environ['PRICES_DB_PATH'] = os.path.join(_workdir, 'app.db')
+os.environ['SCRAPER_MODE'] = 'mock'
+os.environ['RETENTION_INTERVAL'] = '0'
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh, initialized database for one test"""
+    import database
+    monkeypatch.setattr(database, 'DB_PATH', str(tmp_path / 'prices.db'))
+    database.init_db()
+    return database
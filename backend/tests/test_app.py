@@ -0,0 +1,66 @@
+import time
+
+import pytest
+
+import app as app_module
+import retention
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', 'secret')
+    return app_module.app.test_client()
+
+
+def test_retention_api_is_disabled_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', '')
+    assert client.post('/api/maintenance/retention', json={}).status_code == 403
+
+
+def test_retention_api_needs_the_admin_token(client):
+    assert client.post('/api/maintenance/retention', json={}).status_code == 403
+    response = client.post('/api/maintenance/retention', json={}, headers={'X-Admin-Token': 'wrong'})
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize('body', [{"days": "x"}, {"days": 1.5}, {"days": True}, {"days": None}, [30], "30"])
+def test_retention_api_rejects_invalid_bodies(client, monkeypatch, body):
+    monkeypatch.setattr(retention, 'start_retention', pytest.fail)
+    response = client.post('/api/maintenance/retention', json=body, headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+
+
+def test_retention_api_rejects_days_below_one(client, monkeypatch):
+    monkeypatch.setattr(retention, 'start_retention', pytest.fail)
+    response = client.post('/api/maintenance/retention', json={"days": 0}, headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 400
+
+
+def test_retention_api_starts_a_run(client, monkeypatch):
+    started = []
+    monkeypatch.setattr(retention, 'start_retention', lambda days: started.append(days) or True)
+    response = client.post('/api/maintenance/retention', json={"days": 30}, headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 202
+    assert started == [30]
+
+    started.clear()
+    response = client.post('/api/maintenance/retention', headers={'X-Admin-Token': 'secret'})
+    assert response.status_code == 202
+    assert started == [retention.RETENTION_DAYS]
+
+
+def test_gemini_calls_time_out(monkeypatch):
+    class SlowModel:
+        def __init__(self, name):
+            pass
+
+        def generate_content(self, prompt, stream=False):
+            time.sleep(1)
+
+    monkeypatch.setattr(app_module.genai, 'GenerativeModel', SlowModel)
+    monkeypatch.setattr(app_module, 'LLM_TIMEOUT', 0.1)
+    started = time.monotonic()
+    with pytest.raises(TimeoutError):
+        app_module.generate_content('test', 'prompt')
+    assert time.monotonic() - started < 0.5
@@ -0,0 +1,90 @@
+import time
+
+import pytest
+
+from catalog import Catalog
+
+
+def alias_count(database):
+    return database.get_connection().execute('SELECT COUNT(*) FROM product_aliases').fetchone()[0]
+
+
+def test_variants_resolve_to_one_product(db):
+    catalog = Catalog()
+    ids = catalog.resolve_many(["Amul Taaza Milk 1L", "amul taaza milk 1 ltr", "Amul Taaza Milk 500ml"])
+    assert ids["Amul Taaza Milk 1L"] == ids["amul taaza milk 1 ltr"]
+    # A different quantity is a different product
+    assert ids["Amul Taaza Milk 500ml"] != ids["Amul Taaza Milk 1L"]
+    assert catalog.stats() == {"products": 2, "aliases": 2}
+
+
+def test_lookups_without_create_write_nothing(db):
+    catalog = Catalog()
+    product_id = catalog.resolve("Amul Taaza Toned Milk 1L")
+    aliases = alias_count(db)
+
+    assert catalog.resolve("amul taaza toned milk 1 litre", create=False) == product_id
+    assert catalog.resolve_many(["Britannia Bread", "Amul Taaza Toned Milk 1L"], create=False) == {
+        "Britannia Bread": None, "Amul Taaza Toned Milk 1L": product_id}
+    assert alias_count(db) == aliases
+    assert catalog.stats() == {"products": 1, "aliases": 1}
+
+
+def test_batch_is_written_in_one_transaction(db):
+    conn = db.get_connection()
+    statements = []
+    conn.set_trace_callback(statements.append)
+    try:
+        ids = Catalog().resolve_many(["Eggs 6 pcs", "Bread", "Butter 100g", "Bread"])
+    finally:
+        conn.set_trace_callback(None)
+    assert len(set(ids.values())) == 3
+    assert sum(statement.strip().upper() == 'COMMIT' for statement in statements) == 1
+
+
+def test_names_without_words_resolve_to_none(db):
+    assert Catalog().resolve_many(["(Pack of 6)", ""]) == {"(Pack of 6)": None, "": None}
+    assert alias_count(db) == 0
+
+
+def test_catalog_reloads_from_the_database(db):
+    product_id = Catalog().resolve("Maggi Noodles 70g")
+    assert Catalog().resolve("maggi noodles 70 g", create=False) == product_id
+
+
+@pytest.mark.parametrize('first, second', [
+    ("Amul Butter 100g", "Amul Buttermilk 100g"),
+    ("Mother Dairy Milk 500ml", "Mother Dairy Curd 500ml"),
+    ("Coca Cola", "Diet Coca Cola"),
+    ("Fortune Oil", "Fortune Soya Oil"),
+    ("Bread", "Brown Bread"),
+    ("Salt", "Sampann Salt"),
+    ("Cheese", "Cheese Slices"),
+    ("Amul Taaza Milk 1L", "Amul Taaza Milk 500ml"),
+])
+def test_similar_products_stay_apart(db, first, second):
+    catalog = Catalog()
+    ids = catalog.resolve_many([first, second])
+    assert ids[first] != ids[second]
+    # Also when the second name arrives in a later batch
+    assert Catalog().resolve(second, create=False) == ids[second]
+
+
+@pytest.mark.parametrize('first, second', [
+    ("Coca-Cola 750 ml", "coca cola 750ml"),
+    ("Amul Milk 1 Ltr (Instamart)", "amul milk 1l"),
+    ("Taaza Amul Milk 1L", "Amul Taaza Milk 1L"),
+    ("Eggs 6 pcs", "Pack of 6 Eggs"),
+])
+def test_renamed_products_merge(db, first, second):
+    ids = Catalog().resolve_many([first, second])
+    assert ids[first] == ids[second]
+
+
+def test_lookups_stay_fast_with_many_aliases(db):
+    catalog = Catalog()
+    catalog.resolve_many(f"Brand {n} Toned Milk {n % 7 + 1}l" for n in range(20000))
+    started = time.perf_counter()
+    found = [catalog.resolve(f"toned milk brand {n} {n % 7 + 1} ltr", create=False) for n in range(1000)]
+    assert time.perf_counter() - started < 0.5
+    assert None not in found
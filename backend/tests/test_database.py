@@ -0,0 +1,129 @@
+import os
+import sqlite3
+import subprocess
+import sys
+from datetime import datetime, timedelta
+
+import retention
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def ts(days_ago, hours=0):
+    return (datetime.now() - timedelta(days=days_ago, hours=hours)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def daily(database):
+    return dict(((day, points) for day, points in database.get_connection().execute(
+        'SELECT day, SUM(data_points) FROM price_daily GROUP BY day')))
+
+
+def test_rollups_count_every_inserted_row(db):
+    db.import_price_history([("Milk 1L", "Zepto", 50.0, ts(3)), ("milk 1l (Instamart)", "Zepto", 54.0, ts(3)),
+                             ("Bread", "Blinkit", 30.0, ts(1))])
+    points = db.get_connection().execute('SELECT SUM(data_points) FROM price_daily').fetchone()[0]
+    assert points == 3
+    trends = db.get_price_trends_bulk(["milk 1 ltr"], days=7)
+    assert trends["milk 1 ltr"]["Zepto"]["data_points"] == 2
+
+
+def test_migration_from_name_keyed_schema(tmp_path, monkeypatch):
+    import database
+    path = str(tmp_path / 'legacy.db')
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE price_history (id INTEGER PRIMARY KEY AUTOINCREMENT, product_name TEXT NOT NULL,
+                                    platform TEXT NOT NULL, price REAL NOT NULL,
+                                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE price_daily (product_name TEXT NOT NULL, platform TEXT NOT NULL, day TEXT NOT NULL,
+                                  price_sum REAL NOT NULL, price_min REAL NOT NULL, price_max REAL NOT NULL,
+                                  data_points INTEGER NOT NULL, PRIMARY KEY (product_name, platform, day));
+    ''')
+    day = ts(2)[:10]
+    conn.executemany('INSERT INTO price_history (product_name, platform, price, timestamp) VALUES (?, ?, ?, ?)',
+                     [("Milk 1L", "Zepto", 50.0, ts(2)), ("milk 1l (Instamart)", "Zepto", 52.0, ts(2)),
+                      ("(Pack of 6)", "Zepto", 99.0, ts(2))])
+    # An older day whose raw rows were already cleaned up
+    conn.executemany('INSERT INTO price_daily VALUES (?, ?, ?, ?, ?, ?, ?)',
+                     [("Milk 1L", "Zepto", day, 102.0, 50.0, 52.0, 2), ("Milk 1L", "Zepto", "2020-01-01", 40.0, 40.0, 40.0, 1)])
+    conn.commit()
+    conn.close()
+
+    monkeypatch.setattr(database, 'DB_PATH', path)
+    database.init_db()
+    conn = database.get_connection()
+    ids = dict(conn.execute('SELECT product_name, product_id FROM price_history'))
+    assert ids["Milk 1L"] == ids["milk 1l (Instamart)"] is not None
+    assert ids["(Pack of 6)"] is None
+    assert daily(database) == {"2020-01-01": 1, day: 2}
+    assert not conn.execute("SELECT name FROM sqlite_master WHERE name LIKE '%legacy'").fetchall()
+
+    # Restarting neither reassigns rows nor rebuilds rollups
+    assert database.migrate_product_ids() == 0
+    database.init_db()
+    assert daily(database) == {"2020-01-01": 1, day: 2}
+
+
+def test_rows_saved_without_id_are_added_to_rollups_once(db):
+    conn = db.get_connection()
+    with conn:
+        conn.execute("INSERT INTO price_history (product_name, platform, price, timestamp) VALUES ('Eggs 12', 'Zepto', 80, ?)",
+                     (ts(1),))
+    assert db.migrate_product_ids() == 1
+    assert db.migrate_product_ids() == 0
+    assert sum(daily(db).values()) == 1
+
+
+def test_retention_keeps_rollups_of_deleted_rows(db, monkeypatch):
+    monkeypatch.setattr(retention, 'RETENTION_PAUSE_MS', 0)
+    # Seven rows on the day the cutoff falls in, some before and some after it
+    rows = [("Milk 1L", "Zepto", 50.0 + n, ts(10, hours=offset)) for n, offset in enumerate((-6, -4, -2, 1, 2, 3, 4))]
+    rows.append(("Milk 1L", "Zepto", 48.0, ts(40)))
+    db.import_price_history(rows)
+    before = daily(db)
+
+    run = retention.run_retention(days=10, hourly_days=30)
+    assert run.phase == 'done'
+    assert run.deleted == 5
+    assert db.get_connection().execute('SELECT COUNT(*) FROM price_history').fetchone()[0] == 3
+    assert daily(db) == before
+
+    # A restart and an explicit backfill leave partly deleted buckets alone
+    db.init_db()
+    db.backfill_rollups()
+    assert daily(db) == before
+    hourly = db.get_connection().execute('SELECT MIN(hour) FROM price_hourly').fetchone()[0]
+    assert hourly >= (datetime.now() - timedelta(days=30)).strftime('%Y-%m-%d %H:00')
+
+
+def test_unused_name_index_is_dropped(db):
+    conn = db.get_connection()
+    with conn:
+        conn.execute('CREATE INDEX idx_product_timestamp ON price_history(product_name, timestamp, platform, price)')
+    db.init_db()
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert 'idx_product_timestamp' not in indexes
+    assert 'idx_product_id_timestamp' in indexes
+
+
+def test_new_app_database_uses_incremental_vacuum(tmp_path):
+    # A fresh interpreter, so the caches open the file before init_db, as in production
+    path = tmp_path / 'app.db'
+    env = {**os.environ, 'PRICES_DB_PATH': str(path)}
+    subprocess.run([sys.executable, '-c', 'import app'], cwd=BACKEND, env=env, check=True)
+    conn = sqlite3.connect(path)
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+
+
+def test_existing_database_is_converted_once(tmp_path, monkeypatch):
+    import database
+    path = str(tmp_path / 'old.db')
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE cache_entries (namespace TEXT, key TEXT)')
+    conn.commit()
+    assert conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 0
+
+    monkeypatch.setattr(database, 'DB_PATH', path)
+    database.init_db()
+    assert sqlite3.connect(path).execute('PRAGMA auto_vacuum').fetchone()[0] == 2
+    assert not database.enable_incremental_vacuum(database.get_connection())
@@ -0,0 +1,79 @@
+import math
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as app_module
+from downsample import lttb, minmax
+
+
+def series(n, seed=0):
+    rng = random.Random(seed)
+    return [(float(x), 50 + 10 * math.sin(x / 5) + rng.uniform(-3, 3)) for x in range(n)]
+
+
+@pytest.mark.parametrize('threshold', [2, 3, 10, 99])
+def test_lttb_length_and_endpoints(threshold):
+    points = series(100)
+    sampled = lttb(points, threshold)
+    assert len(sampled) == threshold
+    assert sampled[0] == points[0] and sampled[-1] == points[-1]
+    assert [p[0] for p in sampled] == sorted(p[0] for p in sampled)
+    assert set(sampled) <= set(points)
+
+
+def test_lttb_keeps_short_series():
+    points = series(5)
+    assert lttb(points, 5) == points
+    assert lttb(points, 100) == points
+
+
+def test_lttb_keeps_a_spike():
+    points = [(float(x), 10.0) for x in range(200)]
+    points[123] = (123.0, 500.0)
+    assert (123.0, 500.0) in lttb(points, 20)
+
+
+@pytest.mark.parametrize('threshold', [2, 3, 10, 50])
+def test_minmax_keeps_extremes(threshold):
+    points = series(200, seed=threshold)
+    sampled = minmax(points, threshold)
+    assert len(sampled) <= threshold
+    assert min(points, key=lambda p: p[1]) in sampled
+    assert max(points, key=lambda p: p[1]) in sampled
+    assert [p[0] for p in sampled] == sorted(p[0] for p in sampled)
+
+
+def test_minmax_keeps_short_series():
+    points = series(5)
+    assert minmax(points, 10) == points
+
+
+@pytest.fixture
+def history(db):
+    now = datetime.now()
+    db.import_price_history([("Milk 1L", "Zepto", 50.0 + day % 5, (now - timedelta(days=day)).strftime('%Y-%m-%d %H:%M:%S'))
+                             for day in range(28)])
+    return app_module.app.test_client()
+
+
+def chart_points(client, **args):
+    response = client.get('/api/history', query_string={"products": "Milk 1L", **args})
+    assert response.status_code == 200
+    return response.get_json()['series'][0]['points']
+
+
+@pytest.mark.parametrize('points, expected', [(2, 2), (1, 2), (0, 2), (-5, 2), (10, 10), (5000, 28)])
+def test_history_points_bounds(history, points, expected):
+    assert len(chart_points(history, points=points)) == expected
+
+
+def test_history_default_and_minmax(history):
+    assert len(chart_points(history)) == 28
+    assert len(chart_points(history, points=6, method='minmax')) <= 6
+
+
+def test_history_rejects_bad_arguments(history):
+    assert history.get('/api/history', query_string={"products": "Milk 1L", "points": "x"}).status_code == 400
+    assert history.get('/api/history', query_string={"products": "Milk 1L", "method": "avg"}).status_code == 400
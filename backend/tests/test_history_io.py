@@ -0,0 +1,79 @@
+import json
+
+import pytest
+
+import app as app_module
+import database
+
+ADMIN = {'X-Admin-Token': 'secret'}
+
+
+@pytest.fixture
+def client(db, monkeypatch):
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', 'secret')
+    return app_module.app.test_client()
+
+
+def rows(database):
+    return database.get_connection().execute(
+        'SELECT product_name, platform, price, timestamp FROM price_history ORDER BY id').fetchall()
+
+
+@pytest.mark.parametrize('fmt', ['ndjson', 'csv'])
+def test_export_import_round_trip(client, db, fmt):
+    db.import_price_history([("Milk 1L", "Zepto", 50.5, "2026-01-02 10:00:00"),
+                             ("Bread, brown", "Blinkit", 40.0, "2026-01-03 11:30:00")])
+    exported = client.get('/api/history/export', query_string={"format": fmt}, headers=ADMIN)
+    assert exported.status_code == 200
+    before = rows(db)
+
+    with db.get_connection() as conn:
+        conn.execute('DELETE FROM price_history')
+    response = client.post('/api/history/import', query_string={"format": fmt},
+                           data=exported.get_data(), headers=ADMIN)
+    assert response.get_json() == {"imported": 2}
+    assert rows(db) == before
+
+
+@pytest.mark.parametrize('line, message', [
+    ('[1, 2]', "expected an object"),
+    ('"x"', "expected an object"),
+    ('{"product_name": "Milk", "platform": "Zepto"}', "price must be a number"),
+    ('{"product_name": "Milk", "platform": "Zepto", "price": "cheap"}', "price must be a number"),
+    ('{"product_name": 5, "platform": "Zepto", "price": 1}', "product_name must be a non-empty string"),
+    ('{"product_name": "Milk", "platform": "Zepto", "price": 1', "invalid JSON"),
+])
+def test_malformed_line_is_a_400_naming_the_line(client, line, message):
+    body = '{"product_name": "Milk", "platform": "Zepto", "price": 50}\n\n' + line + '\n'
+    response = client.post('/api/history/import', data=body, headers=ADMIN)
+    assert response.status_code == 400
+    error = response.get_json()
+    assert error['line'] == 3
+    assert message in error['error']
+    assert "line 3" in error['error']
+    assert error['rows_committed'] == 0
+
+
+def test_failed_import_reports_committed_batches(db):
+    good = [json.dumps({"product_name": f"Item {n}", "platform": "Zepto", "price": n + 1}) for n in range(5)]
+    with pytest.raises(database.ImportAborted) as aborted:
+        db.import_price_history(db.iter_import_rows(good + ['[]']), batch_size=2)
+    assert aborted.value.rows_committed == 4
+    assert aborted.value.error.line == 6
+    assert len(rows(db)) == 4
+
+
+def test_csv_missing_column(client):
+    response = client.post('/api/history/import', query_string={"format": "csv"},
+                           data='product_name,platform\nMilk,Zepto\n', headers=ADMIN)
+    assert response.status_code == 400
+    assert response.get_json()['line'] == 2
+
+
+@pytest.mark.parametrize('method, path', [('get', '/api/history/export'), ('post', '/api/history/import')])
+def test_history_io_needs_the_admin_token(client, monkeypatch, method, path):
+    call = getattr(client, method)
+    assert call(path).status_code == 403
+    assert call(path, headers={'X-Admin-Token': 'wrong'}).status_code == 403
+    monkeypatch.setattr(app_module, 'ADMIN_TOKEN', '')
+    assert call(path, headers=ADMIN).status_code == 403
@@ -0,0 +1,92 @@
+import json
+import os
+
+import pytest
+
+import http_scraper
+import scraper
+from platforms import get_platform
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures')
+
+
+def fixture(name):
+    with open(os.path.join(FIXTURES, name), encoding='utf-8') as f:
+        return f.read()
+
+
+class Response:
+    def __init__(self, text, content_type):
+        self.text = text
+        self.headers = {'Content-Type': content_type}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return json.loads(self.text)
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    """Make http_scraper.search answer with a fixture file"""
+    monkeypatch.setattr(http_scraper, 'throttle', lambda url: None)
+
+    def serve(name, content_type):
+        session = type('Session', (), {'get': lambda self, url, timeout: Response(fixture(name), content_type)})
+        monkeypatch.setattr(http_scraper, 'get_session', session)
+    return serve
+
+
+def test_html_cards():
+    products = http_scraper.parse_html(fixture('blinkit_search.html'), get_platform('Blinkit').selectors, 5)
+    # The out-of-stock card has no parseable price and is skipped
+    assert products == [{"name": "Amul Taaza Toned Fresh Milk", "price": 56.0},
+                        {"name": "Mother Dairy Toned Milk", "price": 1054.5}]
+
+
+def test_html_card_limit():
+    products = http_scraper.parse_html(fixture('blinkit_search.html'), get_platform('Blinkit').selectors, 1)
+    assert [p['name'] for p in products] == ["Amul Taaza Toned Fresh Milk"]
+
+
+def test_html_embedded_json():
+    products = http_scraper.parse_html(fixture('next_data.html'), get_platform('Blinkit').selectors, 5)
+    assert products == [{"name": "Britannia Brown Bread", "price": 45.0},
+                        {"name": "Harvest Gold White Bread", "price": 40.0}]
+
+
+def test_html_without_products_needs_browser():
+    assert http_scraper.parse_html(fixture('no_results.html'), get_platform('Blinkit').selectors, 5) is None
+    assert http_scraper.parse_html(fixture('blinkit_search.html'), None, 5) is None
+
+
+def test_json_products():
+    products = http_scraper.find_products(json.loads(fixture('search.json')), 5)
+    assert products == [{"name": "Eggoz Farm Fresh Eggs 6 pcs", "price": 57.0},
+                        {"name": "Country Eggs 30 pcs", "price": 199.0}]
+
+
+def test_json_without_products_needs_browser():
+    assert http_scraper.find_products({"meta": {"query": "eggs"}, "results": []}, 5) is None
+    assert http_scraper.find_products([{"name": "Brand", "options": []}], 5) is None
+
+
+def test_search_dispatches_on_content_type(serve):
+    serve('search.json', 'application/json; charset=utf-8')
+    assert len(http_scraper.search('https://example.com/?q=eggs', None, 5)) == 2
+    serve('blinkit_search.html', 'text/html')
+    assert len(http_scraper.search('https://example.com/?q=milk', get_platform('Blinkit').selectors, 5)) == 2
+
+
+def test_unrecognized_json_falls_back_to_browser(serve):
+    serve('no_results.json', 'application/json')
+    browsed = []
+
+    def browser(items, location):
+        browsed.extend(items)
+        return {"items": [{"name": item, "price": 30.0, "available": True, "url": ""} for item in items]}
+
+    result = scraper._scrape_http_first('Blinkit', ['bread'], 'Pune', browser)
+    assert browsed == ['bread']
+    assert result['items'][0]['available']
@@ -0,0 +1,69 @@
+import time
+from types import SimpleNamespace
+
+import app as app_module
+
+MILK = [{"name": "Milk Bikis Biscuits", "price": 10.0},
+        {"name": "Amul Taaza Toned Milk 500 ml", "price": 27.0},
+        {"name": "Amul Taaza Toned Milk 1 L", "price": 54.0}]
+
+
+def test_name_matching_prefers_the_right_quantity():
+    assert app_module.match_products_by_name("amul milk 1l", MILK)['price'] == 54.0
+    assert app_module.match_products_by_name("toned milk 500ml", MILK)['price'] == 27.0
+    assert app_module.match_products_by_name("bread", MILK) is MILK[0]
+    assert app_module.match_products_by_name("milk", []) is None
+
+
+def test_unparseable_batch_answer_makes_no_more_calls(monkeypatch):
+    calls = []
+    def generate_content(kind, prompt, stream=False):
+        calls.append(kind)
+        return SimpleNamespace(text="Item 1 is product 3")
+    monkeypatch.setattr(app_module, 'generate_content', generate_content)
+
+    matches = app_module.match_products_batch_with_ai([("amul milk 1l", MILK), ("milk 500ml", MILK)])
+    assert calls == ['match_batch']
+    assert [match['price'] for match in matches] == [54.0, 27.0]
+
+
+def test_uncovered_items_fall_back_to_name_matching(monkeypatch):
+    calls = []
+    def generate_content(kind, prompt, stream=False):
+        calls.append(kind)
+        return SimpleNamespace(text='```json\n{"1": 2}\n```')
+    monkeypatch.setattr(app_module, 'generate_content', generate_content)
+
+    matches = app_module.match_products_batch_with_ai([("milk", MILK), ("amul milk 1l", MILK)])
+    assert calls == ['match_batch']
+    assert [match['price'] for match in matches] == [27.0, 54.0]
+
+
+def test_platforms_are_matched_in_parallel(db, monkeypatch):
+    platforms = ["Zepto", "Blinkit", "Instamart"]
+
+    def scrape_all_platforms(items, location, on_platform_done=None, platforms=None):
+        results = {}
+        for platform in platforms:
+            result = {"name": MILK[0]['name'], "price": 10.0, "available": True, "url": "",
+                      "candidates": [dict(product) for product in MILK]}
+            results[platform] = {"items": [result], "delivery_fee": 0, "platform_fee": 0}
+            on_platform_done(platform, results[platform])
+        return results
+
+    def generate_content(kind, prompt, stream=False):
+        time.sleep(0.3)
+        return SimpleNamespace(text='{"1": 3}')
+
+    monkeypatch.setattr(app_module, 'SCRAPER_MODE', 'live')
+    monkeypatch.setattr(app_module, 'scrape_all_platforms', scrape_all_platforms)
+    monkeypatch.setattr(app_module, 'generate_content', generate_content)
+    monkeypatch.setattr(app_module, 'price_cache', SimpleNamespace(set=lambda key, value: None))
+
+    started = time.monotonic()
+    comparison = app_module.prepare_comparison(["amul milk 1l"], 'Pune', platforms=platforms)
+    assert time.monotonic() - started < 0.6
+    for platform in platforms:
+        item = comparison['platforms'][platform]['items'][0]
+        assert item['price'] == 54.0
+        assert 'candidates' not in item
@@ -0,0 +1,76 @@
+import itertools
+import random
+
+import pytest
+
+import optimizer
+import scraper  # registers the platforms
+from platforms import get_platform
+
+PLATFORMS = ["Zepto", "Blinkit", "Instamart", "Flipkart Minutes"]
+
+
+def random_basket(rng, n):
+    items = [f"item {i}" for i in range(n)]
+    results = {}
+    for platform in PLATFORMS:
+        results[platform] = {"items": [
+            {"name": item, "price": round(rng.uniform(5, 150), 2), "available": rng.random() > 0.2}
+            for item in items]}
+    return items, results
+
+
+def brute_force(items, results):
+    """Cheapest total over every assignment of items to platforms that stock them"""
+    options = []
+    for i in range(len(items)):
+        stocked = [p for p in results if results[p]['items'][i]['available']]
+        if stocked:
+            options.append((i, stocked))
+    best = 0.0 if not options else float('inf')
+    for assignment in itertools.product(*(stocked for _, stocked in options)):
+        orders = {}
+        for (i, _), platform in zip(options, assignment):
+            orders.setdefault(platform, []).append(results[platform]['items'][i])
+        total = 0.0
+        for platform, basket in orders.items():
+            fees = get_platform(platform).fees(basket)
+            total += sum(item['price'] for item in basket) + fees['delivery_fee'] + fees['platform_fee']
+        best = min(best, total)
+    return best
+
+
+@pytest.mark.parametrize('seed', range(40))
+def test_exhaustive_matches_brute_force(seed):
+    rng = random.Random(seed)
+    items, results = random_basket(rng, rng.randint(1, 6))
+    plan = optimizer.optimize_basket(items, results)
+
+    assert plan['method'] == 'exhaustive'
+    assert plan['total'] == pytest.approx(brute_force(items, results), abs=0.01)
+    ordered = [item for order in plan['orders'].values() for item in order['items']]
+    assert sorted(ordered + plan['unavailable']) == sorted(items)
+    assert plan['total'] == pytest.approx(sum(order['total'] for order in plan['orders'].values()), abs=0.01)
+    if plan['single_platform']:
+        assert plan['savings'] >= 0
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_local_search_is_never_worse_than_one_platform(monkeypatch, seed):
+    monkeypatch.setattr(optimizer, 'MAX_COMBINATIONS', 1)
+    rng = random.Random(seed)
+    items, results = random_basket(rng, rng.randint(3, 6))
+    plan = optimizer.optimize_basket(items, results)
+
+    assert plan['method'] == 'local_search'
+    assert plan['total'] >= brute_force(items, results) - 0.01
+    if plan['single_platform']:
+        assert plan['total'] <= plan['single_platform_total'] + 0.01
+
+
+def test_nothing_in_stock():
+    items = ["milk"]
+    results = {platform: {"items": [{"name": "milk", "price": 0, "available": False}]} for platform in PLATFORMS}
+    plan = optimizer.optimize_basket(items, results)
+    assert plan['orders'] == {}
+    assert plan['unavailable'] == ["milk"]
@@ -0,0 +1,39 @@
+import pytest
+
+import app as app_module
+import scraper  # registers the platforms
+from platforms import enabled_platforms, platform_selection_error
+
+
+def test_string_selects_only_an_exact_name():
+    assert [adapter.name for adapter in enabled_platforms("Zepto")] == ["Zepto"]
+    assert enabled_platforms("Zept") == []
+    assert enabled_platforms("ZeptoBlinkit") == []
+
+
+def test_selection_errors():
+    assert platform_selection_error(["Zepto", "Blinkit"]) is None
+    assert platform_selection_error("Zepto")['error'] == "platforms must be a list of platform names"
+    assert platform_selection_error(["Zepto", 1])['error'] == "platforms must be a list of platform names"
+    error = platform_selection_error(["Zepto", "Amazon", "Zept"])
+    assert error['unknown'] == ["Amazon", "Zept"]
+    assert "Zepto" in error['available']
+    assert platform_selection_error([])['error'] == "No enabled platforms selected"
+
+
+@pytest.mark.parametrize('route', ['/api/compare-prices', '/api/compare-prices/jobs'])
+@pytest.mark.parametrize('platforms', ["Zepto", {"Zepto": True}, ["Amazon"], [None]])
+def test_compare_routes_reject_bad_platforms(db, monkeypatch, route, platforms):
+    monkeypatch.setattr(app_module, 'run_comparison', pytest.fail)
+    response = app_module.app.test_client().post(route, json={"items": ["milk"], "platforms": platforms})
+    assert response.status_code == 400
+
+
+def test_asgi_compare_rejects_unknown_platforms(db):
+    from starlette.testclient import TestClient
+    import asgi
+
+    with TestClient(asgi.app) as client:
+        response = client.post('/api/compare-prices', json={"items": ["milk"], "platforms": ["Zepto", "Amazon"]})
+    assert response.status_code == 400
+    assert response.json()['unknown'] == ["Amazon"]
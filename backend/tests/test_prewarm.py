@@ -0,0 +1,35 @@
+import uuid
+
+import prewarm
+import scraper  # registers the platforms
+from cache import price_cache, price_cache_key, FRESH
+
+
+def test_prewarm_fills_the_cache_without_writing_history(db, monkeypatch):
+    monkeypatch.setattr(prewarm, 'PREWARM_RATE_PER_SEC', 1000)
+    enqueued = []
+    monkeypatch.setattr(db.PriceHistoryWriter, 'enqueue', lambda self, rows: enqueued.extend(rows))
+    item = f"item {uuid.uuid4().hex}"
+    fetched = []
+
+    def fetch(platform, items, location):
+        fetched.append(platform)
+        results = [{"name": f"{item} candidate", "price": 20.0, "available": True, "url": ""} for item in items]
+        for name, result in zip(items, results):
+            price_cache.set(price_cache_key(platform, name, location), result)
+        return results
+
+    popularity = prewarm.Popularity()
+    popularity.record([item], 'Pune')
+    prewarmer = prewarm.Prewarmer(fetch, popularity, workers=0)
+    queued = prewarmer.run_once()
+    assert queued == len(prewarm.enabled_platforms()) > 0
+    while not prewarmer._queue.empty():
+        prewarmer._process(*prewarmer._queue.get_nowait())
+
+    assert prewarmer.counts['fetched'] == queued
+    assert all(price_cache.state(price_cache_key(p, item, 'pune')) == FRESH for p in fetched)
+    assert enqueued == []
+    assert db.get_connection().execute('SELECT COUNT(*) FROM price_history').fetchone()[0] == 0
+    # Fresh entries are not queued again
+    assert prewarmer.run_once() == 0
@@ -0,0 +1,92 @@
+import time
+import uuid
+
+import pytest
+
+import platforms
+import scraper
+
+
+def stub_platform(monkeypatch, delays, concurrency=1):
+    """Register a platform whose lookups take delays.get(item, 0) seconds"""
+    def scrape(items, location):
+        for item in items:
+            time.sleep(delays.get(item, 0))
+        return {"items": [{"name": item, "price": 10.0, "available": True, "url": ""} for item in items]}
+
+    name = f"Stub {uuid.uuid4().hex[:8]}"
+    adapter = platforms.PlatformAdapter(name, scrape, 'https://example.com/?q={query}', concurrency=concurrency)
+    monkeypatch.setitem(platforms.PLATFORMS, name, adapter)
+    return name
+
+
+def test_deadline_keeps_finished_lookups(monkeypatch):
+    items = [f"item-{uuid.uuid4().hex}" for _ in range(4)]
+    platform = stub_platform(monkeypatch, {items[2]: 2})
+    done = []
+
+    started = time.monotonic()
+    results = scraper.scrape_all_platforms(items, deadline=0.5, platforms=[platform],
+                                           on_platform_done=lambda name, result: done.append(name))
+    assert time.monotonic() - started < 1.5
+
+    result = results[platform]
+    assert result['partial']
+    assert [item['available'] for item in result['items']] == [True, True, False, False]
+    assert [item['name'] for item in result['items']] == items
+    assert done == [platform]
+
+
+def test_slots_limit_concurrent_lookups(monkeypatch):
+    items = [f"item-{uuid.uuid4().hex}" for _ in range(4)]
+    platform = stub_platform(monkeypatch, dict.fromkeys(items, 0.2), concurrency=2)
+
+    started = time.monotonic()
+    results = scraper.scrape_all_platforms(items, deadline=5, platforms=[platform])
+    elapsed = time.monotonic() - started
+
+    assert not results[platform]['partial']
+    assert all(item['available'] for item in results[platform]['items'])
+    assert 0.4 <= elapsed < 0.8
+
+
+def test_cached_prices_skip_scraping(monkeypatch):
+    item = f"item-{uuid.uuid4().hex}"
+    platform = stub_platform(monkeypatch, {})
+    scraper.scrape_all_platforms([item], platforms=[platform])
+
+    monkeypatch.setattr(platforms.PLATFORMS[platform], 'scrape', pytest.fail)
+    results = scraper.scrape_all_platforms([item], platforms=[platform])
+    assert results[platform]['items'][0]['available']
+
+
+def test_slow_platform_does_not_delay_fast_one(monkeypatch):
+    items = [f"item-{uuid.uuid4().hex}" for _ in range(12)]
+    slow = stub_platform(monkeypatch, dict.fromkeys(items[:5], 0.2), concurrency=1)
+    fast = stub_platform(monkeypatch, dict.fromkeys(items, 0.01), concurrency=4)
+    finished = {}
+
+    started = time.monotonic()
+    results = scraper.scrape_all_platforms(
+        items, deadline=5, platforms=[slow, fast],
+        on_platform_done=lambda name, result: finished.setdefault(name, time.monotonic() - started))
+
+    assert finished[fast] < 0.15
+    assert finished[slow] >= 0.2 * 5
+    assert all(item['available'] for item in results[fast]['items'])
+    assert not results[slow]['partial']
+
+
+
+def test_browsers_track_requests_in_flight(monkeypatch):
+    class Chrome:
+        def __init__(self, options):
+            self.commands = []
+
+        def execute_cdp_cmd(self, command, params):
+            self.commands.append((command, params))
+
+    monkeypatch.setattr(scraper.webdriver, 'Chrome', Chrome)
+    driver = scraper.setup_driver()
+    assert driver.commands == [('Page.addScriptToEvaluateOnNewDocument', {"source": scraper.TRACK_REQUESTS_JS})]
+    assert '__pendingRequests > 0' in scraper.NETWORK_IDLE_JS
@@ -11,6 +11,7 @@ function App() {
   const [loading, setLoading] = useState(false);
   const [chatMessages, setChatMessages] = useState([]);
   const [chatInput, setChatInput] = useState("");
+  const [chatSessionId, setChatSessionId] = useState(null);
   const [activeTab, setActiveTab] = useState("compare");
   const [uploadedImage, setUploadedImage] = useState(null);
   const [imagePreview, setImagePreview] = useState(null);
@@ -86,7 +87,7 @@ function App() {
 
     setLoading(true);
     try {
-      const response = await fetch(`${API_BASE}/compare-prices`, {
+      const response = await fetch(`${API_BASE}/compare-prices/jobs`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify({
@@ -95,14 +96,46 @@ function App() {
         }),
       });
 
-      const data = await response.json();
-      setComparisonData(data);
-      setInsights(data.insights);
+      const job = await response.json();
+      if (!response.ok) throw new Error(job.error);
+
+      setComparisonData({ platforms: {} });
+      setInsights(null);
+      setChatSessionId(null);
       setActiveTab("results");
+
+      // Platforms render as they finish; insights arrive last
+      const events = new EventSource(
+        `${API_BASE}/compare-prices/jobs/${job.job_id}/stream`
+      );
+      events.addEventListener("platform", (e) => {
+        const { platform, ...totals } = JSON.parse(e.data);
+        setComparisonData((prev) => ({
+          ...prev,
+          platforms: { ...prev.platforms, [platform]: totals },
+        }));
+      });
+      events.addEventListener("insights", (e) => {
+        setInsights(JSON.parse(e.data));
+      });
+      events.addEventListener("done", (e) => {
+        const data = JSON.parse(e.data);
+        setComparisonData(data);
+        setInsights(data.insights);
+        events.close();
+        setLoading(false);
+      });
+      events.addEventListener("error", (e) => {
+        events.close();
+        setLoading(false);
+        if (e.data) {
+          console.error("Comparison failed:", JSON.parse(e.data).error);
+          alert("Failed to compare prices. Please try again.");
+        }
+      });
     } catch (error) {
       console.error("Error comparing prices:", error);
       alert("Failed to compare prices. Please try again.");
-    } finally {
       setLoading(false);
     }
   };
@@ -110,23 +143,57 @@ function App() {
   const sendChatMessage = async () => {
     if (!chatInput.trim()) return;
 
-    const userMsg = { role: "user", text: chatInput };
-    setChatMessages((prev) => [...prev, userMsg]);
+    const message = chatInput;
+    setChatMessages((prev) => [
+      ...prev,
+      { role: "user", text: message },
+      { role: "ai", text: "" },
+    ]);
     setChatInput("");
 
-    try {
-      const response = await fetch(`${API_BASE}/chat`, {
+    // Tokens are appended to the last (AI) message as they stream in
+    const appendToAnswer = (text) =>
+      setChatMessages((prev) => [
+        ...prev.slice(0, -1),
+        { ...prev[prev.length - 1], text: prev[prev.length - 1].text + text },
+      ]);
+
+    const post = (body) =>
+      fetch(`${API_BASE}/chat`, {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({
-          message: chatInput,
-          context: comparisonData,
-        }),
+        body: JSON.stringify({ message, stream: true, ...body }),
       });
 
-      const data = await response.json();
-      const aiMsg = { role: "ai", text: data.answer };
-      setChatMessages((prev) => [...prev, aiMsg]);
+    try {
+      // The server keeps a compact summary of the comparison per session;
+      // the full comparison is only sent if the session has expired
+      const sessionId = chatSessionId || comparisonData?.chat_session_id;
+      let response = sessionId ? await post({ session_id: sessionId }) : null;
+      if (!response || response.status === 404) {
+        response = await post({ context: comparisonData });
+      }
+      if (!response.ok) throw new Error((await response.json()).error);
+
+      const reader = response.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      for (;;) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const raw of events) {
+          const event = raw.match(/^event: (.*)$/m)?.[1];
+          const data = raw.match(/^data: (.*)$/m)?.[1];
+          if (!event || !data) continue;
+          const payload = JSON.parse(data);
+          if (event === "token") appendToAnswer(payload.text);
+          if (event === "done") setChatSessionId(payload.session_id);
+          if (event === "error") throw new Error(payload.error);
+        }
+      }
     } catch (error) {
       console.error("Error sending chat:", error);
     }